@@ -0,0 +1,307 @@
+# coding=utf-8
+"""
+bench_gui.py
+
+Benchmark suite for the GUI hot paths, on a synthetic model of a chosen size (see
+synthetic_model.py): num_countries x num_sectors sectors, with num_equations variables each.
+
+Cases (best of --repeat runs, in seconds):
+    build               -- build the model and run it up to 'Solve' (for reference)
+    sort_series         -- utils.sort_series() on all the series names
+    series_store        -- Parameters.SetModel(): pack the time series into a SeriesStore
+    plot_update_agg     -- MultiLinePlot.Update() with 8 series, on the Agg backend
+    model_viewer_cold   -- ModelRunner.UpdateModelViewer() into an empty tree (Tk)
+    model_viewer_warm   -- ModelRunner.UpdateModelViewer() again, nothing changed (Tk)
+    listbox_set         -- WidgetHolder.SetListBox() with (nearly) all the series names (Tk)
+    listbox_get         -- WidgetHolder.GetListBox() on that list (Tk)
+    chart_update        -- ChartPlotterFrame.Update() with 8 series selected (Tk)
+
+The Tk cases need a display; on a headless machine, run under a virtual display:
+    xvfb-run python benchmarks/bench_gui.py
+Without a display, the Tk cases are skipped (and recorded as null).
+
+Each run is appended to a history file (JSON lines, default benchmarks/bench_history.jsonl), with
+the date, git commit, Python and sfc_models versions, machine, model size and the timings. The run
+is compared with the last run in the history for the same machine and model size; a case that
+is slower by more than the threshold (and by more than min_regression seconds) is reported, and
+the exit status is 1.
+
+Usage:
+    python benchmarks/bench_gui.py [--countries 3] [--sectors 5] [--equations 20] [--periods 100]
+        [--repeat 5] [--history FILE] [--no-history] [--threshold 0.25]
+"""
+from __future__ import print_function
+
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+# Run from a checkout: make the sfc_gui package (in the parent directory) importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sfc_gui import utils
+from sfc_gui.plotting import MultiLinePlot
+import synthetic_model
+
+cases = ('build', 'sort_series', 'series_store', 'plot_update_agg', 'model_viewer_cold',
+         'model_viewer_warm', 'listbox_set', 'listbox_get', 'chart_update')
+tk_cases = ('model_viewer_cold', 'model_viewer_warm', 'listbox_set', 'listbox_get', 'chart_update')
+# Regressions shorter than this (seconds) are ignored.
+min_regression = 0.001
+# Number of series selected for the chart cases.
+num_plotted = 8
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def time_it(func, repeats=5):
+    best = None
+    for i in range(0, repeats):
+        start = timer()
+        func(i)
+        elapsed = timer() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def get_tk_root():
+    """
+    A hidden Tk root window, or None if there is no display.
+    :return: Tk
+    """
+    tk, ttk = utils._import_tk()
+    try:
+        root = tk.Tk()
+    except tk.TclError:
+        return None
+    root.withdraw()
+    return root
+
+
+def bench_data(size, repeats):
+    """
+    The cases that do not need Tk.
+    :param size: dict
+    :param repeats: int
+    :return: dict
+    """
+    out = {}
+    out['build'] = time_it(lambda i: synthetic_model.make_model(**size), repeats)
+    mod = synthetic_model.make_model(**size)
+    names = list(mod.EquationSolver.TimeSeries.keys())
+    out['sort_series'] = time_it(lambda i: utils.sort_series(names), repeats)
+    params = utils.Parameters()
+    out['series_store'] = time_it(lambda i: params.SetModel(mod), repeats)
+    canvas = FigureCanvasAgg(Figure(figsize=(7.5, 5), dpi=90))
+    plot = MultiLinePlot(canvas)
+    series = []
+    for name in utils.sort_series(params.TimeSeriesList)[2:2 + num_plotted]:
+        x, y = params.GetWindow(name)
+        series.append((name, x, y))
+    plot.Update(series, 'overlay', params.TimeAxisVariable)
+    out['plot_update_agg'] = time_it(
+        lambda i: plot.Update(series[i % 2:] + series[:i % 2], 'overlay', params.TimeAxisVariable),
+        repeats)
+    return mod, out
+
+
+def bench_model_viewer(mod, repeats):
+    """
+    UpdateModelViewer(), into a new ModelRunner window (cold) and again (warm).
+    :param mod: Model
+    :param repeats: int
+    :return: dict
+    """
+    from sfc_gui.model_runner import ModelRunner
+    out = {}
+    cold = []
+    warm = []
+    # The Model Runner scans its working directory for model files; give it an empty one.
+    cwd = os.getcwd()
+    tmp_dir = tempfile.mkdtemp()
+    os.chdir(tmp_dir)
+    try:
+        for i in range(0, repeats):
+            runner = ModelRunner(None)
+            runner.withdraw()
+            runner.Model = mod
+            cold.append(time_it(lambda j: runner.UpdateModelViewer(), 1))
+            warm.append(time_it(lambda j: runner.UpdateModelViewer(), 1))
+            runner.destroy()
+    finally:
+        os.chdir(cwd)
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+    out['model_viewer_cold'] = min(cold)
+    out['model_viewer_warm'] = min(warm)
+    return out
+
+
+def bench_widgets(root, mod, repeats):
+    """
+    The list box and chart plotter cases.
+    :param root: Tk
+    :param mod: Model
+    :param repeats: int
+    :return: dict
+    """
+    from sfc_gui.chart_plotter import ChartPlotterFrame
+    out = {}
+    holder = utils.WidgetHolder()
+    holder.AddListBox(root, 'series', single_select=False)
+    names = utils.sort_series(list(mod.EquationSolver.TimeSeries.keys()))
+    # Alternate between two lists; setting the same items again is a no-op.
+    out['listbox_set'] = time_it(lambda i: holder.SetListBox('series', names[i % 2:]), repeats)
+    holder.Widgets['series'].selection_set('end')
+    out['listbox_get'] = time_it(lambda i: holder.GetListBox('series'), repeats)
+    params = utils.Parameters()
+    params.SetModel(mod)
+    frame = ChartPlotterFrame(root, params)
+    root.update()
+    frame.ShowSeries(utils.sort_series(params.TimeSeriesList)[2:2 + num_plotted])
+    out['chart_update'] = time_it(lambda i: frame.Update(), repeats)
+    frame.destroy()
+    return out
+
+
+def get_commit():
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    try:
+        out = subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=root,
+                                      stderr=subprocess.STDOUT)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.decode('utf-8').strip()
+
+
+def get_sfc_models_version():
+    try:
+        import pkg_resources
+        return pkg_resources.get_distribution('sfc_models').version
+    except Exception:
+        return None
+
+
+def load_history(fname):
+    """
+    List of the runs in a history file (oldest first).
+    :param fname: str
+    :return: list
+    """
+    out = []
+    if not os.path.exists(fname):
+        return out
+    with open(fname) as f:
+        for line in f:
+            line = line.strip()
+            if len(line) > 0:
+                out.append(json.loads(line))
+    return out
+
+
+def find_previous(history, entry):
+    """
+    The last run in history for the same machine and model size, or None.
+    :param history: list
+    :param entry: dict
+    :return: dict
+    """
+    for old in reversed(history):
+        if old.get('machine') == entry['machine'] and old.get('size') == entry['size']:
+            return old
+    return None
+
+
+def compare_runs(previous, entry, threshold):
+    """
+    List of (case, previous seconds, seconds) for the cases that got slower by more than
+    threshold (relative) and min_regression (seconds).
+
+    :param previous: dict
+    :param entry: dict
+    :param threshold: float
+    :return: list
+    """
+    out = []
+    for case in cases:
+        old = previous['results'].get(case)
+        new = entry['results'].get(case)
+        if old is None or new is None:
+            continue
+        if new > old * (1. + threshold) and new - old > min_regression:
+            out.append((case, old, new))
+    return out
+
+
+def main(argv=None):
+    default_history = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'bench_history.jsonl')
+    parser = argparse.ArgumentParser(description='Benchmark the GUI hot paths on a synthetic model.')
+    parser.add_argument('--countries', type=int, default=3, help='Number of countries')
+    parser.add_argument('--sectors', type=int, default=5, help='Sectors per country')
+    parser.add_argument('--equations', type=int, default=20, help='Variables per sector')
+    parser.add_argument('--periods', type=int, default=100, help='Length of the time series')
+    parser.add_argument('--repeat', type=int, default=5, help='Runs per case; the fastest is kept')
+    parser.add_argument('--history', default=default_history, help='History file (JSON lines)')
+    parser.add_argument('--no-history', action='store_true', help='Do not read or write the history')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Relative slow-down that counts as a regression (default: 0.25)')
+    args = parser.parse_args(argv)
+    repeats = max(args.repeat, 1)
+    size = {'num_countries': args.countries, 'num_sectors': args.sectors,
+            'num_equations': args.equations, 'num_periods': args.periods}
+    mod, results = bench_data(size, repeats)
+    root = get_tk_root()
+    if root is None:
+        print('No display: skipping the Tk cases (use xvfb-run).')
+        for case in tk_cases:
+            results[case] = None
+    else:
+        results.update(bench_model_viewer(mod, repeats))
+        results.update(bench_widgets(root, mod, repeats))
+        root.destroy()
+    entry = {'date': datetime.datetime.now().isoformat(),
+             'commit': get_commit(),
+             'python': platform.python_version(),
+             'sfc_models': get_sfc_models_version(),
+             'machine': platform.node(),
+             'size': size,
+             'num_series': len(mod.EquationSolver.TimeSeries),
+             'results': results}
+    previous = None
+    if not args.no_history:
+        previous = find_previous(load_history(args.history), entry)
+    print('Synthetic model: {0} countries x {1} sectors x {2} equations, {3} series, {4} periods'.format(
+        args.countries, args.sectors, args.equations, entry['num_series'], args.periods))
+    for case in cases:
+        if results[case] is None:
+            print('{0:<20} {1:>12}'.format(case, 'skipped'))
+        elif previous is None or previous['results'].get(case) is None:
+            print('{0:<20} {1:12.5f}s'.format(case, results[case]))
+        else:
+            print('{0:<20} {1:12.5f}s  (previous {2:.5f}s)'.format(case, results[case],
+                                                                previous['results'][case]))
+    if not args.no_history:
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(entry, sort_keys=True) + '\n')
+    regressions = []
+    if previous is not None:
+        regressions = compare_runs(previous, entry, args.threshold)
+    for case, old, new in regressions:
+        print('REGRESSION {0}: {1:.5f}s -> {2:.5f}s'.format(case, old, new))
+    if len(regressions) > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
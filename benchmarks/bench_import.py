@@ -0,0 +1,91 @@
+# coding=utf-8
+"""
+bench_import.py
+
+Startup-time guard: imports each sfc_gui module in a fresh interpreter, and reports the import
+time (best of several runs) and which heavy packages came along with it.
+
+The data helpers (utils, series_store, tree_sync, module_loader, ...) must not pull in matplotlib
+or Tk, so that model scripts and headless tools can use them. The script exits with status 1 if
+one of them does, or if utils takes longer than the limit to import.
+
+Usage:
+    python benchmarks/bench_import.py [limit_ms]
+"""
+from __future__ import print_function
+
+import json
+import os
+import subprocess
+import sys
+
+# module: heavy packages it must not import
+guarded = {
+    'sfc_gui.utils': ('matplotlib', 'tkinter', 'numpy', 'sfc_models'),
+    'sfc_gui.tree_sync': ('matplotlib', 'tkinter'),
+    'sfc_gui.module_loader': ('matplotlib', 'tkinter'),
+    'sfc_gui.series_store': ('matplotlib', 'tkinter'),
+    'sfc_gui.series_index': ('matplotlib', 'tkinter', 'numpy'),
+    'sfc_gui.series_hierarchy': ('matplotlib', 'tkinter', 'numpy'),
+    'sfc_gui.result_file': ('matplotlib', 'tkinter'),
+    'sfc_gui.plotting': ('matplotlib', 'tkinter'),
+    'sfc_gui.render': ('tkinter', 'matplotlib.pyplot'),
+}
+# For information only: the GUI modules need Tk.
+unguarded = ('sfc_gui.chart_plotter', 'sfc_gui.model_runner')
+heavy = ('matplotlib', 'matplotlib.pyplot', 'tkinter', 'numpy', 'sfc_models')
+
+_probe = """
+import json, sys, time
+start = time.perf_counter()
+import {0}
+elapsed = time.perf_counter() - start
+print(json.dumps([elapsed, [x for x in {1!r} if x in sys.modules]]))
+"""
+
+
+def time_import(module_name, repeats=5):
+    """
+    Best import time (seconds) over repeats fresh interpreters, and the heavy packages loaded.
+    :param module_name: str
+    :param repeats: int
+    :return: tuple
+    """
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    env = dict(os.environ)
+    env['PYTHONPATH'] = root + os.pathsep + env.get('PYTHONPATH', '')
+    best = None
+    loaded = []
+    for i in range(0, repeats):
+        out = subprocess.check_output([sys.executable, '-c', _probe.format(module_name, heavy)],
+                                      env=env)
+        elapsed, loaded = json.loads(out.decode('utf-8').strip().splitlines()[-1])
+        if best is None or elapsed < best:
+            best = elapsed
+    return best, loaded
+
+
+def main(limit_ms):
+    failed = False
+    for module_name in sorted(guarded) + list(unguarded):
+        elapsed, loaded = time_import(module_name)
+        status = ''
+        forbidden = [x for x in guarded.get(module_name, ()) if x in loaded]
+        if len(forbidden) > 0:
+            status = 'FAIL: imports ' + ', '.join(forbidden)
+            failed = True
+        elif module_name == 'sfc_gui.utils' and elapsed * 1000. > limit_ms:
+            status = 'FAIL: slower than {0} ms'.format(limit_ms)
+            failed = True
+        print('{0:<24} {1:8.1f} ms  {2:<45} {3}'.format(module_name, elapsed * 1000.,
+                                                        ','.join(loaded), status))
+    if failed:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        sys.exit(main(float(sys.argv[1])))
+    else:
+        sys.exit(main(100.))
@@ -0,0 +1,94 @@
+# coding=utf-8
+"""
+bench_redraw.py
+
+Micro-benchmark: redraws per second of the chart plotter line, using a full canvas.draw() for
+every update (the old behaviour) versus FastLinePlot (blit the line over a cached background).
+The series all share the same axis limits, which is the case FastLinePlot speeds up.
+
+Also times MultiLinePlot, with 24 series selected at once, as overlays and as small multiples
+(capped at 16 panels).
+
+Runs on the Agg backend (no display needed). Agg blit() is a no-op, so the numbers measure the
+rendering work only; on TkAgg, the blit also copies a smaller image to the screen.
+
+Usage:
+    python benchmarks/bench_redraw.py [num_points]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+import numpy
+
+# Run from a checkout: make the sfc_gui package (in the parent directory) importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sfc_gui.plotting import FastLinePlot, MultiLinePlot
+
+
+def make_plot(fast):
+    fig = Figure(figsize=(7.5, 5), dpi=90)
+    ax = fig.add_subplot(111)
+    line, = ax.plot([], [], 'bo-')
+    canvas = FigureCanvasAgg(fig)
+    plot = None
+    if fast:
+        plot = FastLinePlot(canvas, ax, [line])
+    return canvas, ax, line, plot
+
+
+def run(fast, num_points, duration=2.):
+    canvas, ax, line, plot = make_plot(fast)
+    x = numpy.arange(0, num_points, dtype=float)
+    series = [numpy.sin(x / (10. + i)) for i in range(0, 20)]
+    count = 0
+    start = time.time()
+    while time.time() - start < duration:
+        y = series[count % len(series)]
+        line.set_data(x, y)
+        if fast:
+            plot.Update((0., num_points), (-1.1, 1.1), 'k')
+        else:
+            ax.set_xlim(0., num_points)
+            ax.set_ylim(-1.1, 1.1)
+            ax.set_xlabel('k')
+            canvas.draw()
+        count += 1
+    return count / (time.time() - start)
+
+
+def run_multi(mode, num_points, num_series=24, duration=2.):
+    fig = Figure(figsize=(7.5, 5), dpi=90)
+    canvas = FigureCanvasAgg(fig)
+    plot = MultiLinePlot(canvas)
+    x = numpy.arange(0, num_points, dtype=float)
+    series = [('s{0}'.format(i), x, numpy.sin(x / (10. + i))) for i in range(0, num_series)]
+    count = 0
+    start = time.time()
+    while time.time() - start < duration:
+        plot.Update(series, mode, 'k')
+        count += 1
+    return count / (time.time() - start)
+
+
+def main(num_points):
+    slow = run(False, num_points)
+    fast = run(True, num_points)
+    print('Points per series: {0}'.format(num_points))
+    print('Full redraw: {0:8.1f} redraws/s'.format(slow))
+    print('Blit redraw: {0:8.1f} redraws/s'.format(fast))
+    print('Speedup:     {0:8.1f}x'.format(fast / slow))
+    print('24 series, overlay:         {0:8.1f} redraws/s'.format(run_multi('overlay', num_points)))
+    print('24 series, small multiples: {0:8.1f} redraws/s'.format(run_multi('grid', num_points)))
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main(int(sys.argv[1]))
+    else:
+        main(100)
@@ -0,0 +1,87 @@
+# coding=utf-8
+"""
+bench_tree_refresh.py
+
+Benchmark: time to refresh an equation block in a ttk.Treeview, as a function of the number of
+equations. Compares the old "delete and reinsert everything" refresh against the diff-based
+TreeSync refresh, with 1% of the equations changing between steps.
+
+Needs a display (use xvfb-run on a headless machine).
+
+Usage:
+    python benchmarks/bench_tree_refresh.py [num_eqn ...]
+"""
+from __future__ import print_function
+
+import os
+import sys
+import time
+
+if sys.version_info[0] < 3:
+    import Tkinter as tk
+    from Tkinter import ttk
+else:
+    import tkinter as tk
+    from tkinter import ttk
+
+# Run from a checkout: make the sfc_gui package (in the parent directory) importable.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from sfc_gui.tree_sync import TreeSync
+
+
+def make_rows(num_eqn, version):
+    rows = []
+    for i in range(0, num_eqn):
+        # Every 100th equation changes with each version.
+        if i % 100 == 0:
+            rhs = 'x{0} + {1}'.format(i, version)
+        else:
+            rhs = 'x{0}'.format(i)
+        rows.append(('v{0}'.format(i), 'v{0}'.format(i), ('v{0} = {1}'.format(i, rhs), 'Variable')))
+    return rows
+
+
+def full_refresh(tree, parent, rows):
+    for child in tree.get_children(parent):
+        tree.delete(child)
+    for code, text, values in rows:
+        tree.insert(parent, 'end', code, text=text, values=values)
+
+
+def time_it(func, repeats=5):
+    best = None
+    for i in range(0, repeats):
+        start = time.time()
+        func(i)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return best
+
+
+def main(sizes):
+    root = tk.Tk()
+    root.withdraw()
+    print('{0:>10} {1:>12} {2:>12}'.format('# eqn', 'full (s)', 'diff (s)'))
+    for num_eqn in sizes:
+        tree = ttk.Treeview(root, columns=('Equation', 'Comment'))
+        tree.insert('', 'end', 'ROOT', text='Root')
+        full_refresh(tree, 'ROOT', make_rows(num_eqn, 0))
+        t_full = time_it(lambda i: full_refresh(tree, 'ROOT', make_rows(num_eqn, i + 1)))
+        tree.destroy()
+        tree = ttk.Treeview(root, columns=('Equation', 'Comment'))
+        tree.insert('', 'end', 'ROOT', text='Root')
+        sync = TreeSync(tree)
+        sync.SyncBlock('ROOT', make_rows(num_eqn, 0))
+        t_diff = time_it(lambda i: sync.SyncBlock('ROOT', make_rows(num_eqn, i + 1)))
+        tree.destroy()
+        print('{0:>10} {1:>12.4f} {2:>12.4f}'.format(num_eqn, t_full, t_diff))
+    root.destroy()
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 1:
+        main([int(x) for x in sys.argv[1:]])
+    else:
+        main([100, 1000, 5000, 20000])
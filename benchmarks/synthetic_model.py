@@ -0,0 +1,96 @@
+# coding=utf-8
+"""
+synthetic_model.py
+
+Synthetic sfc_models Model objects of a chosen size, for the benchmarks: num_countries countries,
+each with num_sectors sectors, each sector with num_equations variables (on top of the variables
+that sfc_models adds to every sector, such as F and INC).
+
+Each variable depends on the previous variable of its sector and on its own lagged value; the
+first variable of a sector also depends on the last variable of the previous sector in the same
+country, so that the equations are linked across sectors like a real model.
+
+The models are not solved (that is the solver's benchmark, not the GUI's): run_to_solve() runs
+every step before 'Solve', so that the equation blocks are filled in, and fill_time_series()
+puts synthetic data into the solver's time series, as if the model had been solved.
+"""
+
+import math
+
+from sfc_models.models import Model, Country
+from sfc_models.sector import Sector
+
+
+def build_model(num_countries=3, num_sectors=5, num_equations=20):
+    """
+    Build a synthetic model (not run).
+
+    :param num_countries: int
+    :param num_sectors: int
+    :param num_equations: int
+    :return: Model
+    """
+    mod = Model()
+    for c in range(0, num_countries):
+        country = Country(mod, 'C{0}'.format(c), 'Country {0}'.format(c))
+        previous = None
+        for s in range(0, num_sectors):
+            sector = Sector(country, 'S{0}'.format(s), 'Sector {0}'.format(s))
+            for k in range(0, num_equations):
+                if k > 0:
+                    eqn = '0.5*V{0} + 0.1*V{1}(k-1)'.format(k - 1, k)
+                elif previous is None:
+                    eqn = '1.0 + 0.9*V0(k-1)'
+                else:
+                    eqn = '0.2*{0} + 0.7*V0(k-1)'.format(
+                        previous.GetVariableName('V{0}'.format(num_equations - 1)))
+                sector.AddVariable('V{0}'.format(k), 'Synthetic variable {0}'.format(k), eqn)
+            if num_equations > 0:
+                previous = sector
+    return mod
+
+
+def run_to_solve(mod):
+    """
+    Run the model steps up to (not including) 'Solve'.
+
+    :param mod: Model
+    :return: Model
+    """
+    while True:
+        steps = mod._GetSteps()
+        if len(steps) == 0 or steps[0][0] == 'Solve':
+            break
+        mod._RunStep(steps[0][0])
+    return mod
+
+
+def fill_time_series(mod, num_periods=100):
+    """
+    Fill the solver's TimeSeries with synthetic data for every final equation variable.
+
+    :param mod: Model
+    :param num_periods: int
+    :return: TimeSeriesHolder
+    """
+    holder = mod.EquationSolver.TimeSeries
+    holder[holder.TimeSeriesName] = [float(x) for x in range(0, num_periods)]
+    holder['t'] = [float(x) for x in range(0, num_periods)]
+    for pos, varname in enumerate(mod.FinalEquationBlock.GetEquationList()):
+        holder[varname] = [math.sin(x / (10. + pos % 50)) for x in range(0, num_periods)]
+    return holder
+
+
+def make_model(num_countries=3, num_sectors=5, num_equations=20, num_periods=100):
+    """
+    Build a synthetic model, run it up to 'Solve', and fill in its time series.
+
+    :param num_countries: int
+    :param num_sectors: int
+    :param num_equations: int
+    :param num_periods: int
+    :return: Model
+    """
+    mod = run_to_solve(build_model(num_countries, num_sectors, num_equations))
+    fill_time_series(mod, num_periods)
+    return mod
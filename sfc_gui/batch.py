@@ -0,0 +1,157 @@
+# coding=utf-8
+"""
+batch.py
+
+Headless batch runner: builds and solves every model file (sfcmod_*.py) in a directory, spreading
+the models across a pool of worker processes.
+
+Usage:
+    python -m sfc_gui.batch <directory> [--logdir LOGDIR] [--workers N]
+
+Each model is run as build_model() followed by main(). If a log directory is given (by default,
+the 'output' sub-directory of the model directory if it exists, as in the Model Runner), every
+model gets the standard sfc_models log files there, and a tab-delimited summary of the batch is
+written to batch_summary.txt.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import sys
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sfc_models.utils import Logger
+import sfc_gui.module_loader
+
+
+def get_default_log_dir(directory):
+    """
+    The 'output' sub-directory, if it exists; otherwise '' (no logging).
+    :param directory: str
+    :return: str
+    """
+    default = os.path.join(directory, 'output')
+    if os.path.isdir(default):
+        return default
+    return ''
+
+
+def run_model_file(directory, name, log_dir=''):
+    """
+    Build and solve one model file. Runs inside a worker process.
+
+    Returns a dict with the keys: name, ok, elapsed, num_equations, message (and trace, if
+    the run failed).
+
+    :param directory: str
+    :param name: str
+    :param log_dir: str
+    :return: dict
+    """
+    start = time.time()
+    out = {'name': name, 'ok': False, 'elapsed': 0., 'num_equations': 0, 'message': ''}
+    # Worker processes are reused, so clear anything left over from the previous model.
+    Logger.cleanup()
+    try:
+        # Model files may use paths relative to their directory.
+        os.chdir(directory)
+        if not log_dir == '':
+            Logger.register_standard_logs(base_file_name=os.path.join(log_dir, name))
+        python_mod = sfc_gui.module_loader.load_model_module(name, directory)
+        model = python_mod.build_model()
+        model.main()
+        out['ok'] = True
+        out['num_equations'] = len(model.FinalEquationBlock.GetEquationList())
+        out['message'] = model.State
+    except Exception as e:
+        out['message'] = '{0}: {1}'.format(type(e).__name__, str(e))
+        out['trace'] = traceback.format_exc(limit=4)
+    finally:
+        Logger.cleanup()
+    out['elapsed'] = time.time() - start
+    return out
+
+
+def run_batch(directory, log_dir=None, max_workers=None):
+    """
+    Run all model files in directory; returns a list of result dicts (see run_model_file),
+    sorted by model name.
+
+    :param directory: str
+    :param log_dir: str
+    :param max_workers: int
+    :return: list
+    """
+    directory = os.path.abspath(directory)
+    if log_dir is None:
+        log_dir = get_default_log_dir(directory)
+    elif not log_dir == '':
+        log_dir = os.path.abspath(log_dir)
+    names = sfc_gui.module_loader.list_model_files(directory)
+    names.sort()
+    results = []
+    if len(names) == 0:
+        return results
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for name in names:
+            futures[pool.submit(run_model_file, directory, name, log_dir)] = name
+        for fut in as_completed(futures):
+            try:
+                results.append(fut.result())
+            except Exception as e:
+                # The worker process itself died (not just the model).
+                results.append({'name': futures[fut], 'ok': False, 'elapsed': 0.,
+                                'num_equations': 0,
+                                'message': '{0}: {1}'.format(type(e).__name__, str(e))})
+    results.sort(key=lambda x: x['name'])
+    if not log_dir == '':
+        write_summary(os.path.join(log_dir, 'batch_summary.txt'), results)
+    return results
+
+
+def write_summary(fname, results):
+    """
+    Write a tab-delimited summary of batch results.
+    :param fname: str
+    :param results: list
+    :return:
+    """
+    with open(fname, 'w') as f:
+        f.write('\t'.join(('name', 'ok', 'elapsed', 'num_equations', 'message')) + '\n')
+        for res in results:
+            f.write('{0}\t{1}\t{2:.3f}\t{3}\t{4}\n'.format(res['name'], res['ok'], res['elapsed'],
+                                                          res['num_equations'], res['message']))
+            if 'trace' in res:
+                f.write(''.join('#\t' + x + '\n' for x in res['trace'].splitlines()))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sfc_gui.batch',
+                                     description='Build and solve every sfcmod_*.py model in a directory.')
+    parser.add_argument('directory', help='Directory containing the model files')
+    parser.add_argument('--logdir', default=None,
+                        help="Log directory (default: <directory>/output, if it exists)")
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
+    args = parser.parse_args(argv)
+    results = run_batch(args.directory, log_dir=args.logdir, max_workers=args.workers)
+    num_failed = 0
+    for res in results:
+        if res['ok']:
+            status = 'OK'
+        else:
+            status = 'FAILED'
+            num_failed += 1
+        print('{0:<40} {1:<7} {2:8.2f}s  {3}'.format(res['name'], status, res['elapsed'],
+                                                    res['message']))
+    print('{0} model(s), {1} failed'.format(len(results), num_failed))
+    if num_failed > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
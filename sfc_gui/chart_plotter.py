@@ -20,14 +20,12 @@ limitations under the License.
 
 import sys
 
-import matplotlib
-matplotlib.use('TKagg')
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2TkAgg
-from matplotlib.figure import Figure
-import matplotlib.pyplot
 from sfc_models.models import Model
 import sfc_gui.utils as utils
 from sfc_gui.utils import WidgetHolder, Parameters
+from sfc_gui.series_store import SeriesStore
+from sfc_gui.plotting import TimeWindowNavigator, get_padded_limits
+from sfc_gui.tree_sync import TreeSync
 
 if sys.version_info[0] < 3:
     import Tkinter as tk
@@ -76,8 +74,12 @@ class ChartPlotterWindow(tk.Tk):
 
         self.Equation = tk.Entry(content, state=['readonly'], textvariable=self.EquationString)
         self.EntryDescription = tk.Entry(content, state=['readonly',], textvariable=self.DescriptionString)
+        # matplotlib is imported on first use; see utils.
+        import matplotlib.pyplot
+        from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+        from matplotlib.figure import Figure
         self.CanvasFigure = matplotlib.pyplot.figure(1)
-        Fig = matplotlib.figure.Figure(figsize=(7.5, 5), dpi=90)
+        Fig = Figure(figsize=(7.5, 5), dpi=90)
         subplot = Fig.add_subplot(111)
         x = []
         y = []
@@ -178,17 +180,18 @@ class ChartPlotterWindow2(tk.Tk):
         self.TimeAxisVariable = self.TimeSeriesHolder.TimeSeriesName
         if self.TimeAxisVariable not in holder:
             holder[self.TimeAxisVariable] = [0.0, 1.0]
-        self.TimeAxisMinimum = int(self.GetTimeSeries(self.TimeAxisVariable)[0])
+        self.SeriesStore = SeriesStore.FromHolder(holder, self.TimeAxisVariable)
+        self.TimeAxisMinimum = self.SeriesStore.GetTimeAxisMinimum()
         self.TimeRange = None
         self.TimeStart = self.TimeAxisMinimum
-        self.TimeSeriesList = holder.GetSeriesList()
+        self.TimeSeriesList = self.SeriesStore.GetSeriesList()
         # self.SeriesBoxValue.set(value=self.TimeSeriesList)
-        self.WidgetGraph.Data['equationlist'].set(value=self.TimeSeriesList)
+        self.WidgetGraph.SetListBox('equationlist', self.TimeSeriesList)
         self.LastSource = opt
         return holder
 
     def GetTimeSeries(self, series_name):
-        ser = self.TimeSeriesHolder[series_name]
+        ser = self.SeriesStore[series_name]
         return ser
 
     def CreateSettingsFrame(self, widgetholder):
@@ -289,8 +292,6 @@ class ChartPlotterWindow2(tk.Tk):
     def UpdateContentFrame(self):
         # Do the cutoff inside the GUI, as we may switch to alternative
         # time series sources.
-        x = self.GetTimeSeries(self.TimeAxisVariable)
-        # idx = self.WidgetListVariableNames.curselection()
         idx = self.WidgetGraph.Widgets['equationlist'].curselection()
         if len(idx) == 0:
             idx = 0
@@ -298,41 +299,74 @@ class ChartPlotterWindow2(tk.Tk):
             idx = idx[0]
         series_name = self.TimeSeriesList[idx]
         try:
-            y = self.GetTimeSeries(series_name)
+            x, y = self.SeriesStore.GetWindow(series_name, self.TimeStart, self.TimeRange)
         except KeyError:
             return
-        desc = ''
-        eqn = ''
         eqn_str, desc = utils.get_series_info(series_name, self.Model)
         self.WidgetGraph.Data['equation'].set(eqn_str)
         self.WidgetGraph.Data['description'].set(desc)
-        if self.TimeStart > self.TimeAxisMinimum:
-            if self.TimeStart <  self.TimeAxisMinimum + len(x):
-                x = x[self.TimeStart - self.TimeAxisMinimum:]
-                y = y[self.TimeStart - self.TimeAxisMinimum:]
-        if self.TimeRange is not None and len(x) > self.TimeRange:
-            x = x[0:self.TimeRange]
-            y = y[0:self.TimeRange]
-        self.WidgetGraph.GetMatplotlibInfo('graph', 'line').set_data(x,y)
-        # self.Line.set_data(x,y)
-        # Based on stackoverflow "How do I Refresh a matplotlib plot in a Tkinter window?"
-        # self.Canvas = FigureCanvasTkAgg(Fig, master=self)
-        # ax = self.Canvas.figure.gca()
-        # ax.set_xlim(min(x), max(x))
-        # ax.set_ylim(min(y)-1, max(y)+1)
-        # ax.set_xlabel(self.TimeAxisVariable)
-        # self.Canvas.draw()
-
-        canvas = self.WidgetGraph.GetMatplotlibInfo('graph', 'canvas')
-        ax = canvas.figure.gca()
-        ax.set_xlim(min(x), max(x))
-        ax.set_ylim(min(y)-1, max(y)+1)
-        ax.set_xlabel(self.TimeAxisVariable)
-        canvas.draw()
+        # Decimated to the width of the axes
+        self.WidgetGraph.GetMatplotlibInfo('graph', 'plot').SetData(x, y)
+        # Only does a full redraw if the limits change; otherwise, blits the line.
+        x_min, x_max = SeriesStore.GetLimits(x)
+        y_min, y_max = SeriesStore.GetLimits(y)
+        self.WidgetGraph.GetMatplotlibInfo('graph', 'plot').Update((x_min, x_max), (y_min-1, y_max+1),
+                                                                   self.TimeAxisVariable)
+
+
+class SweepPlotterWindow(tk.Toplevel):
+    def __init__(self, parent, results):
+        """
+        Overlays the scenarios of a parameter sweep; one line per scenario.
+
+        :param parent: Tk (the application root)
+        :param results: sfc_gui.sweep.SweepResults
+        """
+        tk.Toplevel.__init__(self, parent)
+        self.wm_title('sfc_models Sweep Plotter')
+        self.Results = results
+        self.TimeSeriesList = results.GetSeriesList()
+        self.WidgetGraph = WidgetHolder()
+        content = ttk.Frame(self, borderwidth=5, relief='sunken')
+        widgetholder = self.WidgetGraph
+        widgetholder.AddListBox(content, 'equationlist', height=30, callback=self.OnListEvent)
+        widgetholder.AddEntry(content, 'equation', readonly=True)
+        # Reuses the line artists, decimates, and blits (plotting.MultiLinePlot).
+        widgetholder.AddMultiPlot(content, 'graph')
+        button = tk.Button(content, text='Close', command=self.destroy)
+        content.grid(column=0, row=0, sticky=('N', 'S', 'E', 'W'))
+        widgetholder.Widgets['equationlist'].grid(row=0, column=0, rowspan=3, sticky=['n', 'w', 'e', 's'])
+        widgetholder.Widgets['equation'].grid(row=0, column=1, columnspan=4, sticky=['w', 'e'])
+        button.grid(column=5, row=0)
+        widgetholder.GetMatplotlibInfo('graph', 'canvas').get_tk_widget().grid(column=1, row=2,
+                                        columnspan=5, sticky=['n', 's', 'e', 'w'])
+        content.columnconfigure(2, weight=1)
+        content.rowconfigure(2, weight=1)
+        widgetholder.SetListBox('equationlist', self.TimeSeriesList)
+        self.resizable(width=True, height=True)
+
+    def OnListEvent(self, event):
+        self.UpdateContentFrame()
+
+    def UpdateContentFrame(self):
+        series_name = self.WidgetGraph.GetListBox('equationlist')
+        if series_name is None:
+            return
+        variants = self.Results.GetSeries(series_name)
+        if len(variants) == 0:
+            return
+        self.WidgetGraph.Data['equation'].set('{0}: {1} scenario(s)'.format(series_name,
+                                                                           len(variants)))
+        self.WidgetGraph.GetMatplotlibInfo('graph', 'plot').Update(variants, 'overlay',
+                                                                   self.Results.TimeAxisVariable)
 
 
 # Try again; this time as a Frame
 class ChartPlotterFrame(ttk.Frame):
+    # Radio button text: MultiLinePlot mode
+    PlotModes = ('Overlay', 'Small Multiples')
+    PlotModeCodes = {'Overlay': 'overlay', 'Small Multiples': 'grid'}
+
     def __init__(self, parent, parameters=None):
         ttk.Frame.__init__(self, parent)
         self.Parameters = utils.Parameters()
@@ -346,18 +380,57 @@ class ChartPlotterFrame(ttk.Frame):
                                 height=self.Parameters.MinHeight)
         widgetholder = self.WidgetHolder
         widgetholder.AddButton(self, 'closer', 'Close', command=self.OnClose)
-        widgetholder.AddListBox(self, 'equationlist', height=30)
+        # Multi-select: several series are shown together (overlay or small multiples).
+        widgetholder.AddListBox(self, 'equationlist', height=30, single_select=False)
+        # Country -> sector -> variable tree; shown instead of the list when there is no filter.
+        # Rows are only created when a node is expanded (TreeSync).
+        widgetholder.AddTree(self, 'seriestree', columns=())
+        series_tree = widgetholder.Widgets['seriestree']
+        series_tree.heading('#0', text='Series')
+        self.TreeSync = TreeSync(series_tree)
+        series_tree.bind('<<TreeviewOpen>>', self.OnTreeOpen)
+        series_tree.bind('<<TreeviewClose>>', self.OnTreeClose)
+        series_tree.bind('<<TreeviewSelect>>', self.OnTreeSelect)
+        series_tree.bind('<Double-1>', self.OnPlotNode)
+        # The series being plotted (from the list, the tree, or a bulk action).
+        self.SelectedSeries = []
+        # Type-ahead filter of the series list ('^' at the start: prefix match).
+        filter_frame = ttk.Frame(self)
+        label_filter = ttk.Label(filter_frame, text='Filter:')
+        widgetholder.AddEntry(filter_frame, 'series_filter')
+        widgetholder.Widgets['series_filter'].bind('<KeyRelease>', self.OnFilterChanged)
+        widgetholder.AddVariableLabel(filter_frame, 'series_count')
         button = ttk.Button(self, text='Settings', command=self.OnSettings)
         widgetholder.AddEntry(self, 'equation', readonly=True)
         widgetholder.AddEntry(self, 'description', readonly=True)
-        widgetholder.AddMatplotLib(self, 'graph')
+        widgetholder.AddMultiPlot(self, 'graph')
         widgetholder.Widgets['equationlist'].bind('<<ListboxSelect>>', self.OnListEvent)
+        mode_frame = ttk.Frame(self)
+        widgetholder.AddRadioButtons(mode_frame, 'plotmode', self.PlotModes)
+        widgetholder.Data['plotmode'].set(self.PlotModes[0])
+        for pos in range(0, len(self.PlotModes)):
+            widgetholder.Widgets['plotmode'][pos].configure(command=self.Update)
+            widgetholder.Widgets['plotmode'][pos].grid(row=0, column=pos, sticky='w')
+        hint = ttk.Label(mode_frame, text='Graph: scroll to zoom, drag to pan, double click for all')
+        hint.grid(row=1, column=0, columnspan=len(self.PlotModes), sticky='w')
+        widgetholder.AddButton(mode_frame, 'plot_node', 'Plot All in Node', command=self.OnPlotNode)
+        widgetholder.Widgets['plot_node'].grid(row=2, column=0, sticky='w')
+        # Zoom/pan re-slices through Parameters.GetWindow(); redraws are throttled with after().
+        self.Navigator = TimeWindowNavigator(widgetholder.GetMatplotlibInfo('graph', 'canvas'),
+                                             self.Parameters, self.Update, schedule=self.after)
         # Need to give the Parameters object the equationlist widget
         self.Parameters.TimeSeriesWidget = widgetholder.Data['equationlist']
         # Gridding
         self.grid(column=0, row=0, sticky=('N', 'S', 'E', 'W'))
         inner_frame.grid(row=0, column=0, rowspan=5, columnspan=3, sticky=('N', 'S', 'E', 'W'))
-        widgetholder.Widgets['equationlist'].grid(row=0, column=0, columnspan=1, rowspan=3, sticky=['n', 'w', 'e', 'S'])
+        filter_frame.grid(row=0, column=0, sticky=['w', 'e'])
+        label_filter.grid(row=0, column=0)
+        widgetholder.Widgets['series_filter'].grid(row=0, column=1, sticky=['w', 'e'])
+        widgetholder.Widgets['series_count'].grid(row=0, column=2)
+        filter_frame.columnconfigure(1, weight=1)
+        widgetholder.Widgets['equationlist'].grid(row=1, column=0, columnspan=1, rowspan=2, sticky=['n', 'w', 'e', 'S'])
+        series_tree.grid(row=1, column=0, columnspan=1, rowspan=2, sticky=['n', 'w', 'e', 'S'])
+        mode_frame.grid(row=3, column=0, sticky='w')
         button.grid(column=5, row=0)
         widgetholder.Widgets['closer'].grid(column=6, row=0)
         widgetholder.Widgets['description'].grid(row=0, column=1, columnspan=4, sticky=['w','e'])
@@ -369,40 +442,104 @@ class ChartPlotterFrame(ttk.Frame):
         self.columnconfigure(4, weight=1)
         self.rowconfigure(2, weight=1)
         self.UpdateEquationList()
+        self.ShowListView(len(self.Parameters.SeriesFilter.strip()) > 0)
 
     def UpdateEquationList(self):
         self.WidgetHolder.SetListBox('equationlist', self.Parameters.TimeSeriesList)
+        # Only the blocks that changed are touched (for example, after a change of source).
+        for parent, rows in self.Parameters.SeriesHierarchy.GetTreeBlocks():
+            self.TreeSync.SyncBlock(parent, rows)
+        self.UpdateSeriesCount()
+
+    def ShowListView(self, show_list):
+        """
+        Show the (filtered) flat list, or the series tree.
+        :param show_list: bool
+        :return:
+        """
+        if show_list:
+            self.WidgetHolder.Widgets['seriestree'].grid_remove()
+            self.WidgetHolder.Widgets['equationlist'].grid()
+        else:
+            self.WidgetHolder.Widgets['equationlist'].grid_remove()
+            self.WidgetHolder.Widgets['seriestree'].grid()
+
+    def OnFilterChanged(self, event=None):
+        query = self.WidgetHolder.Data['series_filter'].get()
+        if query == self.Parameters.SeriesFilter:
+            # Cursor keys and the like.
+            return
+        # Narrows the list with the index; the order of the list is kept, so nothing is sorted.
+        self.Parameters.SetSeriesFilter(query)
+        self.ShowListView(len(query.strip()) > 0)
+        self.UpdateSeriesCount()
+
+    def OnTreeOpen(self, event):
+        self.TreeSync.Materialize(self.WidgetHolder.Widgets['seriestree'].focus())
+
+    def OnTreeClose(self, event):
+        self.TreeSync.Evict(self.WidgetHolder.Widgets['seriestree'].focus())
+
+    def OnTreeSelect(self, event=None):
+        # Group nodes are skipped; they are plotted with OnPlotNode().
+        hierarchy = self.Parameters.SeriesHierarchy
+        series = [x for x in self.WidgetHolder.Widgets['seriestree'].selection()
+                  if x in self.TreeSync.Parent and not hierarchy.IsGroup(x)]
+        if len(series) > 0:
+            self.ShowSeries(series)
+
+    def OnPlotNode(self, event=None):
+        """
+        Bulk action: plot every series under the selected tree node (such as all the variables
+        of a sector).
+        :return:
+        """
+        code = self.WidgetHolder.Widgets['seriestree'].focus()
+        hierarchy = self.Parameters.SeriesHierarchy
+        if code == '' or not hierarchy.IsGroup(code):
+            return
+        self.ShowSeries(hierarchy.GetSeries(code))
+
+    def ShowSeries(self, series_names):
+        """
+        Plot a list of series.
+        :param series_names: list
+        :return:
+        """
+        self.SelectedSeries = list(series_names)
+        self.Update()
+
+    def UpdateSeriesCount(self):
+        series_list = self.WidgetHolder.Data['equationlist']
+        if len(series_list.Visible) == len(series_list.Items):
+            self.WidgetHolder.Data['series_count'].set('{0}'.format(len(series_list.Items)))
+        else:
+            self.WidgetHolder.Data['series_count'].set(
+                '{0} of {1}'.format(len(series_list.Visible), len(series_list.Items)))
 
     def Update(self):
         # Do the cutoff inside the GUI, as we may switch to alternative
         # time series sources.
-        x = self.Parameters.GetTimeSeries(self.Parameters.TimeAxisVariable)
-        # idx = self.WidgetListVariableNames.curselection()
-        varname = self.WidgetHolder.GetListBox('equationlist')
-        if varname is None:
-            return
-        try:
-            y = self.Parameters.GetTimeSeries(varname)
-        except KeyError:
+        series = []
+        for varname in self.SelectedSeries:
+            try:
+                x, y = self.Parameters.GetWindow(varname)
+            except KeyError:
+                continue
+            series.append((varname, x, y))
+        if len(series) == 0:
             return
-        eqn_str, desc = utils.get_series_info(varname, self.Parameters.Model)
+        if len(series) == 1:
+            eqn_str, desc = self.Parameters.GetSeriesInfo(series[0][0])
+        else:
+            eqn_str = ', '.join([x[0] for x in series])
+            desc = '{0} series selected'.format(len(series))
         self.WidgetHolder.Data['equation'].set(eqn_str)
         self.WidgetHolder.Data['description'].set(desc)
-        if self.Parameters.TimeStart > self.Parameters.TimeAxisMinimum:
-            if self.Parameters.TimeStart <  self.Parameters.TimeAxisMinimum + len(x):
-                x = x[self.Parameters.TimeStart - self.Parameters.TimeAxisMinimum:]
-                y = y[self.Parameters.TimeStart - self.Parameters.TimeAxisMinimum:]
-        if self.Parameters.TimeRange is not None and len(x) > self.Parameters.TimeRange:
-            x = x[0:self.Parameters.TimeRange]
-            y = y[0:self.Parameters.TimeRange]
-        self.WidgetHolder.GetMatplotlibInfo('graph', 'line').set_data(x,y)
-        # Based on stackoverflow "How do I Refresh a matplotlib plot in a Tkinter window?"
-        canvas = self.WidgetHolder.GetMatplotlibInfo('graph', 'canvas')
-        ax = canvas.figure.gca()
-        ax.set_xlim(min(x), max(x)+1)
-        ax.set_ylim(min(y), max(y) + .1)
-        ax.set_xlabel(self.Parameters.TimeAxisVariable)
-        canvas.draw()
+        mode = self.PlotModeCodes[self.WidgetHolder.Data['plotmode'].get()]
+        # Only does a full redraw if the layout or limits change; otherwise, blits the lines.
+        self.WidgetHolder.GetMatplotlibInfo('graph', 'plot').Update(
+            series, mode, self.Parameters.TimeAxisVariable)
 
     def OnSettings(self):
         self.OnSettingsCallback()
@@ -411,8 +548,69 @@ class ChartPlotterFrame(ttk.Frame):
         print('Must set self.OnSettingsCallback')
 
     def OnListEvent(self, event):
+        self.ShowSeries(self.WidgetHolder.GetListBox('equationlist'))
+
+    def OnClose(self):
+        self.destroy()
+
+
+class ConvergenceFrame(ttk.Frame):
+    def __init__(self, parent, profile, mod=None, num_slowest=20):
+        """
+        Convergence profile: iterations per period, and the slowest-converging variables.
+
+        :param parent:
+        :param profile: sfc_gui.convergence.ConvergenceProfile
+        :param mod: Model (for the variable descriptions)
+        :param num_slowest: int
+        """
+        ttk.Frame.__init__(self, parent)
+        self.Profile = profile
+        self.Model = mod
+        self.NumSlowest = num_slowest
+        self.WidgetHolder = WidgetHolder()
+        widgetholder = self.WidgetHolder
+        widgetholder.AddButton(self, 'closer', 'Close', command=self.OnClose)
+        widgetholder.AddVariableLabel(self, 'summary')
+        widgetholder.Widgets['summary'].configure(justify='left')
+        widgetholder.AddMatplotLib(self, 'graph')
+        widgetholder.AddTree(self, 'slowest', columns=('mean', 'max', 'period', 'description'))
+        tree = widgetholder.Widgets['slowest']
+        tree.heading('#0', text='Variable')
+        tree.heading('mean', text='Mean Settling Iteration')
+        tree.heading('max', text='Max')
+        tree.heading('period', text='Period of Max')
+        tree.heading('description', text='Description')
+        for col in ('mean', 'max', 'period'):
+            tree.column(col, width=90, anchor='e')
+        tree.column('description', width=300)
+        self.grid(column=0, row=0, sticky=('N', 'S', 'E', 'W'))
+        widgetholder.Widgets['summary'].grid(row=0, column=0, sticky=('W',))
+        widgetholder.Widgets['closer'].grid(row=0, column=1, sticky=('N', 'E'))
+        widgetholder.GetMatplotlibInfo('graph', 'canvas').get_tk_widget().grid(row=1, column=0,
+                                        columnspan=2, sticky=['n', 's', 'e', 'w'])
+        tree.grid(row=2, column=0, columnspan=2, sticky=('N', 'S', 'E', 'W'))
+        self.columnconfigure(0, weight=1)
+        self.rowconfigure(1, weight=1)
         self.Update()
 
+    def Update(self):
+        self.WidgetHolder.Data['summary'].set('\n'.join(self.Profile.GetSummary(0)))
+        periods, iterations = self.Profile.GetIterations()
+        line = self.WidgetHolder.GetMatplotlibInfo('graph', 'line')
+        line.set_data(periods, iterations)
+        line.axes.set_ylabel('iterations')
+        xlim, ylim = get_padded_limits(periods, iterations)
+        self.WidgetHolder.GetMatplotlibInfo('graph', 'plot').Update(xlim, ylim, 'period')
+        self.WidgetHolder.DeleteTreeChildren('slowest', '')
+        tree = self.WidgetHolder.Widgets['slowest']
+        for name, mean, max_settling, step in self.Profile.GetSlowestVariables(self.NumSlowest):
+            desc = ''
+            if self.Model is not None:
+                desc = utils.get_series_info(name, self.Model)[1]
+            tree.insert('', 'end', text=name,
+                        values=('{0:.1f}'.format(mean), max_settling, step, desc))
+
     def OnClose(self):
         self.destroy()
 
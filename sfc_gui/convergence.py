@@ -0,0 +1,272 @@
+# coding=utf-8
+"""
+convergence.py
+
+Solver convergence profiling, built on the convergence trace (EquationSolver.TimeSeriesStepTrace).
+
+The solver only traces one period (EquationSolver.TraceStep). The trace has one entry per
+iteration: 'iteration', 'iteration_error' (the sum of relative changes that the solver compares
+to its tolerance), 'iteration_abs_change', and the value of every variable at the start of the
+iteration. StepProfile.FromTrace() reduces a trace to:
+    - the number of iterations;
+    - the error decay rate: the average factor by which iteration_error shrinks per iteration
+      (fitted to log(error); below 1 means converging, the closer to 1, the slower);
+    - the settling iteration of each variable: the last iteration at which its value still
+      moved by more than the tolerance (relative to its final value, or absolute if that is
+      below 1). The variables that settle last hold up convergence.
+
+ConvergenceProfiler traces every period of a run. It wraps the solver's SolveStep() so that each
+period is traced in turn, and keeps only the StepProfile of each period. The trace of the
+period that the user asked for (TraceStep) is left in place, as if there were no profiler.
+Tracing every period is slower (and the trace is written to the 'step' log for every period,
+if that log is enabled), so profiling is only switched on when asked for.
+
+Command line:
+    python -m sfc_gui.convergence <model file> [--top N] [--tolerance TOL]
+"""
+from __future__ import print_function
+
+import argparse
+import math
+import os
+import sys
+
+trace_series = ('iteration', 'iteration_error', 'iteration_abs_change')
+
+
+def get_decay_rate(errors):
+    """
+    Average factor by which the errors shrink per iteration: exp(slope) of a least squares fit
+    of log(error) against the iteration number. Returns None if there are fewer than two positive
+    errors.
+
+    :param errors: list
+    :return: float
+    """
+    points = [(i, math.log(e)) for i, e in enumerate(errors) if e > 0. and not math.isnan(e)]
+    if len(points) < 2:
+        return None
+    n = float(len(points))
+    mean_x = sum(p[0] for p in points) / n
+    mean_y = sum(p[1] for p in points) / n
+    sxx = sum((p[0] - mean_x) ** 2 for p in points)
+    sxy = sum((p[0] - mean_x) * (p[1] - mean_y) for p in points)
+    return math.exp(sxy / sxx)
+
+
+def get_settling_iteration(values, tolerance=1e-6):
+    """
+    Last iteration at which the value moved by more than tolerance * max(1, |final value|);
+    0 if it never moved.
+
+    :param values: list
+    :param tolerance: float
+    :return: int
+    """
+    if len(values) < 2:
+        return 0
+    threshold = tolerance * max(1., abs(values[-1]))
+    for pos in range(len(values) - 1, 0, -1):
+        if abs(values[pos] - values[pos - 1]) > threshold:
+            return pos
+    return 0
+
+
+class StepProfile(object):
+    def __init__(self, step, num_iterations, final_error, decay_rate, settling):
+        """
+        Usually created with StepProfile.FromTrace().
+
+        :param step: int
+        :param num_iterations: int
+        :param final_error: float
+        :param decay_rate: float
+        :param settling: dict {variable: settling iteration}
+        """
+        self.Step = step
+        self.NumIterations = num_iterations
+        self.FinalError = final_error
+        self.DecayRate = decay_rate
+        self.Settling = settling
+
+    @staticmethod
+    def FromTrace(trace, step=None, tolerance=1e-6):
+        """
+        Summarize a convergence trace.
+
+        :param trace: TimeSeriesHolder (or any dict-like of series, such as a SeriesStore)
+        :param step: int
+        :param tolerance: float
+        :return: StepProfile
+        """
+        errors = [float(x) for x in trace['iteration_error']]
+        # The first entry is the starting value (1.0), not a measured error.
+        final_error = None
+        if len(errors) > 1:
+            final_error = errors[-1]
+        settling = {}
+        for name in trace.keys():
+            if name in trace_series:
+                continue
+            try:
+                values = [float(x) for x in trace[name]]
+            except (TypeError, ValueError):
+                continue
+            settling[name] = get_settling_iteration(values, tolerance)
+        return StepProfile(step, len(errors), final_error, get_decay_rate(errors[1:]), settling)
+
+    def GetSlowest(self, num=10):
+        """
+        The num variables that settle last: list of (variable, settling iteration).
+        :param num: int
+        :return: list
+        """
+        out = [(v, k) for k, v in self.Settling.items() if v > 0]
+        out.sort(reverse=True)
+        return [(k, v) for v, k in out[0:num]]
+
+
+class ConvergenceProfile(object):
+    """
+    StepProfile objects for a run, in period order.
+    """
+    def __init__(self):
+        self.Steps = []
+
+    def AddStep(self, step_profile):
+        self.Steps.append(step_profile)
+
+    def GetIterations(self):
+        """
+        ([period], [number of iterations])
+        :return: tuple
+        """
+        return [x.Step for x in self.Steps], [x.NumIterations for x in self.Steps]
+
+    def GetWorstStep(self):
+        """
+        The StepProfile with the most iterations (a good choice for TraceStep), or None.
+        :return: StepProfile
+        """
+        if len(self.Steps) == 0:
+            return None
+        return max(self.Steps, key=lambda x: x.NumIterations)
+
+    def GetSlowestVariables(self, num=10):
+        """
+        Variables ranked by their mean settling iteration across periods.
+
+        Returns a list of (variable, mean settling iteration, max settling iteration, period
+        with the max).
+
+        :param num: int
+        :return: list
+        """
+        total = {}
+        worst = {}
+        for prof in self.Steps:
+            for name, settling in prof.Settling.items():
+                total[name] = total.get(name, 0) + settling
+                if name not in worst or settling > worst[name][0]:
+                    worst[name] = (settling, prof.Step)
+        num_steps = float(max(len(self.Steps), 1))
+        out = [(total[x] / num_steps, x) for x in total if total[x] > 0]
+        out.sort(reverse=True)
+        return [(x, mean, worst[x][0], worst[x][1]) for mean, x in out[0:num]]
+
+    def GetSummary(self, num=10):
+        """
+        Summary as a list of lines of text.
+        :param num: int
+        :return: list
+        """
+        if len(self.Steps) == 0:
+            return ['No periods profiled.']
+        periods, iterations = self.GetIterations()
+        rates = [x.DecayRate for x in self.Steps if x.DecayRate is not None]
+        worst = self.GetWorstStep()
+        out = ['Periods: {0}  Iterations: {1} total, {2:.1f} mean, {3} max (period {4})'.format(
+            len(periods), sum(iterations), sum(iterations) / float(len(periods)),
+            worst.NumIterations, worst.Step)]
+        if len(rates) > 0:
+            out.append('Error decay rate per iteration: {0:.3f} mean, {1:.3f} slowest'.format(
+                sum(rates) / len(rates), max(rates)))
+        out.append('Slowest-converging variables (mean/max settling iteration, period):')
+        for name, mean, max_settling, step in self.GetSlowestVariables(num):
+            out.append('    {0:<30} {1:8.1f} {2:6d}  {3}'.format(name, mean, max_settling, step))
+        return out
+
+
+class ConvergenceProfiler(object):
+    def __init__(self, solver, tolerance=1e-6):
+        """
+        Call Attach() before the model is solved.
+
+        :param solver: EquationSolver
+        :param tolerance: float (for the settling iterations)
+        """
+        self.Solver = solver
+        self.Tolerance = tolerance
+        self.Profile = ConvergenceProfile()
+        self.OriginalSolveStep = None
+        self.UserTraceStep = None
+        self.UserTrace = None
+
+    def Attach(self):
+        if self.OriginalSolveStep is not None:
+            return
+        self.OriginalSolveStep = self.Solver.SolveStep
+        self.UserTraceStep = self.Solver.TraceStep
+        self.UserTrace = self.Solver.TimeSeriesStepTrace
+        # An instance attribute hides the method. (If the solver is copied to find the initial
+        # steady state, the copy is profiled too, but its profile is thrown away.)
+        self.Solver.SolveStep = self.SolveStep
+
+    def Detach(self):
+        if self.OriginalSolveStep is None:
+            return
+        del self.Solver.SolveStep
+        self.OriginalSolveStep = None
+
+    def SolveStep(self, step):
+        self.Solver.TraceStep = step
+        try:
+            self.OriginalSolveStep(step)
+        finally:
+            trace = self.Solver.TimeSeriesStepTrace
+            if len(trace.get('iteration', [])) > 0:
+                self.Profile.AddStep(StepProfile.FromTrace(trace, step, self.Tolerance))
+            if step == self.UserTraceStep:
+                self.UserTrace = trace
+            self.Solver.TraceStep = self.UserTraceStep
+            self.Solver.TimeSeriesStepTrace = self.UserTrace
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sfc_gui.convergence',
+                                     description='Profile the convergence of the solver, period by period.')
+    parser.add_argument('model_file', help='Model file (must define build_model())')
+    parser.add_argument('--top', type=int, default=10, help='Number of slow variables to list')
+    parser.add_argument('--tolerance', type=float, default=1e-6,
+                        help='Relative tolerance for the settling iteration of a variable')
+    args = parser.parse_args(argv)
+    from sfc_models.utils import Logger
+    import sfc_gui.module_loader
+    Logger.cleanup()
+    fpath = os.path.abspath(args.model_file)
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    python_mod = sfc_gui.module_loader.loader(name, fpath)
+    model = python_mod.build_model()
+    profiler = ConvergenceProfiler(model.EquationSolver, args.tolerance)
+    profiler.Attach()
+    try:
+        model.main()
+    finally:
+        profiler.Detach()
+    for line in profiler.Profile.GetSummary(args.top):
+        print(line)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
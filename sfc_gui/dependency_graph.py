@@ -0,0 +1,329 @@
+# coding=utf-8
+"""
+dependency_graph.py
+
+Dependency graph of the final equations of a model: which variables each equation refers to.
+
+The references are found by tokenizing the right hand side of each equation
+(eqn.GetRightHandSide()): every name that is also a variable of the block is a reference. A
+reference with a lag, such as 'HH__F(k-1)', is a lagged reference; it is kept apart, since it
+is known at the start of the period and does not tie the equations together within a period.
+Names that are not variables (functions such as exp(), the time axis k) are ignored.
+
+On that graph (current period references only):
+    - GetUpstream()/GetDownstream() give the full closure of a variable: every variable that
+      it depends on (directly or indirectly), or that depends on it, with the distance (number
+      of references on the shortest path).
+    - GetComponents() gives the strongly connected components (Tarjan's algorithm, iterative,
+      so that long chains do not hit the recursion limit), in dependency order. A component
+      with more than one variable (or a variable that refers to itself) is a simultaneous
+      block: its equations have to be solved together, and they drive the cost of the solver.
+    - GetStatistics() summarizes the size of the graph.
+
+Update() re-parses only the equations whose right hand side changed, and everything else is
+computed when first asked for, so the graph can be refreshed after every model step.
+"""
+
+import re
+
+# A name, and an optional lag such as (k-1).
+_reference = re.compile(r'(?<![\w.])([A-Za-z_]\w*)(\s*\(\s*k\s*-\s*\d+\s*\))?')
+
+
+def get_references(rhs):
+    """
+    Names in a right hand side: (set of current period names, set of lagged names).
+
+    :param rhs: str
+    :return: tuple
+    """
+    current = set()
+    lagged = set()
+    for name, lag in _reference.findall(rhs):
+        if lag:
+            lagged.add(name)
+        else:
+            current.add(name)
+    return current, lagged
+
+
+def get_closure(start, edges):
+    """
+    Variables reachable from start along edges (dict var -> set of vars), with their distance,
+    as a dict. The start is only included if it is on a cycle.
+
+    :param start: str
+    :param edges: dict
+    :return: dict
+    """
+    out = {}
+    frontier = [start]
+    distance = 0
+    while len(frontier) > 0:
+        distance += 1
+        next_frontier = []
+        for var in frontier:
+            for other in edges.get(var, ()):
+                if other not in out:
+                    out[other] = distance
+                    next_frontier.append(other)
+        frontier = next_frontier
+    return out
+
+
+def get_strong_components(nodes, edges):
+    """
+    Strongly connected components (Tarjan), as lists of variables. A component comes after all
+    of the components that it has edges to; with edges from a variable to the variables it
+    depends on, that is dependency order.
+
+    :param nodes: list
+    :param edges: dict var -> set of vars
+    :return: list
+    """
+    index = {}
+    lowlink = {}
+    on_stack = set()
+    stack = []
+    out = []
+    counter = 0
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = lowlink[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        # (node, iterator over its edges)
+        work = [(root, iter(edges.get(root, ())))]
+        while len(work) > 0:
+            node, children = work[-1]
+            descended = False
+            for child in children:
+                if child not in index:
+                    index[child] = lowlink[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(edges.get(child, ()))))
+                    descended = True
+                    break
+                elif child in on_stack:
+                    lowlink[node] = min(lowlink[node], index[child])
+            if descended:
+                continue
+            work.pop()
+            if len(work) > 0:
+                parent = work[-1][0]
+                lowlink[parent] = min(lowlink[parent], lowlink[node])
+            if lowlink[node] == index[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                component.sort()
+                out.append(component)
+    return out
+
+
+class DependencyGraph(object):
+    def __init__(self):
+        # variable -> right hand side (as parsed)
+        self.Equations = {}
+        # variable -> set of variables it refers to, current period / lagged
+        self.Upstream = {}
+        self.LaggedUpstream = {}
+        # Reverse edges, and the components; built when first needed.
+        self._Downstream = None
+        self._LaggedDownstream = None
+        self._Components = None
+        self._ComponentOf = None
+        # Names in each right hand side, before filtering against the variables (parse cache).
+        self._Names = {}
+
+    def __len__(self):
+        return len(self.Equations)
+
+    def __contains__(self, varname):
+        return varname in self.Equations
+
+    @staticmethod
+    def FromEquationBlock(block):
+        """
+        :param block: EquationBlock (such as Model.FinalEquationBlock)
+        :return: DependencyGraph
+        """
+        out = DependencyGraph()
+        out.UpdateFromBlock(block)
+        return out
+
+    def UpdateFromBlock(self, block):
+        equations = {}
+        for varname in block.GetEquationList():
+            equations[varname] = block[varname].GetRightHandSide()
+        self.Update(equations)
+
+    def Update(self, equations):
+        """
+        Replace the equations (dict variable -> right hand side). Only right hand sides that
+        changed are tokenized again.
+
+        :param equations: dict
+        :return:
+        """
+        names = {}
+        for varname, rhs in equations.items():
+            cached = self._Names.get(varname)
+            if cached is not None and self.Equations.get(varname) == rhs:
+                names[varname] = cached
+            else:
+                names[varname] = get_references(rhs)
+        self.Equations = dict(equations)
+        self._Names = names
+        self.Upstream = {}
+        self.LaggedUpstream = {}
+        for varname, (current, lagged) in names.items():
+            self.Upstream[varname] = set(x for x in current if x in equations)
+            self.LaggedUpstream[varname] = set(x for x in lagged if x in equations)
+        self._Downstream = None
+        self._LaggedDownstream = None
+        self._Components = None
+        self._ComponentOf = None
+
+    def GetDownstreamEdges(self, lagged=False):
+        """
+        Reverse edges: variable -> set of variables that refer to it.
+        :param lagged: bool
+        :return: dict
+        """
+        if self._Downstream is None:
+            self._Downstream = self._Reverse(self.Upstream)
+            self._LaggedDownstream = self._Reverse(self.LaggedUpstream)
+        if lagged:
+            return self._LaggedDownstream
+        return self._Downstream
+
+    @staticmethod
+    def _Reverse(edges):
+        out = {}
+        for varname, refs in edges.items():
+            for ref in refs:
+                if ref not in out:
+                    out[ref] = set()
+                out[ref].add(varname)
+        return out
+
+    def GetUpstream(self, varname, include_lagged=False):
+        """
+        Every variable that varname depends on, directly or indirectly: dict variable -> distance.
+
+        :param varname: str
+        :param include_lagged: bool (also follow lagged references)
+        :return: dict
+        """
+        edges = self.Upstream
+        if include_lagged:
+            edges = self._Merge(self.Upstream, self.LaggedUpstream)
+        return get_closure(varname, edges)
+
+    def GetDownstream(self, varname, include_lagged=False):
+        """
+        Every variable that depends on varname, directly or indirectly: dict variable -> distance.
+
+        :param varname: str
+        :param include_lagged: bool (also follow lagged references)
+        :return: dict
+        """
+        edges = self.GetDownstreamEdges()
+        if include_lagged:
+            edges = self._Merge(edges, self.GetDownstreamEdges(lagged=True))
+        return get_closure(varname, edges)
+
+    @staticmethod
+    def _Merge(edges, more_edges):
+        out = dict((k, set(v)) for k, v in edges.items())
+        for varname, refs in more_edges.items():
+            out[varname] = out.get(varname, set()) | refs
+        return out
+
+    def GetComponents(self):
+        """
+        Strongly connected components of the current period graph, in dependency order (a
+        component only depends on components before it).
+        :return: list
+        """
+        if self._Components is None:
+            self._Components = get_strong_components(sorted(self.Equations), self.Upstream)
+            self._ComponentOf = {}
+            for pos, component in enumerate(self._Components):
+                for varname in component:
+                    self._ComponentOf[varname] = pos
+        return self._Components
+
+    def GetComponent(self, varname):
+        """
+        The strongly connected component that contains varname (a list of variables).
+        :param varname: str
+        :return: list
+        """
+        self.GetComponents()
+        return self._Components[self._ComponentOf[varname]]
+
+    def IsSimultaneous(self, component):
+        """
+        Do the equations of a component have to be solved together? (More than one variable, or
+        a variable that refers to itself.)
+        :param component: list
+        :return: bool
+        """
+        return len(component) > 1 or component[0] in self.Upstream.get(component[0], ())
+
+    def GetBlocks(self):
+        """
+        Simultaneous blocks, largest first.
+        :return: list
+        """
+        out = [x for x in self.GetComponents() if self.IsSimultaneous(x)]
+        out.sort(key=lambda x: (-len(x), x[0]))
+        return out
+
+    def GetDepth(self):
+        """
+        Length of the longest chain of components (each one depending on the one before).
+        :return: int
+        """
+        components = self.GetComponents()
+        depth = [1] * len(components)
+        for pos, component in enumerate(components):
+            for varname in component:
+                for ref in self.Upstream[varname]:
+                    other = self._ComponentOf[ref]
+                    if not other == pos:
+                        depth[pos] = max(depth[pos], depth[other] + 1)
+        if len(depth) == 0:
+            return 0
+        return max(depth)
+
+    def GetStatistics(self):
+        """
+        Size of the graph, as a list of (label, value).
+        :return: list
+        """
+        num_edges = sum(len(x) for x in self.Upstream.values())
+        num_lagged = sum(len(x) for x in self.LaggedUpstream.values())
+        blocks = self.GetBlocks()
+        largest = 0
+        if len(blocks) > 0:
+            largest = len(blocks[0])
+        num_exogenous = len([x for x in self.Upstream.values() if len(x) == 0])
+        return [('Variables', len(self.Equations)),
+                ('References', num_edges),
+                ('Lagged references', num_lagged),
+                ('No current references', num_exogenous),
+                ('Simultaneous blocks', len(blocks)),
+                ('Variables in blocks', sum(len(x) for x in blocks)),
+                ('Largest block', largest),
+                ('Longest chain', self.GetDepth())]
@@ -0,0 +1,184 @@
+# coding=utf-8
+"""
+equation_index.py
+
+Search index for the equations shown in the Model Runner's model viewer.
+
+The index is fed the same keyed row snapshots as TreeSync ((code, text, values) tuples per tree
+block, where values is (equation, description) for an equation row), and is updated the same
+way: SyncBlock() diffs the new snapshot against the last one and only re-indexes the rows that
+were added, removed or changed. So the index is built once, on the first step, and each later
+step only costs a dictionary comparison plus the changed equations.
+
+Word search uses an inverted index: every row is split into tokens (lower case words of its name,
+equation and description; names are also split on '_', so that 'V0' finds 'GOV__V0'), and each
+token maps to the set of row codes that contain it. Each word of the query matches any token that
+it is a prefix of (so results can be shown as the user types), and a row must match every word.
+
+Regular expression search (re.search, case insensitive) scans the text of every row; it has no
+index, but is still a single pass over the rows.
+"""
+
+import bisect
+import re
+
+from sfc_gui.tree_sync import diff_rows
+
+_word = re.compile(r'\w+')
+
+
+def get_tokens(text):
+    """
+    Set of lower case tokens in a piece of text: the words, and the parts of words that contain
+    '_'.
+
+    :param text: str
+    :return: set
+    """
+    out = set()
+    for word in _word.findall(text.lower()):
+        out.add(word)
+        if '_' in word:
+            out.update(x for x in word.split('_') if len(x) > 0)
+    return out
+
+
+class EquationIndex(object):
+    def __init__(self):
+        # code -> (text, values)
+        self.Rows = {}
+        # code -> name, equation and description, for regular expression searches
+        self.SearchText = {}
+        # code -> tokens of the name (for ranking)
+        self.NameTokens = {}
+        # token -> set of codes
+        self.Postings = {}
+        # Sorted list of tokens, for prefix lookups; rebuilt on demand after tokens change.
+        self.SortedTokens = None
+        # parent code -> list of child codes
+        self.Order = {}
+
+    def Reset(self):
+        self.__init__()
+
+    def __len__(self):
+        return len(self.Rows)
+
+    def __contains__(self, code):
+        return code in self.Rows
+
+    def SyncBlock(self, parent, rows):
+        """
+        Bring the index in line with the rows of a block (as in TreeSync.SyncBlock()).
+
+        Removed rows take their own blocks (descendants) out of the index with them.
+
+        :param parent: str
+        :param rows: list
+        :return: tuple (added, removed, changed) sets of codes
+        """
+        old_rows = dict((code, self.Rows[code]) for code in self.Order.get(parent, []))
+        new_rows = {}
+        new_order = []
+        for code, text, values in rows:
+            new_rows[code] = (text, tuple(values))
+            new_order.append(code)
+        added, removed, changed = diff_rows(old_rows, new_rows)
+        for code in removed:
+            self._Forget(code)
+        for code in changed:
+            self._Remove(code)
+        for code in added | changed:
+            self._Add(code, *new_rows[code])
+        self.Order[parent] = new_order
+        return added, removed, changed
+
+    def Search(self, query, regex=False):
+        """
+        Codes of the rows that match the query, best first: rows whose name matches come before
+        rows that only match in the equation or description.
+
+        Word search: every word of the query must be the start of a token of the row.
+        Regex search: re.search() on the name, equation and description (case insensitive);
+        raises re.error if the pattern is invalid.
+
+        :param query: str
+        :param regex: bool
+        :return: list
+        """
+        if regex:
+            if len(query) == 0:
+                return []
+            pattern = re.compile(query, re.IGNORECASE)
+            found = [code for code, text in self.SearchText.items() if pattern.search(text)]
+            return sorted(found, key=lambda x: (pattern.search(self.Rows[x][0]) is None,
+                                                self.Rows[x][0].lower(), x))
+        words = _word.findall(query.lower())
+        if len(words) == 0:
+            return []
+        matches = [self.GetPrefixMatches(word) for word in words]
+        matches.sort(key=len)
+        found = set(matches[0])
+        for codes in matches[1:]:
+            found &= codes
+        return sorted(found, key=lambda x: (not self._NameMatches(x, words),
+                                            self.Rows[x][0].lower(), x))
+
+    def GetPrefixMatches(self, prefix):
+        """
+        Set of codes of the rows that have a token starting with prefix.
+        :param prefix: str
+        :return: set
+        """
+        if self.SortedTokens is None:
+            self.SortedTokens = sorted(self.Postings)
+        tokens = self.SortedTokens
+        out = set()
+        pos = bisect.bisect_left(tokens, prefix)
+        while pos < len(tokens) and tokens[pos].startswith(prefix):
+            out.update(self.Postings[tokens[pos]])
+            pos += 1
+        return out
+
+    def _NameMatches(self, code, words):
+        tokens = self.NameTokens[code]
+        for word in words:
+            if not any(x.startswith(word) for x in tokens):
+                return False
+        return True
+
+    def _Add(self, code, text, values):
+        self.Rows[code] = (text, values)
+        full_text = ' '.join((text,) + tuple(str(x) for x in values))
+        self.SearchText[code] = full_text
+        self.NameTokens[code] = get_tokens(text)
+        for token in get_tokens(full_text):
+            if token not in self.Postings:
+                self.Postings[token] = set()
+                self.SortedTokens = None
+            self.Postings[token].add(code)
+
+    def _Remove(self, code):
+        full_text = self.SearchText.pop(code, None)
+        self.Rows.pop(code, None)
+        self.NameTokens.pop(code, None)
+        if full_text is None:
+            return
+        for token in get_tokens(full_text):
+            codes = self.Postings.get(token)
+            if codes is None:
+                continue
+            codes.discard(code)
+            if len(codes) == 0:
+                del self.Postings[token]
+                self.SortedTokens = None
+
+    def _Forget(self, code):
+        """
+        Remove a row and all of its descendants.
+        :param code: str
+        :return:
+        """
+        self._Remove(code)
+        for child in self.Order.pop(code, []):
+            self._Forget(child)
@@ -0,0 +1,122 @@
+# coding=utf-8
+"""
+instrumentation.py
+
+Per-step instrumentation for model runs: wall time and memory for every Model._RunStep() call
+(_GenerateFullSectorCodes, _FixAliases, equation generation, solving, ...), so that the step that
+blows up as a model grows can be found.
+
+Memory is measured with tracemalloc: the peak is the largest amount of memory allocated above
+the level at the start of the step, and 'net' is what is still allocated at the end of the step.
+tracemalloc is process-wide, so the figures include allocations made by other threads (the GUI
+thread) while the step runs. Tracing is switched on only while a step runs, as tracemalloc slows
+down allocation. If something else in the process already traces, it is left alone: tracing is
+not stopped and the peak is not reset, so only the net figure is recorded. Memory is not measured
+under Python 2 (no tracemalloc).
+
+StepTimings.Save() exports the records as JSON or CSV (chosen by the file extension).
+"""
+
+import csv
+import json
+import time
+
+try:
+    import tracemalloc
+except ImportError:
+    tracemalloc = None
+
+# Wall clock timer
+timer = getattr(time, 'perf_counter', time.time)
+
+csv_columns = ('step', 'ok', 'elapsed', 'peak_kb', 'net_kb')
+
+
+class StepTimings(object):
+    def __init__(self, trace_memory=True):
+        """
+
+        :param trace_memory: bool
+        """
+        self.TraceMemory = trace_memory
+        self.Records = []
+
+    def Clear(self):
+        self.Records = []
+
+    def Measure(self, step_name, func, *args):
+        """
+        Call func(*args), and append a record for it to self.Records. The record is added even if
+        func raises (with ok=False); the exception is passed on.
+
+        A record is a dict with the keys (see csv_columns):
+            step: step_name
+            ok: bool
+            elapsed: wall time, seconds
+            peak_kb: peak memory allocated during the step, above the starting level (or None)
+            net_kb: memory still allocated at the end of the step (or None)
+        The memory figures are process-wide (see the module docstring).
+
+        :param step_name: str
+        :param func: function
+        :return: object (return value of func)
+        """
+        trace_memory = self.TraceMemory and tracemalloc is not None
+        started = False
+        base = 0
+        if trace_memory:
+            # Only trace (and stop tracing afterwards) if nobody else in the process does.
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                started = True
+            base = tracemalloc.get_traced_memory()[0]
+        record = {'step': step_name, 'ok': False, 'elapsed': 0., 'peak_kb': None, 'net_kb': None}
+        start = timer()
+        try:
+            out = func(*args)
+            record['ok'] = True
+            return out
+        finally:
+            record['elapsed'] = timer() - start
+            if trace_memory:
+                current, peak = tracemalloc.get_traced_memory()
+                if started:
+                    tracemalloc.stop()
+                    record['peak_kb'] = max(peak - base, 0) / 1024.
+                # Otherwise, the peak belongs to whoever started tracing; it may predate the step.
+                record['net_kb'] = (current - base) / 1024.
+            self.Records.append(record)
+
+    def GetTotals(self):
+        """
+        Total time (seconds) and largest peak (KB, or None) over all records.
+        :return: tuple
+        """
+        total = sum(x['elapsed'] for x in self.Records)
+        peaks = [x['peak_kb'] for x in self.Records if x['peak_kb'] is not None]
+        if len(peaks) == 0:
+            return total, None
+        return total, max(peaks)
+
+    def SaveJSON(self, fname, model_name=''):
+        with open(fname, 'w') as f:
+            json.dump({'model_name': model_name, 'steps': self.Records}, f, indent=2)
+
+    def SaveCSV(self, fname):
+        with open(fname, 'w') as f:
+            writer = csv.writer(f, lineterminator='\n')
+            writer.writerow(csv_columns)
+            for record in self.Records:
+                writer.writerow([record[x] for x in csv_columns])
+
+    def Save(self, fname, model_name=''):
+        """
+        Save as CSV if fname ends with '.csv', otherwise JSON.
+        :param fname: str
+        :param model_name: str
+        :return:
+        """
+        if fname.lower().endswith('.csv'):
+            self.SaveCSV(fname)
+        else:
+            self.SaveJSON(fname, model_name)
@@ -5,7 +5,10 @@ model_runner.py
 Creates a GUI that runs SFC models. Allows quick and easy examination of equation creation.
 """
 
+import bisect
 import os
+import re
+import shutil
 import sys
 
 from sfc_models.models import Model
@@ -13,7 +16,16 @@ from sfc_models.utils import Logger
 import sfc_gui.utils
 import sfc_gui.module_loader
 import sfc_gui.chart_plotter
+import sfc_gui.step_worker
+import sfc_gui.instrumentation
+import sfc_gui.convergence
+import sfc_gui.result_file
+import sfc_gui.result_cache
+import sfc_gui.model_scanner
 from sfc_gui.utils import WidgetHolder, Parameters
+from sfc_gui.tree_sync import TreeSync
+from sfc_gui.equation_index import EquationIndex
+from sfc_gui.dependency_graph import DependencyGraph
 
 if sys.version_info[0] < 3:
     import Tkinter as tk
@@ -36,6 +48,12 @@ else:
     from imp import reload as reloader
     from imp import import_module as loader
 
+# Search results shown in the model viewer
+max_search_results = 500
+# Rows listed per section of the Dependencies panel
+max_dependency_rows = 500
+
+
 class ModelRunner(tk.Tk):
     def __init__(self, parent):
         """
@@ -54,18 +72,47 @@ class ModelRunner(tk.Tk):
         except:
             pass
         self.wm_title('sfc_models Model Runner')
+        # Background thread running model steps (step_worker.StepWorker), if any.
+        self.Worker = None
+        # Model chooser state; the list is filled in by the background directory scanner.
+        self.Scanner = None
+        self.ScanPollInterval = 250
+        self.LoadedMtimes = {}
         self.WidgetsChooser = WidgetHolder()
         self.FrameChooser = self.CreateChooser(self.WidgetsChooser)
         self.WidgetsModelViewer = WidgetHolder()
         self.FrameModelViewer = self.CreateModelViewer(self.WidgetsModelViewer)
-        self.PreviousEquations = []
-        self.CurrentEquations = []
+        self.PreviousEquations = {}
+        self.CurrentEquations = {}
         self.Sectors = []
         self.FrameChooser.tkraise()
         self.columnconfigure(0, weight=1)
         self.rowconfigure(0, weight=1)
         self.resizable(width=True, height=True)
         self.Model = None
+        # Name of the loaded model file (without .py); the model may not be built yet.
+        self.ModelName = None
+        # Milliseconds between checks of the step worker's message queue.
+        self.PollInterval = 100
+        # Per-step wall time and memory, shown in the Step Timing panel.
+        self.StepTimings = sfc_gui.instrumentation.StepTimings()
+        # Set up by StartWorker() if 'Profile convergence' is checked.
+        self.ConvergenceProfiler = None
+        self.ResultCache = sfc_gui.result_cache.ResultCache()
+        self.CacheKey = None
+        self.CachedResults = None
+        # Stop the background threads when the window goes away.
+        self.bind('<Destroy>', self.OnDestroy)
+
+    def OnDestroy(self, event):
+        # The root window also gets the <Destroy> events of all of its children.
+        if event.widget is not self:
+            return
+        if self.Scanner is not None:
+            self.Scanner.Stop()
+            self.Scanner = None
+        if self.Worker is not None:
+            self.Worker.Cancel()
 
     def CreateChooser(self, widgetholder):
         frame = ttk.Frame(self)
@@ -94,6 +141,8 @@ class ModelRunner(tk.Tk):
         widgetholder.AddVariableLabel(frame, 'is_valid')
         widgetholder.AddButton(frame, 'run_button', command=self.OnRunModel,
                                text='Load', state='disabled')
+        widgetholder.AddButton(frame, 'open_results', command=self.OnOpenResults,
+                               text='Open Results...')
         # Grid'em, Danno!
         frame.grid(row=0, column=0, rowspan=4, columnspan=3, sticky=['n', 's', 'w', 'e'])
         # Working directory
@@ -110,6 +159,7 @@ class ModelRunner(tk.Tk):
         widgetholder.Widgets['model_desc'].grid(row=2, column=2, sticky=['w', 'e'], padx=5)
         widgetholder.Widgets['is_valid'].grid(row=3, column=2, sticky=['w', 'e'])
         widgetholder.Widgets['run_button'].grid(row=4, column=2, pady=5)
+        widgetholder.Widgets['open_results'].grid(row=4, column=0, pady=5)
         # Column config [Not working?]
         inner_frame.grid(row=0, column=0, rowspan=5, columnspan=3, sticky=('N', 'S', 'E', 'W'))
         frame.columnconfigure(1, weight=4)
@@ -140,6 +190,22 @@ class ModelRunner(tk.Tk):
         widgetholder.AddButton(frame, 'generate_eqn', 'Generate\nEquations',
                                command=self.OnGenerateEquations)
         widgetholder.AddTree(frame, 'equations', columns=('Equation', 'Comment'))
+        self.TreeSync = TreeSync(widgetholder.Widgets['equations'])
+        # Search index over the same rows (except the duplicate Sector/Changed Equations blocks).
+        self.EquationIndex = EquationIndex()
+        self.SearchCodes = []
+        self.SearchPending = None
+        # Milliseconds of typing pause before the search runs.
+        self.SearchDelay = 150
+        # Dependency graph of the final equations, and the variable shown in the panel.
+        self.DependencyGraph = DependencyGraph()
+        self.DependencyVariable = None
+        # Tree row code -> full variable name, for the sector variable rows.
+        self.RowVariables = {}
+        widgetholder.Widgets['equations'].bind('<<TreeviewSelect>>', self.OnEquationSelect)
+        # Rows are only created when a node is expanded.
+        widgetholder.Widgets['equations'].bind('<<TreeviewOpen>>', self.OnTreeOpen)
+        widgetholder.Widgets['equations'].bind('<<TreeviewClose>>', self.OnTreeClose)
         # Push a configuration variable into the WidgetHolder
         widgetholder.Data['parameter_final_equation'] = 'Final Equations (All)'
         scrolly = ttk.Scrollbar(frame, orient=VERTICAL,
@@ -169,6 +235,49 @@ class ModelRunner(tk.Tk):
         # self.WidgetsModelViewer.Widgets['fixaliases'].grid(row=2, column=4, sticky=('N', 'E'))
         # self.WidgetsModelViewer.Widgets['generate_eqn'].grid(row=3, column=4, sticky=('N', 'E'))
         inner_frame.grid(row=0, column=0, rowspan=5, columnspan=6, sticky=('N', 'S', 'E', 'W'))
+        search_frame = ttk.LabelFrame(frame, text='Search')
+        search_frame.grid(row=6, column=0, columnspan=5, sticky=('N', 'S', 'E', 'W'))
+        label_search = ttk.Label(search_frame, text='Find:')
+        widgetholder.AddEntry(search_frame, 'search')
+        widgetholder.Widgets['search'].bind('<KeyRelease>', self.OnSearchChanged)
+        self.SearchRegex = BooleanVar(value=False)
+        check_regex = ttk.Checkbutton(search_frame, text='Regular expression',
+                                      variable=self.SearchRegex, command=self.OnSearchChanged)
+        widgetholder.AddVariableLabel(search_frame, 'search_status')
+        widgetholder.AddListBox(search_frame, 'search_results', height=6,
+                                callback=self.OnSearchSelect)
+        label_search.grid(row=0, column=0, sticky=('W',))
+        widgetholder.Widgets['search'].grid(row=0, column=1, sticky=('W', 'E'))
+        check_regex.grid(row=0, column=2, padx=5)
+        widgetholder.Widgets['search_status'].grid(row=0, column=3, sticky=('W',))
+        widgetholder.Widgets['search_results'].grid(row=1, column=0, columnspan=4,
+                                                    sticky=('N', 'S', 'E', 'W'))
+        search_frame.columnconfigure(1, weight=1)
+        search_frame.columnconfigure(3, weight=1)
+        dep_frame = ttk.LabelFrame(frame, text='Dependencies')
+        dep_frame.grid(row=6, column=7, columnspan=2, sticky=('N', 'S', 'E', 'W'))
+        widgetholder.AddVariableLabel(dep_frame, 'dep_variable')
+        self.DependencyLagged = BooleanVar(value=False)
+        check_lagged = ttk.Checkbutton(dep_frame, text='Follow lagged references',
+                                       variable=self.DependencyLagged,
+                                       command=self.UpdateDependencyPanel)
+        widgetholder.AddTree(dep_frame, 'dependencies', columns=('distance',))
+        dep_tree = widgetholder.Widgets['dependencies']
+        dep_tree.heading('#0', text='Variable')
+        dep_tree.heading('distance', text='Distance')
+        dep_tree.column('#0', width=260)
+        dep_tree.column('distance', width=70, anchor='e')
+        dep_tree.configure(height=6)
+        # Double click: show the variable in the equation tree.
+        dep_tree.bind('<Double-1>', self.OnDependencyDoubleClick)
+        widgetholder.AddVariableLabel(dep_frame, 'dep_stats')
+        widgetholder.Widgets['dep_stats'].configure(justify='left')
+        widgetholder.Widgets['dep_variable'].grid(row=0, column=0, sticky=('W',))
+        check_lagged.grid(row=0, column=1, sticky=('E',))
+        dep_tree.grid(row=1, column=0, columnspan=2, sticky=('N', 'S', 'E', 'W'))
+        widgetholder.Widgets['dep_stats'].grid(row=2, column=0, columnspan=2, sticky=('W',))
+        dep_frame.columnconfigure(0, weight=1)
+        dep_frame.rowconfigure(1, weight=1)
         #frame.columnconfigure(0, weight=1)
         #frame.columnconfigure(1, weight=1)
         #frame.columnconfigure(2, weight=1)
@@ -184,23 +293,69 @@ class ModelRunner(tk.Tk):
         label_next_step = ttk.Label(run_frame, text='Next Step:', width=25)
         widgetholder.AddButton(run_frame, 'run_next', 'Run Next Step', command=self.OnRunNext)
         widgetholder.AddButton(run_frame, 'run_all', 'Run All Steps', command=self.OnRunAll)
+        widgetholder.AddButton(run_frame, 'cancel', 'Cancel', command=self.OnCancel,
+                               state='disabled')
+        widgetholder.AddVariableLabel(run_frame, 'progress')
         widgetholder.AddVariableLabel(run_frame, 'next_step')
         label_choose_next = ttk.Label(run_frame, text='Possible Choices')
         widgetholder.AddListBox(run_frame, 'possible_steps', height=7, single_select=True,
                                 callback=self.UpdateModelViewer)
         widgetholder.AddButton(run_frame, 'show_graph', 'Show Graph', command=self.OnShowGraph)
+        widgetholder.AddButton(run_frame, 'save_results', 'Save Results...',
+                               command=self.OnSaveResults)
         widgetholder.Widgets['reload'].grid(row=0, column=0)
         label_next_step.grid(row=1, column=0, pady=(10,0))
         widgetholder.Widgets['next_step'].grid(row=2, column=0)
         widgetholder.Widgets['run_next'].grid(row=3, column=0)
         label_choose_next.grid(row=4, column=0)
         widgetholder.Widgets['possible_steps'].grid(row=5, column=0)
-        widgetholder.Widgets['run_all'].grid(row=6, column=0, pady=20)
+        widgetholder.Widgets['run_all'].grid(row=6, column=0, pady=(20, 0))
+        widgetholder.Widgets['cancel'].grid(row=7, column=0)
+        widgetholder.Widgets['progress'].grid(row=8, column=0)
 
-        widgetholder.Widgets['show_graph'].grid(row=7, column=0, pady=20)
+        self.ProfileConvergence = BooleanVar(value=False)
+        check_profile = ttk.Checkbutton(run_frame, text='Profile convergence',
+                                        variable=self.ProfileConvergence)
+        widgetholder.AddButton(run_frame, 'convergence', 'Convergence...',
+                               command=self.OnShowConvergence)
+        widgetholder.Widgets['show_graph'].grid(row=9, column=0, pady=20)
+        widgetholder.Widgets['save_results'].grid(row=10, column=0)
+        check_profile.grid(row=11, column=0, pady=(20, 0))
+        widgetholder.Widgets['convergence'].grid(row=12, column=0)
+        # Step instrumentation panel (filled in by PollWorker())
+        timing_frame = ttk.LabelFrame(frame, text='Step Timing')
+        timing_frame.grid(row=0, column=8, rowspan=5, sticky=('N', 'S', 'E', 'W'))
+        widgetholder.AddTree(timing_frame, 'timings', columns=('time', 'peak', 'net'))
+        timing_tree = widgetholder.Widgets['timings']
+        timing_tree.heading('#0', text='Step')
+        timing_tree.heading('time', text='Time (ms)')
+        timing_tree.heading('peak', text='Peak (KB)')
+        timing_tree.heading('net', text='Net (KB)')
+        timing_tree.column('#0', width=190)
+        for col in ('time', 'peak', 'net'):
+            timing_tree.column(col, width=75, anchor='e')
+        timing_tree.tag_configure('failed', foreground='red')
+        self.TraceMemory = BooleanVar(value=True)
+        check_memory = ttk.Checkbutton(timing_frame, text='Track memory (slower)',
+                                       variable=self.TraceMemory)
+        widgetholder.AddVariableLabel(timing_frame, 'timing_total')
+        widgetholder.AddButton(timing_frame, 'export_timings', 'Export...',
+                               command=self.OnExportTimings)
+        widgetholder.AddButton(timing_frame, 'clear_timings', 'Clear', command=self.OnClearTimings)
+        timing_tree.grid(row=0, column=0, columnspan=2, sticky=('N', 'S', 'E', 'W'))
+        widgetholder.Widgets['timing_total'].grid(row=1, column=0, columnspan=2, sticky=('W',))
+        check_memory.grid(row=2, column=0, columnspan=2, sticky=('W',))
+        widgetholder.Widgets['export_timings'].grid(row=3, column=0)
+        widgetholder.Widgets['clear_timings'].grid(row=3, column=1)
+        timing_frame.rowconfigure(0, weight=1)
         return frame
 
     def OnRunNext(self):
+        if self.Model is None:
+            # Only cached results so far; the first step is to build the model.
+            self.BuildModel()
+            self.UpdateModelViewer()
+            return
         steps = self.Model._GetSteps()
         if len(steps) == 0:
             return
@@ -208,38 +363,220 @@ class ModelRunner(tk.Tk):
             next_step = self.WidgetsModelViewer.GetListBox('possible_steps')
             if next_step is None:
                 next_step = steps[0][0]
-        try:
-            self.Model._RunStep(next_step)
-        except Exception as e:
-            self.Model.LogInfo(ex=e)
-            sfc_gui.utils.ErrorDialog(e)
-            self.UpdateModelViewer()
-            # messagebox.showinfo(message=str(e), icon='error', title='Error')
-            raise e
-        self.UpdateModelViewer()
+        self.StartWorker(next_step, run_all=False)
 
     def OnRunAll(self):
+        if self.Model is None:
+            self.BuildModel()
+        self.StartWorker(None, run_all=True)
+
+    def StartWorker(self, step_name, run_all):
+        """
+        Run model steps in a background thread; PollWorker() picks up the progress messages.
+        :param step_name: str
+        :param run_all: bool
+        :return:
+        """
+        if self.Worker is not None:
+            return
+        self.SetRunButtonState(running=True)
+        self.WidgetsModelViewer.Data['progress'].set('Starting...')
+        self.StepTimings.TraceMemory = bool(self.TraceMemory.get())
+        if self.ProfileConvergence.get():
+            if self.ConvergenceProfiler is None:
+                self.ConvergenceProfiler = sfc_gui.convergence.ConvergenceProfiler(
+                    self.Model.EquationSolver)
+            self.ConvergenceProfiler.Attach()
+        elif self.ConvergenceProfiler is not None:
+            self.ConvergenceProfiler.Detach()
+        self.Worker = sfc_gui.step_worker.StepWorker(self.Model, step_name=step_name,
+                                                     run_all=run_all, timings=self.StepTimings)
+        self.Worker.start()
+        self.after(self.PollInterval, self.PollWorker)
+
+    def PollWorker(self):
+        worker = self.Worker
+        if worker is None:
+            return
+        for msg in worker.GetMessages():
+            if msg[0] == 'step':
+                self.WidgetsModelViewer.Data['progress'].set(
+                    'Step {0}: {1}'.format(msg[2] + 1, msg[1]))
+            elif msg[0] == 'timing':
+                self.AddTimingRow(msg[1])
+            elif msg[0] == 'done':
+                self.Worker = None
+                self.SetRunButtonState(running=False)
+                if msg[2]:
+                    status = 'Cancelled after {0} step(s)'
+                else:
+                    status = 'Ran {0} step(s)'
+                self.WidgetsModelViewer.Data['progress'].set(status.format(msg[1]))
+                self.StoreInCache()
+                self.UpdateModelViewer()
+                return
+            elif msg[0] == 'error':
+                self.Worker = None
+                self.SetRunButtonState(running=False)
+                self.WidgetsModelViewer.Data['progress'].set('Error')
+                e = msg[1]
+                self.Model.LogInfo(ex=e)
+                self.UpdateModelViewer()
+                sfc_gui.utils.ErrorDialog(e, trace=msg[2])
+                return
+        self.after(self.PollInterval, self.PollWorker)
+
+    def AddTimingRow(self, record):
+        """
+        Show one instrumentation.StepTimings record in the Step Timing panel.
+        :param record: dict
+        :return:
+        """
+        values = ['{0:.1f}'.format(1000. * record['elapsed'])]
+        for key in ('peak_kb', 'net_kb'):
+            if record[key] is None:
+                values.append('')
+            else:
+                values.append('{0:.0f}'.format(record[key]))
+        tags = ()
+        if not record['ok']:
+            tags = ('failed',)
+        tree = self.WidgetsModelViewer.Widgets['timings']
+        item = tree.insert('', 'end', text=record['step'], values=values, tags=tags)
+        tree.see(item)
+        self.UpdateTimingTotal()
+
+    def UpdateTimingTotal(self):
+        total, peak = self.StepTimings.GetTotals()
+        msg = '{0} step(s), {1:.1f} ms'.format(len(self.StepTimings.Records), 1000. * total)
+        if peak is not None:
+            msg += ', max peak {0:.0f} KB'.format(peak)
+        self.WidgetsModelViewer.Data['timing_total'].set(msg)
+
+    def OnClearTimings(self):
+        self.StepTimings.Clear()
+        self.WidgetsModelViewer.DeleteTreeChildren('timings', '')
+        self.UpdateTimingTotal()
+
+    def OnExportTimings(self):
+        name = self.GetModelName()
+        if name is None:
+            name = 'timings'
+        initial_dir = self.Parameters.LogDir
+        if initial_dir == '':
+            initial_dir = os.getcwd()
+        target = fdog.asksaveasfilename(title='Export Step Timings', initialdir=initial_dir,
+                                        initialfile=name + '_timings.json',
+                                        defaultextension='.json',
+                                        filetypes=(('JSON', '*.json'), ('CSV', '*.csv')))
+        if target == () or target == '':
+            return
         try:
-            self.Model._RunAllSteps()
+            self.StepTimings.Save(target, model_name=name)
         except Exception as e:
-            sfc_gui.utils.ErrorDialog(e) #messagebox.showinfo(message=str(e), icon='error', title='Error')
-            self.Model.LogInfo(ex=e)
-            self.UpdateModelViewer()
-            raise e
-        self.UpdateModelViewer()
+            sfc_gui.utils.ErrorDialog(e)
+
+    def OnCancel(self):
+        if self.Worker is not None:
+            self.Worker.Cancel()
+            self.WidgetsModelViewer.Data['progress'].set('Cancelling...')
+
+    def SetRunButtonState(self, running):
+        if running:
+            run_state = ['disabled']
+            cancel_state = ['!disabled']
+        else:
+            run_state = ['!disabled']
+            cancel_state = ['disabled']
+        for name in ('reload', 'run_next', 'run_all', 'show_graph', 'save_results', 'convergence'):
+            self.WidgetsModelViewer.Widgets[name].state(run_state)
+        self.WidgetsModelViewer.Widgets['cancel'].state(cancel_state)
+        # No other model (or result file) can be loaded while the worker changes this one.
+        self.WidgetsChooser.Widgets['open_results'].state(run_state)
+        if running:
+            self.WidgetsChooser.Widgets['run_button'].state(run_state)
+        else:
+            # Only enabled if the selected file is valid.
+            self.OnChangeModel(None)
+
+    def StopWorker(self):
+        """
+        Cancel the step worker (if any), and wait for it to finish its current step.
+        :return:
+        """
+        worker = self.Worker
+        if worker is None:
+            return
+        worker.Cancel()
+        worker.join()
+        self.Worker = None
+        self.SetRunButtonState(running=False)
 
     def OnShowGraph(self):
-        self.Parameters.SetModel(self.Model)
+        if self.CachedResults is not None and (self.Model is None or
+                                               not self.Model.State == 'Finished Running'):
+            # Model not solved in this session; show the cached results instead.
+            self.Parameters.SetResultFile(self.CachedResults)
+        else:
+            self.Parameters.SetModel(self.Model)
+        self.ShowPlotter()
+
+    def OnShowConvergence(self):
+        profiler = self.ConvergenceProfiler
+        if profiler is None or len(profiler.Profile.Steps) == 0:
+            messagebox.showinfo(title='Convergence',
+                                message="No convergence profile: check 'Profile convergence', "
+                                        "then run the model (through the Solve step).")
+            return
+        frame = sfc_gui.chart_plotter.ConvergenceFrame(self, profiler.Profile, mod=self.Model)
+        frame.tkraise()
+
+    def ShowPlotter(self):
         self.FramePlotter = sfc_gui.chart_plotter.ChartPlotterFrame(self, parameters=self.Parameters)
         self.FramePlotter.OnSettingsCallback = self.ShowSettings
         self.FramePlotter.tkraise()
 
+    def OnSaveResults(self):
+        name = self.GetModelName()
+        if name is None:
+            name = 'results'
+        initial_dir = self.Parameters.LogDir
+        if initial_dir == '':
+            initial_dir = os.getcwd()
+        target = fdog.asksaveasfilename(title='Save Results', initialdir=initial_dir,
+                                        initialfile=name + '.sfcr', defaultextension='.sfcr')
+        if target == () or target == '':
+            return
+        try:
+            if self.Model is None:
+                # Not built in this session; save the cached results.
+                shutil.copyfile(self.CachedResults.FileName, target)
+            else:
+                sfc_gui.result_file.save_results(target, self.Model, model_name=name)
+        except Exception as e:
+            sfc_gui.utils.ErrorDialog(e)
+
+    def OnOpenResults(self):
+        target = fdog.askopenfilename(title='Open Results',
+                                      filetypes=(('Result files', '*.sfcr'), ('All files', '*')))
+        if target == () or target == '':
+            return
+        try:
+            results = sfc_gui.result_file.ResultFile(target)
+        except Exception as e:
+            sfc_gui.utils.ErrorDialog(e)
+            return
+        self.Parameters.SetResultFile(results)
+        self.ShowPlotter()
+
     def ShowSettings(self):
         settings = sfc_gui.chart_plotter.SettingsWindow(self, parameters=self.Parameters)
         settings.OnCloseCallback = self.OnSettingsClose
         settings.tkraise()
 
     def OnSettingsClose(self):
+        # The source may have changed.
+        self.FramePlotter.UpdateEquationList()
         self.FramePlotter.Update()
 
     def OnGenerateFullCodes(self):
@@ -258,6 +595,12 @@ class ModelRunner(tk.Tk):
         sector._GenerateEquations()
         self.UpdateModelViewer()
 
+    def OnTreeOpen(self, event):
+        self.TreeSync.Materialize(self.WidgetsModelViewer.Widgets['equations'].focus())
+
+    def OnTreeClose(self, event):
+        self.TreeSync.Evict(self.WidgetsModelViewer.Widgets['equations'].focus())
+
     def OnModelViewerBack(self):
         self.FrameChooser.tkraise()
 
@@ -271,11 +614,33 @@ class ModelRunner(tk.Tk):
             self.FrameChooser.tkraise()
             return
         self.CleanupOnModelChange()
+        self.OnClearTimings()
+        self.ConvergenceProfiler = None
         Logger.cleanup()
         if not self.Parameters.LogDir == '':
             base_name = os.path.join(self.Parameters.LogDir, name)
             Logger.register_standard_logs(base_file_name=base_name)
-        python_mod = self.Importer(name)
+        try:
+            mtime = os.stat(name + '.py').st_mtime
+        except OSError:
+            mtime = None
+        self.LoadedMtimes[name] = mtime
+        self.FlagModifiedFile(name, mtime)
+        self.ModelName = name
+        self.Model = None
+        # With cached results, the model is only built when it is needed (running steps).
+        self.LookupCache(name)
+        if self.CachedResults is None:
+            self.BuildModel()
+        self.UpdateModelViewer()
+        self.FrameModelViewer.tkraise()
+
+    def BuildModel(self):
+        """
+        Import the loaded model file, and call its build_model().
+        :return:
+        """
+        python_mod = self.Importer(self.ModelName)
         try:
             self.Model = python_mod.build_model()
         except Exception as e:
@@ -284,135 +649,313 @@ class ModelRunner(tk.Tk):
         if type(self.Model) is not Model:
             raise ValueError('Expected a Model, got {0} instead'.format(type(Model)))
         self.Sectors = self.Model.GetSectors()
-        self.UpdateModelViewer()
-        self.FrameModelViewer.tkraise()
+
+    def LookupCache(self, name):
+        """
+        Look for saved results for this model file (same source and sfc_models version).
+        :param name: str
+        :return:
+        """
+        self.CacheKey = None
+        self.CachedResults = None
+        try:
+            with open(name + '.py') as f:
+                source = f.read()
+            self.CacheKey = self.ResultCache.MakeKey(source)
+            self.CachedResults = self.ResultCache.Get(self.CacheKey)
+        except Exception as e:
+            self.ReportCacheError('Result cache lookup failed', e)
+            return
+        if self.CachedResults is None:
+            self.WidgetsModelViewer.Data['progress'].set('')
+        else:
+            self.WidgetsModelViewer.Data['progress'].set('Cached results available')
+
+    def ReportCacheError(self, msg, e):
+        """
+        Cache failures are not fatal: log them, and show them in the Run panel.
+        :param msg: str
+        :param e: Exception
+        :return:
+        """
+        Logger('{0}: {1}', data_to_format=(msg, str(e)))
+        self.WidgetsModelViewer.Data['progress'].set('{0}: {1}'.format(msg, str(e)))
+
+    def StoreInCache(self):
+        """
+        Save the results of a solved model to the cache (if not already there).
+        :return:
+        """
+        if self.CacheKey is None or self.CachedResults is not None or self.Model is None:
+            return
+        if not self.Model.State == 'Finished Running':
+            return
+        try:
+            fname = self.ResultCache.Put(self.CacheKey, self.Model, model_name=self.ModelName)
+            self.CachedResults = sfc_gui.result_file.ResultFile(fname)
+        except Exception as e:
+            self.ReportCacheError('Could not save results to cache', e)
 
     def CleanupOnModelChange(self):
-        kept_list = ('FINAL*EQUATIONS', 'CHANGED*EQUATIONS', 'SECTOR*EQUATIONS')
+        # The worker must not keep running steps on the old model.
+        self.StopWorker()
         treewidget = self.WidgetsModelViewer.Widgets['equations']
-        children = treewidget.get_children()
         self.Sectors = []
-        for child in children:
-            if child not in kept_list:
-                treewidget.delete(child)
-            else:
-                self.WidgetsModelViewer.DeleteTreeChildren('equations', child)
+        self.PreviousEquations = {}
+        self.CurrentEquations = {}
+        # Roots are recreated by the next UpdateModelViewer() call.
+        for child in treewidget.get_children():
+            treewidget.delete(child)
+        self.TreeSync.Reset()
+        self.EquationIndex.Reset()
+        self.UpdateSearchResults()
+        self.DependencyGraph = DependencyGraph()
+        self.DependencyVariable = None
+        self.RowVariables = {}
+        self.UpdateDependencyPanel()
 
 
     def UpdateModelViewer(self, event=None):
-        name = self.GetModelName()
-        self.WidgetsModelViewer.Data['model_name'].set(name)
-        self.WidgetsModelViewer.Data['model_state'].set(self.Model.State)
-        steps = self.Model._GetSteps()
+        if self.Worker is not None:
+            # The worker thread is modifying the Model; refresh once it finishes.
+            return
+        self.WidgetsModelViewer.Data['model_name'].set(self.ModelName)
+        if self.Model is None:
+            self.WidgetsModelViewer.Data['model_state'].set('Not built (cached results)')
+            steps = []
+        else:
+            self.WidgetsModelViewer.Data['model_state'].set(self.Model.State)
+            steps = self.Model._GetSteps()
         if len(steps) == 0:
-            self.WidgetsModelViewer.Data['possible_steps'].set('')
+            self.WidgetsModelViewer.SetListBox('possible_steps', [])
         else:
             self.WidgetsModelViewer.SetListBox('possible_steps', steps[0])
-        if len(steps) == 0:
+        if self.Model is None:
+            next_step = 'Build Model'
+        elif len(steps) == 0:
             next_step = ''
         else:
             next_step = self.WidgetsModelViewer.GetListBox('possible_steps')
             if next_step is None:
                 next_step = steps[0][0]
         self.WidgetsModelViewer.Data['next_step'].set(next_step)
-        treewidget = self.WidgetsModelViewer.Widgets['equations']
-        country_list =   [x.Code for x in self.Model.CountryList]
         final_name = 'FINAL*EQUATIONS'
-        root_list = [final_name, 'CHANGED*EQUATIONS', 'SECTOR*EQUATIONS'] + country_list
-        # First: Eliminate countries (and children) that do not exist.
-        on_tree = treewidget.get_children()
-        # Cannot iterate on get_children(), as we modify the output with every delete!
-        for name in on_tree:
-            if name not in root_list:
-                treewidget.delete(name)
-        self.PreviousEquations = tuple(self.CurrentEquations)
-        self.CurrentEquations = []
+        final_text = self.WidgetsModelViewer.Data['parameter_final_equation']
+        if self.Model is None:
+            country_objects = []
+            final_block = self.CachedResults.FinalEquationBlock
+            final_text += ' [Cached]'
+        else:
+            country_objects = self.Model.CountryList
+            final_block = self.Model.FinalEquationBlock
+            if len(final_block.GetEquationList()) == 0 and self.CachedResults is not None:
+                # Not generated yet in this session; show the equations from the cache.
+                final_block = self.CachedResults.FinalEquationBlock
+                final_text += ' [Cached]'
+        country_list = [x.Code for x in country_objects]
+        root_rows = [(final_name, final_text, ()),
+                     ('SECTOR*EQUATIONS', 'Sector Equations', ()),
+                     ('CHANGED*EQUATIONS', 'Changed Equations', ())]
+        root_rows += [(code, code, ()) for code in country_list]
+        # Removing a country from the root also drops its sectors and variables.
+        self.SyncViewerBlock('', root_rows)
+        self.PreviousEquations = self.CurrentEquations
+        self.CurrentEquations = {}
         # FINAL_EQUATIONS
-        if final_name not in on_tree:
-            treewidget.insert('', 'end',final_name,
-                              text=self.WidgetsModelViewer.Data['parameter_final_equation'],
-                              open=False)
-        if 'SECTOR*EQUATIONS' not in on_tree:
-            treewidget.insert('', 'end', 'SECTOR*EQUATIONS', text='Sector Equations', open=False)
-        if 'CHANGED*EQUATIONS' not in on_tree:
-            treewidget.insert('', 'end', 'CHANGED*EQUATIONS', text='Changed Equations', open=False)
-        self.WidgetsModelViewer.DeleteTreeChildren('equations', final_name)
-        num_final = 0
-        for varname in self.Model.FinalEquationBlock.GetEquationList():
-            num_final += 1
-            eqn = self.Model.FinalEquationBlock[varname]
+        final_rows = []
+        for varname in final_block.GetEquationList():
+            eqn = final_block[varname]
             eqn_str = '{0} = {1}'.format(varname, eqn.GetRightHandSide())
-            treewidget.insert(final_name, 'end', varname,
-                              text=eqn.LeftHandSide,
-                              values=(eqn_str, eqn.Description))
-        self.WidgetsModelViewer.Data['num_final_eqn'].set(str(num_final))
+            final_rows.append((varname, eqn.LeftHandSide, (eqn_str, eqn.Description)))
+        self.SyncViewerBlock(final_name, final_rows)
+        self.WidgetsModelViewer.Data['num_final_eqn'].set(str(len(final_rows)))
+        self.DependencyGraph.UpdateFromBlock(final_block)
+        self.RowVariables = {}
         num_sector_equations = 0
-        for country_obj in self.Model.CountryList:
+        for country_obj in country_objects:
             country_code = country_obj.Code
-            if country_obj.Code not in on_tree:
-                treewidget.insert('', 'end', country_obj.Code, text=country_obj.Code, open=False)
-            country_children = treewidget.get_children(country_obj.Code)
             sectors = {}
             for sector in country_obj.SectorList:
                 sectors[country_code + '*' + sector.Code] = sector
             codes = list(sectors.keys())
             codes.sort()
-            for sector_code in country_children:
-                if sector_code not in codes:
-                    treewidget.delete(sector_code)
+            self.SyncViewerBlock(country_code,
+                                 [(code, sectors[code].Code, ()) for code in codes])
             for sector_code in codes:
                 sector_obj = sectors[sector_code]
-                if sector_code not in country_children:
-                    treewidget.insert(country_code, 'end',
-                                      sector_code, text=sector_obj.Code,
-                                      open=False)
-                variables_on_tree = treewidget.get_children(sector_code)
-                variables = sector_obj.EquationBlock.GetEquationList()
-                variable_lookup = {}
-                for var in variables:
-                    variable_lookup[sector_code+'*'+var] = sector_obj.EquationBlock[var]
-                for var_code in variables_on_tree:
-                    if var_code not in variable_lookup:
-                        treewidget.delete(var_code)
-                for var_code in variable_lookup.keys():
-                    num_sector_equations += 1
-                    eqn = variable_lookup[var_code]
+                variable_rows = []
+                for var in sector_obj.EquationBlock.GetEquationList():
+                    eqn = sector_obj.EquationBlock[var]
                     rhs = eqn.GetRightHandSide()
                     eqn_str = "{0} = {1}".format(eqn.LeftHandSide, rhs)
                     if not sector_obj.FullCode == '':
                         fullname = sector_obj.GetVariableName(eqn.LeftHandSide)
-                        self.CurrentEquations.append(
-                            (fullname, '{0} = {1}'.format(fullname, rhs), eqn.Description))
-                    if var_code not in variables_on_tree:
-                        treewidget.insert(sector_code, 'end', var_code,
-                                          text=eqn.LeftHandSide,
-                                          values=(eqn_str, eqn.Description))
-                    else:
-                        treewidget.item(var_code, values=(eqn_str, eqn.Description))
+                        self.RowVariables[sector_code + '*' + var] = fullname
+                        self.CurrentEquations[fullname] = ('{0} = {1}'.format(fullname, rhs),
+                                                           eqn.Description)
+                    variable_rows.append((sector_code + '*' + var, eqn.LeftHandSide,
+                                          (eqn_str, eqn.Description)))
+                num_sector_equations += len(variable_rows)
+                self.SyncViewerBlock(sector_code, variable_rows)
         self.WidgetsModelViewer.Data['num_sector_eqn'].set(str(num_sector_equations))
-        self.CurrentEquations.sort()
-        changed_equations = []
-        for x in self.CurrentEquations:
-            if x not in self.PreviousEquations:
-                changed_equations.append(x)
-        self.WidgetsModelViewer.DeleteTreeChildren('equations', 'CHANGED*EQUATIONS')
-        for varname, eqn_str, desc in changed_equations:
-            treewidget.insert('CHANGED*EQUATIONS', 'end','C*'+varname, text=varname, values=(eqn_str, desc))
-        on_tree = treewidget.get_children('SECTOR*EQUATIONS')
-        for pos in range(0, len(self.CurrentEquations)):
-            varname, eqn_str, desc = self.CurrentEquations[pos]
-            ccode = 'S*' + varname
-            if ccode in on_tree:
-                treewidget.item(ccode, values=(eqn_str, desc))
-            else:
-                treewidget.insert('SECTOR*EQUATIONS', pos, text=varname,
-                                  values=(eqn_str, desc))
+        # Dictionary lookups, so the comparison against the previous step is O(n).
+        sector_names = list(self.CurrentEquations.keys())
+        sector_names.sort()
+        changed_rows = []
+        sector_rows = []
+        for varname in sector_names:
+            eqn_info = self.CurrentEquations[varname]
+            sector_rows.append(('S*' + varname, varname, eqn_info))
+            if self.PreviousEquations.get(varname) != eqn_info:
+                changed_rows.append(('C*' + varname, varname, eqn_info))
+        self.TreeSync.SyncBlock('CHANGED*EQUATIONS', changed_rows)
+        self.TreeSync.SyncBlock('SECTOR*EQUATIONS', sector_rows)
+        if len(self.WidgetsModelViewer.Data['search'].get()) > 0:
+            self.UpdateSearchResults()
+        self.UpdateDependencyPanel()
 
         # country_list = [self.WidgetsModelViewer.Data['parameter_final_equation'],]
         # for c in self.Model.CountryList:
         #     country_list.append(c.Code)
         # self.WidgetsModelViewer.Data['country'].set(country_list)
 
+    def SyncViewerBlock(self, parent, rows):
+        """
+        Push a block of rows to the equation tree and to the search index.
+        :param parent: str
+        :param rows: list
+        :return:
+        """
+        self.TreeSync.SyncBlock(parent, rows)
+        self.EquationIndex.SyncBlock(parent, rows)
+
+    def OnSearchChanged(self, *args):
+        # Wait for a pause in typing; each keystroke restarts the delay.
+        if self.SearchPending is not None:
+            self.after_cancel(self.SearchPending)
+        self.SearchPending = self.after(self.SearchDelay, self.UpdateSearchResults)
+
+    def UpdateSearchResults(self):
+        self.SearchPending = None
+        widgets = self.WidgetsModelViewer
+        query = widgets.Data['search'].get().strip()
+        try:
+            codes = self.EquationIndex.Search(query, regex=self.SearchRegex.get())
+        except re.error:
+            widgets.Data['search_status'].set('Invalid regular expression')
+            codes = []
+        else:
+            if len(query) == 0:
+                widgets.Data['search_status'].set('')
+            elif len(codes) > max_search_results:
+                widgets.Data['search_status'].set('{0} matches (first {1} shown)'.format(
+                    len(codes), max_search_results))
+            else:
+                widgets.Data['search_status'].set('{0} matches'.format(len(codes)))
+        self.SearchCodes = codes[0:max_search_results]
+        widgets.SetListBox('search_results', [self.GetSearchLabel(x) for x in self.SearchCodes])
+
+    def GetSearchLabel(self, code):
+        """
+        Text shown for a search result: the path to the row in the tree, and its equation.
+        :param code: str
+        :return: str
+        """
+        path = []
+        for item in self.TreeSync.GetPath(code):
+            path.append(self.EquationIndex.Rows[item][0])
+        text, values = self.EquationIndex.Rows[code]
+        if len(values) > 0:
+            return '{0}:  {1}'.format(' / '.join(path), values[0])
+        return ' / '.join(path)
+
+    def OnSearchSelect(self, event=None):
+        indices = self.WidgetsModelViewer.Widgets['search_results'].curselection()
+        if len(indices) == 0:
+            return
+        code = self.SearchCodes[indices[0]]
+        # Expanding the ancestors creates the row, if its block is not on the tree yet.
+        if not self.TreeSync.Reveal(code):
+            return
+        treewidget = self.WidgetsModelViewer.Widgets['equations']
+        treewidget.see(code)
+        treewidget.selection_set(code)
+        treewidget.focus(code)
+
+    def GetRowVariable(self, code):
+        """
+        Full name of the variable on a row of the equation tree, or None.
+        :param code: str
+        :return: str
+        """
+        if code in self.DependencyGraph:
+            # Final equation rows use the variable name as code.
+            return code
+        if code.startswith('S*') or code.startswith('C*'):
+            return code[2:]
+        return self.RowVariables.get(code)
+
+    def OnEquationSelect(self, event=None):
+        varname = self.GetRowVariable(self.WidgetsModelViewer.Widgets['equations'].focus())
+        if varname is None or varname == self.DependencyVariable:
+            return
+        self.DependencyVariable = varname
+        self.UpdateDependencyPanel()
+
+    def UpdateDependencyPanel(self):
+        """
+        Show the upstream and downstream closure (and the simultaneous block, if any) of
+        self.DependencyVariable, and the graph statistics.
+        :return:
+        """
+        widgets = self.WidgetsModelViewer
+        graph = self.DependencyGraph
+        dep_tree = widgets.Widgets['dependencies']
+        children = dep_tree.get_children()
+        if len(children) > 0:
+            dep_tree.delete(*children)
+        if len(graph) == 0:
+            widgets.Data['dep_stats'].set('No final equations yet.')
+        else:
+            widgets.Data['dep_stats'].set('\n'.join(
+                '{0}: {1}'.format(label, value) for label, value in graph.GetStatistics()))
+        varname = self.DependencyVariable
+        if varname is None or varname not in graph:
+            widgets.Data['dep_variable'].set('Select a variable in the equation tree.')
+            return
+        widgets.Data['dep_variable'].set(varname)
+        lagged = self.DependencyLagged.get()
+        sections = [('UP', 'Upstream', graph.GetUpstream(varname, lagged)),
+                    ('DOWN', 'Downstream', graph.GetDownstream(varname, lagged))]
+        component = graph.GetComponent(varname)
+        if graph.IsSimultaneous(component):
+            sections.append(('BLOCK', 'Simultaneous block',
+                             dict((x, '') for x in component)))
+        for section, text, closure in sections:
+            dep_tree.insert('', 'end', section, text='{0} ({1})'.format(text, len(closure)),
+                            open=True)
+            names = sorted(closure, key=lambda x: (closure[x], x))
+            for name in names[0:max_dependency_rows]:
+                dep_tree.insert(section, 'end', section + '*' + name, text=name,
+                                values=(closure[name],))
+            if len(names) > max_dependency_rows:
+                dep_tree.insert(section, 'end', section + '*MORE*',
+                                text='... {0} more'.format(len(names) - max_dependency_rows))
+
+    def OnDependencyDoubleClick(self, event=None):
+        code = self.WidgetsModelViewer.Widgets['dependencies'].focus()
+        if '*' not in code:
+            return
+        varname = code.split('*', 1)[1]
+        # The final equation rows use the variable name as code.
+        if not self.TreeSync.Reveal(varname):
+            return
+        treewidget = self.WidgetsModelViewer.Widgets['equations']
+        treewidget.see(varname)
+        treewidget.selection_set(varname)
+        treewidget.focus(varname)
+        self.OnEquationSelect()
+
     def OnChooseDir(self):
         target = fdog.askdirectory(title='Set Working Directory')
         if target == () or target == '':
@@ -431,56 +974,95 @@ class ModelRunner(tk.Tk):
         self.Parameters.LogDir = target
 
     def OnChangeModel(self, event):
-        idx = self.WidgetsChooser.Widgets['models'].curselection()
-        if len(idx) == 0:
+        name = self.GetModelName()
+        if name is None:
             self.WidgetsChooser.Data['model_desc'].set('')
             return
-        else:
-            idx = idx[0]
-        mlist =  self.WidgetsChooser.Data['models'].get()
-        mlist = eval(mlist)
-        name = mlist[idx]
         info = self.ValidateFile(name)
         self.WidgetsChooser.Data['model_desc'].set(info['description'])
         if info['is_valid']:
-            self.WidgetsChooser.Data['is_valid'].set('')
-            self.WidgetsChooser.Widgets['run_button'].state(['!disabled'])
+            if self.IsModifiedSinceLoad(name):
+                self.WidgetsChooser.Data['is_valid'].set('Modified since Load')
+            else:
+                self.WidgetsChooser.Data['is_valid'].set('')
+            if self.Worker is None:
+                self.WidgetsChooser.Widgets['run_button'].state(['!disabled'])
         else:
             self.WidgetsChooser.Data['is_valid'].set('Invalid File')
             self.WidgetsChooser.Widgets['run_button'].state(['disabled'])
 
     def DirectoryChanged(self):
         os.chdir(self.WidgetsChooser.Data['directory'].get())
-        flist = os.listdir('.')
-        acceptable = []
-        for f in flist:
-            if not f.endswith('.py'):
-                continue
-            header = 'sfcmod_'
-            if not f.startswith(header):
-                continue
-            f = f[:-3]
-            acceptable.append(f)
-        self.WidgetsChooser.SetListBox('models', acceptable)
+        if self.Scanner is not None:
+            self.Scanner.Stop()
+        self.WidgetsChooser.SetListBox('models', [])
+        self.Scanner = sfc_gui.model_scanner.ModelScanner(os.getcwd())
+        self.Scanner.start()
+        self.after(self.ScanPollInterval, self.PollScanner, self.Scanner)
+
+    def PollScanner(self, scanner):
+        """
+        Apply the directory scanner's updates to the model list; items are inserted and
+        deleted individually, in sorted order.
+        :param scanner: ModelScanner
+        :return:
+        """
+        if scanner is not self.Scanner:
+            # The directory changed; this scanner has been stopped.
+            return
+        models = self.WidgetsChooser.Data['models']
+        selected = self.GetModelName()
+        for msg, added, removed, changed in scanner.GetMessages():
+            for name in removed:
+                if name in models.Items:
+                    models.Delete(models.Items.index(name))
+            for name, info in added:
+                if name not in models.Items:
+                    models.Insert(bisect.bisect_left(models.Items, name), name)
+            for name, info in added + changed:
+                self.FlagModifiedFile(name, info['mtime'])
+                if name == selected:
+                    self.OnChangeModel(None)
+        self.after(self.ScanPollInterval, self.PollScanner, scanner)
+
+    def IsModifiedSinceLoad(self, name):
+        loaded = self.LoadedMtimes.get(name)
+        if loaded is None:
+            return False
+        try:
+            return os.stat(name + '.py').st_mtime != loaded
+        except OSError:
+            return False
+
+    def FlagModifiedFile(self, name, mtime):
+        """
+        Show model files that changed since they were loaded in red.
+        :param name: str
+        :param mtime: float
+        :return:
+        """
+        pos = self.WidgetsChooser.Data['models'].Index(name)
+        if pos is None:
+            return
+        listbox = self.WidgetsChooser.Widgets['models']
+        loaded = self.LoadedMtimes.get(name)
+        if loaded is not None and loaded != mtime:
+            listbox.itemconfig(pos, foreground='red')
+        else:
+            listbox.itemconfig(pos, foreground=listbox.cget('foreground'))
 
     def Importer(self, name):
         if type(name) is not str:
             name = name[0]
-        fpath = os.path.join('.', name + '.py')
-        return sfc_gui.module_loader.loader(name, fpath)
+        return sfc_gui.module_loader.load_model_module(name, '.')
 
     def ValidateFile(self, name):
-        mod = self.Importer(name)
-        out = {}
-        is_valid = True
-        if 'get_description' not in dir(mod):
-            out['description'] = 'Missing get_description()'
-        else:
-            out['description'] = mod.get_description()
-        if 'build_model' not in dir(mod):
-            is_valid = False
-        out['is_valid'] = is_valid
-        return out
+        """
+        Check the model file without importing it (the import happens on Load).
+        :param name: str
+        :return: dict
+        """
+        return sfc_gui.module_loader.inspect_model_file(os.path.join('.', name + '.py'))
 
 
 
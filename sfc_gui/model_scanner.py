@@ -0,0 +1,110 @@
+# coding=utf-8
+"""
+model_scanner.py
+
+Background scanner for the model chooser. A thread polls a directory for model files
+(sfcmod_*.py), keeps an index of their modification times and descriptions, and posts the
+differences between scans to a queue. The GUI drains the queue with after(), and updates the
+Listbox incrementally.
+
+Descriptions come from module_loader.inspect_model_file() (which does not execute the files),
+and are only recomputed for new or modified files.
+
+Messages are tuples:
+    ('update', added, removed, changed)
+where added and changed are lists of (name, info) and removed is a list of names. The info dict
+has the keys 'mtime', 'description' and 'is_valid'.
+"""
+
+import os
+import sys
+import threading
+
+import sfc_gui.module_loader
+
+if sys.version_info[0] < 3:
+    import Queue as queue
+else:
+    import queue
+
+
+class ModelScanner(threading.Thread):
+    def __init__(self, directory, interval=2.0):
+        """
+
+        :param directory: str
+        :param interval: float (seconds between scans)
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.Directory = directory
+        self.Interval = interval
+        self.Index = {}
+        self.Queue = queue.Queue()
+        self.StopEvent = threading.Event()
+
+    def Stop(self):
+        self.StopEvent.set()
+
+    def GetMessages(self):
+        out = []
+        while True:
+            try:
+                out.append(self.Queue.get_nowait())
+            except queue.Empty:
+                return out
+
+    def ListFiles(self):
+        """
+        Returns {name: mtime} for the model files in the directory.
+        :return: dict
+        """
+        out = {}
+        prefix = sfc_gui.module_loader.model_file_prefix
+        for f in os.listdir(self.Directory):
+            if not (f.startswith(prefix) and f.endswith('.py')):
+                continue
+            try:
+                out[f[:-3]] = os.stat(os.path.join(self.Directory, f)).st_mtime
+            except OSError:
+                # Deleted since listdir()
+                continue
+        return out
+
+    def ScanOnce(self):
+        """
+        Scan the directory and update self.Index.
+
+        Returns (added, removed, changed); see the module docstring.
+        :return: tuple
+        """
+        files = self.ListFiles()
+        added = []
+        changed = []
+        removed = [x for x in self.Index if x not in files]
+        for name in removed:
+            del self.Index[name]
+        for name, mtime in files.items():
+            old = self.Index.get(name)
+            if old is not None and old['mtime'] == mtime:
+                continue
+            info = sfc_gui.module_loader.inspect_model_file(
+                os.path.join(self.Directory, name + '.py'))
+            info['mtime'] = mtime
+            self.Index[name] = info
+            if old is None:
+                added.append((name, info))
+            else:
+                changed.append((name, info))
+        return added, removed, changed
+
+    def run(self):
+        while not self.StopEvent.is_set():
+            try:
+                added, removed, changed = self.ScanOnce()
+            except OSError:
+                # Directory went away (or network share is unavailable); try again later.
+                added, removed, changed = [], [], []
+            if len(added) + len(removed) + len(changed) > 0:
+                self.Queue.put(('update', added, removed, changed))
+            self.StopEvent.wait(self.Interval)
@@ -3,6 +3,8 @@
 
 Based on http://stackoverflow.com/questions/67631/how-to-import-a-module-given-the-full-path
 """
+import ast
+import os
 import sys
 
 
@@ -26,3 +28,199 @@ else:
     def loader(module_name, fpath):
         foo = imp.load_source(module_name, fpath)
         return foo
+
+
+# Model files are Python modules whose names start with this prefix; they must define build_model().
+model_file_prefix = 'sfcmod_'
+
+
+def list_model_files(directory='.'):
+    """
+    Find model files (sfcmod_*.py) in a directory.
+
+    Returns a list of module names (file names without the '.py').
+
+    :param directory: str
+    :return: list
+    """
+    acceptable = []
+    for f in os.listdir(directory):
+        if not f.endswith('.py'):
+            continue
+        if not f.startswith(model_file_prefix):
+            continue
+        acceptable.append(f[:-3])
+    return acceptable
+
+
+def load_model_module(name, directory='.'):
+    """
+    Load the model module 'name' (no '.py') from a directory.
+
+    :param name: str
+    :param directory: str
+    :return: module
+    """
+    fpath = os.path.join(directory, name + '.py')
+    return loader(name, fpath)
+
+
+# Absolute path -> ((mtime, size), info dict); see inspect_model_file().
+_inspect_cache = {}
+# Statements that bind a name, other than def and assignments (some are Python 3 only).
+_other_definitions = tuple(getattr(ast, x) for x in ('AsyncFunctionDef', 'ClassDef')
+                           if hasattr(ast, x))
+_other_assignments = tuple(getattr(ast, x) for x in ('AnnAssign', 'AugAssign') if hasattr(ast, x))
+# ast.literal_eval() can also fail on deeply nested or huge literals (RecursionError is a
+# RuntimeError).
+_literal_errors = (ValueError, TypeError, SyntaxError, MemoryError, RuntimeError)
+
+
+def inspect_model_file(fpath):
+    """
+    Check a model file without executing it: parses the source with ast, and looks for
+    module-level build_model() and get_description() bindings (definitions, assignments and
+    imports, including those under if/try/with blocks).
+
+    Returns a dict with keys 'is_valid' (build_model() exists) and 'description'. The description
+    is only available if get_description() just returns a constant (the usual case); otherwise
+    it is computed when the model is loaded. A file with a 'from ... import *' may get
+    build_model() from it, so it is taken as valid.
+
+    Results are cached on the file's modification time and size.
+
+    :param fpath: str
+    :return: dict
+    """
+    try:
+        st = os.stat(fpath)
+    except OSError:
+        return {'is_valid': False, 'description': 'File not found'}
+    key = os.path.abspath(fpath)
+    stamp = (st.st_mtime, st.st_size)
+    cached = _inspect_cache.get(key)
+    if cached is not None and cached[0] == stamp:
+        return dict(cached[1])
+    with open(fpath, 'rb') as f:
+        source = f.read()
+    info = inspect_model_source(source, fpath)
+    _inspect_cache[key] = (stamp, info)
+    return dict(info)
+
+
+def inspect_model_source(source, fpath='<model>'):
+    """
+    The parsing part of inspect_model_file().
+    :param source: str
+    :param fpath: str
+    :return: dict
+    """
+    try:
+        tree = ast.parse(source, filename=fpath)
+    except (SyntaxError, ValueError) as e:
+        lineno = getattr(e, 'lineno', None)
+        if lineno is None:
+            return {'is_valid': False, 'description': 'Syntax error'}
+        return {'is_valid': False, 'description': 'Syntax error (line {0})'.format(lineno)}
+    functions = {}
+    has_star_import = _get_bindings(tree.body, functions)
+    out = {'is_valid': 'build_model' in functions or has_star_import}
+    if 'get_description' not in functions and not has_star_import:
+        out['description'] = 'Missing get_description()'
+    else:
+        out['description'] = _get_constant_return(functions.get('get_description'))
+        if out['description'] is None:
+            out['description'] = '(Description available after Load)'
+    return out
+
+
+def _get_bindings(statements, out):
+    """
+    Add the module-level names bound by a list of statements to out (name -> function node, or
+    None if the name is not bound by a plain function definition, or is bound more than once).
+    Looks inside compound statements (if, try, with, for, ...), but not inside function or class
+    bodies.
+
+    Returns True if there is a 'from ... import *'.
+
+    :param statements: list
+    :param out: dict
+    :return: bool
+    """
+    has_star_import = False
+    for node in statements:
+        names = []
+        func_node = None
+        if isinstance(node, ast.FunctionDef):
+            names = [node.name]
+            func_node = node
+        elif isinstance(node, _other_definitions):
+            names = [node.name]
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            for alias in node.names:
+                if alias.name == '*':
+                    has_star_import = True
+                elif alias.asname is not None:
+                    names.append(alias.asname)
+                else:
+                    names.append(alias.name.split('.')[0])
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                names += _get_target_names(target)
+        elif isinstance(node, _other_assignments):
+            names = _get_target_names(node.target)
+        else:
+            # Compound statements: the bodies of if/for/while/with/try (and match) blocks.
+            for field in ('body', 'orelse', 'finalbody', 'handlers', 'cases'):
+                for child in getattr(node, field, ()):
+                    if isinstance(child, ast.AST) and hasattr(child, 'body') and \
+                            not isinstance(child, ast.stmt):
+                        # except handlers, match cases
+                        has_star_import = _get_bindings(child.body, out) or has_star_import
+                    else:
+                        has_star_import = _get_bindings([child], out) or has_star_import
+        for name in names:
+            if name in out:
+                # Bound more than once (if/else): cannot tell which definition is used.
+                out[name] = None
+            else:
+                out[name] = func_node
+    return has_star_import
+
+
+def _get_target_names(target):
+    if isinstance(target, ast.Name):
+        return [target.id]
+    if isinstance(target, (ast.Tuple, ast.List)):
+        out = []
+        for elt in target.elts:
+            out += _get_target_names(elt)
+        return out
+    return []
+
+
+def _get_constant_return(func_node):
+    """
+    If a function body is just "return <literal>" (plus optional docstring), return the literal
+    (as a string); otherwise None.
+    :param func_node: ast.FunctionDef
+    :return: str
+    """
+    if func_node is None:
+        return None
+    body = [x for x in func_node.body if not _is_docstring(x)]
+    if len(body) != 1 or not isinstance(body[0], ast.Return) or body[0].value is None:
+        return None
+    try:
+        return str(ast.literal_eval(body[0].value))
+    except _literal_errors:
+        return None
+
+
+def _is_docstring(node):
+    if not isinstance(node, ast.Expr):
+        return False
+    if hasattr(ast, 'Constant') and isinstance(node.value, ast.Constant):
+        return isinstance(node.value.value, str)
+    # Older Python versions
+    return type(node.value).__name__ == 'Str'
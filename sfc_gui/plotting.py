@@ -0,0 +1,489 @@
+# coding=utf-8
+"""
+plotting.py
+
+Fast redraw support for the chart plotters.
+
+A full canvas.draw() re-renders everything: axes, ticks, tick labels, axis labels. When the user
+is scrolling through series, usually only the line data changes. FastLinePlot marks the line
+artists as animated, caches the rendered background (everything but the lines) after every full
+draw, and updates the lines by restoring the background, drawing only the lines, and blitting.
+A full draw is only done when the axis limits (or label) change.
+
+MultiLinePlot does the same for several series in one figure (overlaid, or as small multiples).
+
+Long series (long MaxTime horizons, convergence traces) are decimated before they are handed to
+the line artists: decimate_minmax() keeps the minimum and maximum of each bucket, with one bucket
+per horizontal pixel of the axes, so the drawn line looks the same but has at most two points
+per pixel. Decimation happens after the time window is cut, so zooming in to a short window
+brings back full resolution.
+
+TimeWindowNavigator adds zoom (scroll wheel) and pan (drag) of the time window.
+
+Based on the "Faster rendering by using blitting" matplotlib tutorial.
+"""
+
+import math
+
+import numpy
+
+from sfc_gui.series_store import SeriesStore
+
+
+def decimate_minmax(x, y, num_buckets):
+    """
+    Min/max decimation: split the series into num_buckets buckets of consecutive points, and keep
+    the points with the smallest and largest y value in each (in their original order), plus the
+    first and last points. Series with no more than 2*num_buckets points are returned unchanged.
+
+    NaN values (gaps) are only kept if a bucket has nothing else.
+
+    :param x: array
+    :param y: array
+    :param num_buckets: int
+    :return: tuple (x, y)
+    """
+    num_points = len(y)
+    if num_buckets < 1 or num_points <= 2 * num_buckets:
+        return x, y
+    x = numpy.asarray(x, dtype=float)
+    y = numpy.asarray(y, dtype=float)
+    bucket_size = int(math.ceil(float(num_points) / num_buckets))
+    num_buckets = int(math.ceil(float(num_points) / bucket_size))
+    blocks = numpy.empty(num_buckets * bucket_size)
+    blocks[0:num_points] = y
+    blocks[num_points:] = numpy.nan
+    blocks = blocks.reshape((num_buckets, bucket_size))
+    is_nan = numpy.isnan(blocks)
+    low = numpy.where(is_nan, numpy.inf, blocks).argmin(axis=1)
+    high = numpy.where(is_nan, -numpy.inf, blocks).argmax(axis=1)
+    offsets = numpy.arange(0, num_buckets) * bucket_size
+    idx = numpy.concatenate(([0, num_points - 1], offsets + low, offsets + high))
+    # unique() also sorts, which restores the original order.
+    idx = numpy.unique(idx)
+    idx = idx[idx < num_points]
+    return x[idx], y[idx]
+
+
+def get_num_buckets(ax):
+    """
+    Number of decimation buckets for an Axes: its width in pixels.
+    :param ax: Axes
+    :return: int
+    """
+    return int(ax.get_window_extent().width)
+
+
+class FastLinePlot(object):
+    def __init__(self, canvas, ax, lines):
+        """
+
+        :param canvas: FigureCanvas (any backend that supports copy_from_bbox)
+        :param ax: Axes
+        :param lines: list of Line2D
+        """
+        self.Canvas = canvas
+        self.Axes = ax
+        self.Lines = list(lines)
+        for line in self.Lines:
+            line.set_animated(True)
+        self.Background = None
+        self.Limits = None
+        self.Decimate = True
+        # Counters, for benchmarking.
+        self.NumFullDraws = 0
+        self.NumBlits = 0
+        self.Canvas.mpl_connect('draw_event', self.OnDraw)
+
+    def OnDraw(self, event):
+        """
+        Called after every full draw (including ones triggered by Tk, such as a resize).
+        The animated lines are not part of a full draw, so cache the background and add them.
+        :param event:
+        :return:
+        """
+        self.Background = self.Canvas.copy_from_bbox(self.Canvas.figure.bbox)
+        self.DrawLines()
+
+    def DrawLines(self):
+        for line in self.Lines:
+            self.Axes.draw_artist(line)
+
+    def SetData(self, x, y, pos=0):
+        """
+        Set the data of a line, decimated to the width of the axes if Decimate is set.
+        :param x: array
+        :param y: array
+        :param pos: int
+        :return:
+        """
+        if self.Decimate:
+            x, y = decimate_minmax(x, y, get_num_buckets(self.Axes))
+        self.Lines[pos].set_data(x, y)
+
+    def Update(self, xlim, ylim, xlabel=None):
+        """
+        Show the current line data (call after set_data()). Does a full draw only if the limits
+        or the x axis label changed; otherwise blits the lines over the cached background.
+
+        :param xlim: tuple
+        :param ylim: tuple
+        :param xlabel: str
+        :return:
+        """
+        limits = (tuple(xlim), tuple(ylim), xlabel)
+        if self.Background is None or not limits == self.Limits:
+            self.Axes.set_xlim(*xlim)
+            self.Axes.set_ylim(*ylim)
+            if xlabel is not None:
+                self.Axes.set_xlabel(xlabel)
+            self.Limits = limits
+            self.Canvas.draw()
+            self.NumFullDraws += 1
+            return
+        self.Canvas.restore_region(self.Background)
+        self.DrawLines()
+        self.Canvas.blit(self.Canvas.figure.bbox)
+        self.NumBlits += 1
+
+    def Invalidate(self):
+        """
+        Force a full draw on the next Update() (for example, after adding artists).
+        :return:
+        """
+        self.Background = None
+
+
+def get_padded_limits(x, y):
+    """
+    Axis limits for a line, with the padding used by the chart plotters.
+
+    :param x: array
+    :param y: array
+    :return: tuple
+    """
+    x_min, x_max = SeriesStore.GetLimits(x)
+    y_min, y_max = SeriesStore.GetLimits(y)
+    return (x_min, x_max + 1), (y_min, y_max + .1)
+
+
+def get_grid_shape(num_panels):
+    """
+    (rows, columns) for a grid of small multiples; as close to square as possible.
+
+    :param num_panels: int
+    :return: tuple
+    """
+    if num_panels < 1:
+        return 1, 1
+    num_cols = int(math.ceil(math.sqrt(num_panels)))
+    num_rows = int(math.ceil(float(num_panels) / num_cols))
+    return num_rows, num_cols
+
+
+class MultiLinePlot(object):
+    """
+    Several series in one figure, either overlaid on one set of axes ('overlay'), or as a grid
+    of small multiples with one panel per series ('grid').
+
+    The line artists and panels are kept, and reused as the selection changes. As in
+    FastLinePlot, the lines are animated and blitted over a cached background; a full draw is
+    only done if the layout, the axis limits or the labels change.
+
+    A full draw costs roughly one axes (ticks and tick labels) per panel, so the grid is capped
+    at MaxPanels panels; the series that do not fit are listed in the figure title. The legend
+    of the overlay is capped at MaxLegend entries.
+    """
+    def __init__(self, canvas, max_panels=16, max_legend=10):
+        """
+
+        :param canvas: FigureCanvas (any backend that supports copy_from_bbox)
+        :param max_panels: int
+        :param max_legend: int
+        """
+        self.Canvas = canvas
+        self.Figure = canvas.figure
+        self.MaxPanels = max_panels
+        self.MaxLegend = max_legend
+        self.Mode = None
+        self.GridShape = None
+        # Overlay mode: one Axes, pool of lines
+        self.OverlayAxes = None
+        self.OverlayLines = []
+        self.LegendNames = None
+        # Grid mode: list of (Axes, Line2D)
+        self.Panels = []
+        self.Title = None
+        self.ActiveLines = []
+        self.Background = None
+        self.State = None
+        self.Decimate = True
+        # Counters, for benchmarking.
+        self.NumFullDraws = 0
+        self.NumBlits = 0
+        self.Canvas.mpl_connect('draw_event', self.OnDraw)
+
+    def OnDraw(self, event):
+        self.Background = self.Canvas.copy_from_bbox(self.Figure.bbox)
+        self.DrawLines()
+
+    def DrawLines(self):
+        for line in self.ActiveLines:
+            line.axes.draw_artist(line)
+
+    def Update(self, series, mode='overlay', xlabel=None):
+        """
+        Show a list of series. Does a full draw only if the layout, the limits or the labels
+        changed; otherwise blits the lines over the cached background.
+
+        :param series: list of (name, x, y)
+        :param mode: str ('overlay' or 'grid')
+        :param xlabel: str
+        :return:
+        """
+        if mode == 'overlay':
+            state = self._UpdateOverlay(series, xlabel)
+            hidden = []
+        elif mode == 'grid':
+            state = self._UpdateGrid(series[0:self.MaxPanels], xlabel)
+            hidden = [x[0] for x in series[self.MaxPanels:]]
+        else:
+            raise ValueError('Unknown plot mode: ' + str(mode))
+        if len(hidden) > 0:
+            title = 'Not shown: ' + ', '.join(hidden)
+            if len(title) > 80:
+                title = 'Not shown: {0} series'.format(len(hidden))
+        else:
+            title = ''
+        state = (mode, state, title)
+        if self.Background is None or not state == self.State:
+            self.Title.set_text(title)
+            self.State = state
+            self.Canvas.draw()
+            self.NumFullDraws += 1
+            return
+        self.Canvas.restore_region(self.Background)
+        self.DrawLines()
+        self.Canvas.blit(self.Figure.bbox)
+        self.NumBlits += 1
+
+    def Invalidate(self):
+        """
+        Force a full draw on the next Update().
+        :return:
+        """
+        self.Background = None
+
+    def _SetData(self, line, x, y):
+        if self.Decimate:
+            x, y = decimate_minmax(x, y, get_num_buckets(line.axes))
+        line.set_data(x, y)
+        return x, y
+
+    def _ClearFigure(self, mode):
+        self.Figure.clf()
+        self.Title = self.Figure.suptitle('', fontsize='small')
+        self.Mode = mode
+        self.GridShape = None
+        self.OverlayAxes = None
+        self.OverlayLines = []
+        self.LegendNames = None
+        self.Panels = []
+        self.Background = None
+
+    def _UpdateOverlay(self, series, xlabel):
+        if not self.Mode == 'overlay':
+            self._ClearFigure('overlay')
+            self.Figure.subplots_adjust()
+            self.OverlayAxes = self.Figure.add_subplot(111)
+        ax = self.OverlayAxes
+        while len(self.OverlayLines) < len(series):
+            color = 'C{0}'.format(len(self.OverlayLines) % 10)
+            line, = ax.plot([], [], 'o-', color=color, markersize=3, animated=True)
+            self.OverlayLines.append(line)
+        self.ActiveLines = []
+        x_min, x_max, y_min, y_max = (None, None, None, None)
+        for pos in range(0, len(self.OverlayLines)):
+            line = self.OverlayLines[pos]
+            if pos >= len(series):
+                line.set_data([], [])
+                line.set_visible(False)
+                line.set_label('_nolegend_')
+                continue
+            name, x, y = series[pos]
+            x, y = self._SetData(line, x, y)
+            line.set_visible(True)
+            line.set_label(name)
+            self.ActiveLines.append(line)
+            xlim, ylim = get_padded_limits(x, y)
+            if x_min is None:
+                x_min, x_max = xlim
+                y_min, y_max = ylim
+            else:
+                x_min, x_max = min(x_min, xlim[0]), max(x_max, xlim[1])
+                y_min, y_max = min(y_min, ylim[0]), max(y_max, ylim[1])
+        if x_min is None:
+            x_min, x_max, y_min, y_max = (0., 1., 0., 1.)
+        ax.set_xlim(x_min, x_max)
+        ax.set_ylim(y_min, y_max)
+        if xlabel is not None:
+            ax.set_xlabel(xlabel)
+        names = tuple(x[0] for x in series)
+        if not names == self.LegendNames:
+            # The legend is part of the background, so only rebuild it when the names change.
+            legend = ax.get_legend()
+            if legend is not None:
+                legend.remove()
+            if len(series) > 1:
+                ax.legend(handles=self.ActiveLines[0:self.MaxLegend], loc='best',
+                          fontsize='small')
+            self.LegendNames = names
+        return (x_min, x_max, y_min, y_max), xlabel, names
+
+    def _UpdateGrid(self, series, xlabel):
+        shape = get_grid_shape(len(series))
+        if not self.Mode == 'grid' or not shape == self.GridShape:
+            self._ClearFigure('grid')
+            self.GridShape = shape
+            num_rows, num_cols = shape
+            self.Figure.subplots_adjust(hspace=.5, wspace=.3)
+            for pos in range(0, num_rows * num_cols):
+                ax = self.Figure.add_subplot(num_rows, num_cols, pos + 1)
+                ax.tick_params(labelsize='x-small')
+                line, = ax.plot([], [], 'bo-', markersize=2, animated=True)
+                self.Panels.append((ax, line))
+        self.ActiveLines = []
+        limits = []
+        num_cols = shape[1]
+        for pos in range(0, len(self.Panels)):
+            ax, line = self.Panels[pos]
+            if pos >= len(series):
+                ax.set_visible(False)
+                line.set_data([], [])
+                continue
+            name, x, y = series[pos]
+            ax.set_visible(True)
+            x, y = self._SetData(line, x, y)
+            self.ActiveLines.append(line)
+            xlim, ylim = get_padded_limits(x, y)
+            ax.set_xlim(*xlim)
+            ax.set_ylim(*ylim)
+            ax.set_title(name, fontsize='small')
+            # Only the lowest panel in each column gets x tick labels and the axis label.
+            is_bottom = pos + num_cols >= len(series)
+            ax.tick_params(labelbottom=is_bottom)
+            if xlabel is not None and is_bottom:
+                ax.set_xlabel(xlabel, fontsize='small')
+            else:
+                ax.set_xlabel('')
+            limits.append((name, xlim, ylim))
+        return shape, tuple(limits), xlabel
+
+
+class TimeWindowNavigator(object):
+    """
+    Mouse zoom and pan of the time window of a graph:
+        - scroll wheel: zoom in or out around the cursor;
+        - left button drag: pan;
+        - double click: show the whole series.
+
+    The window is stored in the Parameters object (TimeStart/TimeRange, through SetTimeWindow()),
+    so it stays in sync with the Settings window. on_change() is called to redraw; it should
+    re-slice the data with Parameters.GetWindow().
+
+    Mouse events arrive much faster than a full draw, so redraws are throttled: at most one
+    every Delay milliseconds, scheduled with schedule(delay, function) (a Tk widget's after()).
+    The last position is always drawn when the button is released. If schedule is None, every
+    change is drawn immediately.
+    """
+    def __init__(self, canvas, parameters, on_change, schedule=None, delay=40):
+        """
+
+        :param canvas: FigureCanvas
+        :param parameters: Parameters
+        :param on_change: function
+        :param schedule: function
+        :param delay: int (milliseconds)
+        """
+        self.Canvas = canvas
+        self.Parameters = parameters
+        self.OnChange = on_change
+        self.Schedule = schedule
+        self.Delay = delay
+        self.ZoomFactor = 1.25
+        # (pixel x, start, range, pixels per time step) at the start of a drag
+        self.Drag = None
+        self.Pending = False
+        self.NumRedraws = 0
+        canvas.mpl_connect('scroll_event', self.OnScroll)
+        canvas.mpl_connect('button_press_event', self.OnPress)
+        canvas.mpl_connect('motion_notify_event', self.OnMotion)
+        canvas.mpl_connect('button_release_event', self.OnRelease)
+
+    def OnScroll(self, event):
+        if event.inaxes is None or event.xdata is None:
+            return
+        start, time_range = self.Parameters.GetTimeWindow()
+        if time_range < 1:
+            return
+        if event.button == 'up':
+            new_range = int(round(time_range / self.ZoomFactor))
+            new_range = min(new_range, time_range - 1)
+        else:
+            new_range = int(round(time_range * self.ZoomFactor))
+            new_range = max(new_range, time_range + 1)
+        # Keep the time under the cursor fixed.
+        x = event.xdata
+        new_start = int(round(x - (x - start) * float(new_range) / time_range))
+        self.SetWindow(new_start, new_range)
+
+    def OnPress(self, event):
+        if event.inaxes is None:
+            return
+        if event.dblclick:
+            self.Drag = None
+            self.SetWindow(None, None)
+            self.Flush()
+            return
+        if not event.button == 1:
+            return
+        start, time_range = self.Parameters.GetTimeWindow()
+        width = event.inaxes.get_window_extent().width
+        if time_range < 1 or width <= 0:
+            return
+        self.Drag = (event.x, start, time_range, width / time_range)
+
+    def OnMotion(self, event):
+        if self.Drag is None or event.x is None:
+            return
+        x0, start, time_range, pixels_per_step = self.Drag
+        shift = int(round((event.x - x0) / pixels_per_step))
+        self.SetWindow(start - shift, time_range)
+
+    def OnRelease(self, event):
+        self.Drag = None
+        self.Flush()
+
+    def SetWindow(self, time_start, time_range):
+        if self.Parameters.SetTimeWindow(time_start, time_range):
+            self.RequestRedraw()
+
+    def RequestRedraw(self):
+        if self.Schedule is None:
+            self.Pending = True
+            self.Flush()
+            return
+        if not self.Pending:
+            self.Pending = True
+            self.Schedule(self.Delay, self.Flush)
+
+    def Flush(self):
+        """
+        Redraw now, if a change is pending.
+        :return:
+        """
+        if not self.Pending:
+            return
+        self.Pending = False
+        self.NumRedraws += 1
+        self.OnChange()
@@ -0,0 +1,277 @@
+# coding=utf-8
+"""
+profiler.py
+
+Command line profiling harness for model files: imports a model file, builds it (build_model())
+and runs it step by step (as the Model Runner does), recording the time of every phase, under an
+optional profiler.
+
+Usage:
+    python -m sfc_gui.profiler [model files] [--profiler {none,cprofile,sample}] [--outdir DIR]
+        [--baseline FILE] [--save-baseline FILE] [--threshold 0.25] [--repeat N]
+
+If no model files are given, the example models in sfc_gui/examples/scripts (sfcmod_*.py) are
+used as the benchmark suite.
+
+Output, per model, in the output directory (default: profile_output):
+    <model>_timings.json  -- phase timings (see instrumentation.StepTimings); the phases are
+                             'import', 'build', then each Model step ('Fix Aliases', ..., 'Solve').
+    <model>.prof          -- with --profiler cprofile: pstats file (for snakeviz, gprof2dot, ...).
+    <model>.folded        -- with --profiler sample: stack samples in "folded" format
+                             ("frame;frame;frame count" per line), the input of flamegraph.pl
+                             and speedscope.
+
+Profiling slows the run down; for timings to compare with a baseline, use --profiler none, or
+--repeat 2 or more (the profiled first run is then left out of the timings).
+
+Baselines are JSON files {model: {phase: seconds}}. With --baseline, every phase that is slower
+than the baseline by more than the threshold (and by more than min_regression seconds, so that
+very short phases do not trigger on noise) is reported, and the exit status is 1.
+
+(Named profiler.py rather than profile.py, to stay clear of the standard library profile module.)
+"""
+from __future__ import print_function
+
+import argparse
+import cProfile
+import glob
+import json
+import os
+import sys
+import threading
+import time
+import traceback
+
+import sfc_gui.module_loader
+from sfc_gui.instrumentation import StepTimings
+
+profilers = ('none', 'cprofile', 'sample')
+# Regressions shorter than this (seconds) are ignored.
+min_regression = 0.05
+
+
+def get_example_suite():
+    """
+    The example model files shipped with sfc_gui.
+    :return: list
+    """
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'examples', 'scripts')
+    out = glob.glob(os.path.join(directory, sfc_gui.module_loader.model_file_prefix + '*.py'))
+    out.sort()
+    return out
+
+
+class StackSampler(threading.Thread):
+    """
+    Sampling profiler: a background thread that records the stack of another thread every
+    Interval seconds, and counts the distinct stacks.
+    """
+    def __init__(self, thread_id, interval=0.001):
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.ThreadId = thread_id
+        self.Interval = interval
+        self.StopEvent = threading.Event()
+        self.Counts = {}
+        self.NumSamples = 0
+
+    def Stop(self):
+        self.StopEvent.set()
+        self.join()
+
+    def run(self):
+        while not self.StopEvent.wait(self.Interval):
+            frame = sys._current_frames().get(self.ThreadId)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append('{0} ({1}:{2})'.format(code.co_name, os.path.basename(code.co_filename),
+                                                    code.co_firstlineno))
+                frame = frame.f_back
+            key = ';'.join(reversed(stack))
+            self.Counts[key] = self.Counts.get(key, 0) + 1
+            self.NumSamples += 1
+
+    def SaveFolded(self, fname):
+        with open(fname, 'w') as f:
+            for key in sorted(self.Counts):
+                f.write('{0} {1}\n'.format(key, self.Counts[key]))
+
+
+def run_phases(fpath, timings):
+    """
+    Import, build and run a model file, timing each phase.
+
+    :param fpath: str
+    :param timings: StepTimings
+    :return: Model
+    """
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    python_mod = timings.Measure('import', sfc_gui.module_loader.loader, name, fpath)
+    model = timings.Measure('build', python_mod.build_model)
+    while True:
+        steps = model._GetSteps()
+        if len(steps) == 0:
+            break
+        step_name = steps[0][0]
+        timings.Measure(step_name, model._RunStep, step_name)
+    return model
+
+
+def profile_model(fpath, out_dir, profiler='none', repeat=1):
+    """
+    Profile one model file. Returns {phase: seconds}, the fastest of repeat runs.
+
+    Only the first run is profiled. Profiling slows it down, so its timings are only used if
+    repeat is 1.
+
+    :param fpath: str
+    :param out_dir: str
+    :param profiler: str
+    :param repeat: int
+    :return: dict
+    """
+    from sfc_models.utils import Logger
+    fpath = os.path.abspath(fpath)
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    best = {}
+    best_timings = None
+    for i in range(0, repeat):
+        Logger.cleanup()
+        timings = StepTimings(trace_memory=False)
+        prof = None
+        sampler = None
+        # Only profile the first run; the others are for the timings.
+        if i == 0 and profiler == 'cprofile':
+            prof = cProfile.Profile()
+            prof.enable()
+        elif i == 0 and profiler == 'sample':
+            sampler = StackSampler(threading.current_thread().ident)
+            sampler.start()
+        cwd = os.getcwd()
+        try:
+            # Model files may use paths relative to their directory.
+            os.chdir(os.path.dirname(fpath))
+            run_phases(fpath, timings)
+        finally:
+            os.chdir(cwd)
+            if prof is not None:
+                prof.disable()
+                prof.dump_stats(os.path.join(out_dir, name + '.prof'))
+            if sampler is not None:
+                sampler.Stop()
+                sampler.SaveFolded(os.path.join(out_dir, name + '.folded'))
+            Logger.cleanup()
+        phases = get_phase_times(timings)
+        if i == 1 and not profiler == 'none':
+            # The profiled run is slowed down by the profiler; only keep it if it is the only run.
+            best_timings = None
+        if best_timings is None or sum(phases.values()) < sum(best.values()):
+            best = phases
+            best_timings = timings
+    best_timings.SaveJSON(os.path.join(out_dir, name + '_timings.json'), model_name=name)
+    return best
+
+
+def get_phase_times(timings):
+    """
+    {phase: seconds} from a StepTimings object (phases with the same name are added up).
+    :param timings: StepTimings
+    :return: dict
+    """
+    out = {}
+    for record in timings.Records:
+        out[record['step']] = out.get(record['step'], 0.) + record['elapsed']
+    return out
+
+
+def compare_to_baseline(name, phases, baseline, threshold):
+    """
+    List of (phase, baseline seconds, seconds) for the phases that got slower than the baseline
+    by more than threshold (relative) and min_regression (seconds).
+
+    :param name: str
+    :param phases: dict
+    :param baseline: dict
+    :param threshold: float
+    :return: list
+    """
+    out = []
+    base = baseline.get(name, {})
+    for phase, elapsed in phases.items():
+        if phase not in base:
+            continue
+        old = base[phase]
+        if elapsed > old * (1. + threshold) and elapsed - old > min_regression:
+            out.append((phase, old, elapsed))
+    return out
+
+
+def load_baseline(fname):
+    if not os.path.exists(fname):
+        return {}
+    with open(fname) as f:
+        return json.load(f)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sfc_gui.profiler',
+                                     description='Profile the build and solve phases of model files.')
+    parser.add_argument('model_files', nargs='*',
+                        help='Model files (default: the example models in sfc_gui/examples/scripts)')
+    parser.add_argument('--profiler', default='none', choices=profilers,
+                        help='cprofile: write a pstats file; sample: write folded stacks for flame graphs')
+    parser.add_argument('--outdir', default='profile_output', help='Output directory')
+    parser.add_argument('--baseline', default=None, help='Compare against this baseline file')
+    parser.add_argument('--save-baseline', default=None, help='Write the timings to this baseline file')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Relative slow-down that counts as a regression (default: 0.25)')
+    parser.add_argument('--repeat', type=int, default=1, help='Runs per model; the fastest is kept')
+    args = parser.parse_args(argv)
+    model_files = args.model_files
+    if len(model_files) == 0:
+        model_files = get_example_suite()
+    if not os.path.isdir(args.outdir):
+        os.makedirs(args.outdir)
+    baseline = {}
+    if args.baseline is not None:
+        baseline = load_baseline(args.baseline)
+    results = {}
+    num_failed = 0
+    regressions = []
+    for fpath in model_files:
+        name = os.path.splitext(os.path.basename(fpath))[0]
+        start = time.time()
+        try:
+            phases = profile_model(fpath, args.outdir, args.profiler, max(args.repeat, 1))
+        except Exception:
+            print('{0}: FAILED'.format(name))
+            traceback.print_exc(limit=4)
+            num_failed += 1
+            continue
+        results[name] = phases
+        print('{0} ({1:.1f}s)'.format(name, time.time() - start))
+        for phase in sorted(phases, key=lambda x: -phases[x]):
+            old = baseline.get(name, {}).get(phase)
+            if old is None:
+                print('    {0:<30} {1:9.3f}s'.format(phase, phases[phase]))
+            else:
+                print('    {0:<30} {1:9.3f}s  (baseline {2:.3f}s)'.format(phase, phases[phase], old))
+        for phase, old, new in compare_to_baseline(name, phases, baseline, args.threshold):
+            regressions.append((name, phase, old, new))
+    if args.save_baseline is not None:
+        saved = load_baseline(args.save_baseline)
+        saved.update(results)
+        with open(args.save_baseline, 'w') as f:
+            json.dump(saved, f, indent=2, sort_keys=True)
+    for name, phase, old, new in regressions:
+        print('REGRESSION {0} {1}: {2:.3f}s -> {3:.3f}s'.format(name, phase, old, new))
+    if num_failed > 0 or len(regressions) > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
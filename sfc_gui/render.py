@@ -0,0 +1,266 @@
+# coding=utf-8
+"""
+render.py
+
+Headless chart rendering: writes one image (PNG, SVG or PDF) per series of a solved model, for
+reports. Uses the Agg backend directly (no Tk, no pyplot), and spreads the series across a pool
+of worker processes.
+
+Usage:
+    python -m sfc_gui.render <result file or model file> [--outdir DIR] [--format png]
+        [--source "Time Series"] [--filter REGEX] [--start N] [--range N] [--workers N]
+
+The input is either a saved result file (.sfcr, from the Model Runner "Save Results" button or the
+result cache), or a model file, which is built and solved first. The workers memory-map the result
+file, so only the series that a worker renders are read.
+
+The charts follow ChartPlotterFrame.Update(): the series is cut to the TimeStart/TimeRange window
+(here, --start/--range; the default is the whole series), the x axis is labelled with the time
+axis variable, and the equation and description come from get_series_info(). Long series are
+decimated to the image width, as on screen.
+
+Each worker process renders a chunk of series with a single Figure, only replacing the line data
+and the labels between charts.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+
+import sfc_gui.module_loader
+import sfc_gui.result_file
+from sfc_gui.plotting import decimate_minmax, get_num_buckets, get_padded_limits
+from sfc_gui.utils import get_series_info
+
+formats = ('png', 'svg', 'pdf')
+
+
+def get_file_name(series_name, fmt):
+    """
+    Image file name for a series; characters that are not safe in file names become '_'.
+    :param series_name: str
+    :param fmt: str
+    :return: str
+    """
+    return re.sub(r'[^\w.\-]', '_', series_name) + '.' + fmt
+
+
+def select_series(store, pattern=None):
+    """
+    Names of the series to render: all series (except the time axis) that match the regular
+    expression pattern (re.search), or all of them if pattern is None.
+
+    :param store: SeriesStore
+    :param pattern: str
+    :return: list
+    """
+    out = []
+    regex = None
+    if pattern is not None:
+        regex = re.compile(pattern)
+    for name in store.GetSeriesList():
+        if name == store.TimeAxisVariable:
+            continue
+        if regex is not None and regex.search(name) is None:
+            continue
+        out.append(name)
+    return out
+
+
+class ChartRenderer(object):
+    """
+    One Figure, reused for every chart.
+    """
+    def __init__(self, figsize=(7.5, 5), dpi=90):
+        self.Figure = Figure(figsize=figsize, dpi=dpi)
+        self.Canvas = FigureCanvasAgg(self.Figure)
+        self.Axes = self.Figure.add_subplot(111)
+        self.Line, = self.Axes.plot([], [], 'bo-', markersize=3)
+        self.Title = self.Figure.suptitle('')
+
+    def Render(self, fname, store, series_name, equations, time_start=None, time_range=None):
+        """
+        Render one series to fname (the format comes from the extension).
+
+        :param fname: str
+        :param store: SeriesStore
+        :param series_name: str
+        :param equations: object with a FinalEquationBlock (ResultFile or Model)
+        :param time_start: int
+        :param time_range: int
+        :return:
+        """
+        x, y = store.GetWindow(series_name, time_start, time_range)
+        x, y = decimate_minmax(x, y, get_num_buckets(self.Axes))
+        self.Line.set_data(x, y)
+        xlim, ylim = get_padded_limits(x, y)
+        self.Axes.set_xlim(*xlim)
+        self.Axes.set_ylim(*ylim)
+        self.Axes.set_xlabel(store.TimeAxisVariable)
+        eqn_str, desc = get_series_info(series_name, equations)
+        if eqn_str == '':
+            eqn_str = series_name
+        self.Title.set_text(eqn_str)
+        self.Axes.set_title(desc, fontsize='small')
+        self.Figure.savefig(fname)
+
+
+def render_chunk(result_fname, source, series_names, out_dir, fmt, time_start=None,
+                 time_range=None):
+    """
+    Render a list of series from a result file. Runs inside a worker process.
+
+    Returns a list of dicts with the keys: name, file, ok, message.
+
+    :param result_fname: str
+    :param source: str
+    :param series_names: list
+    :param out_dir: str
+    :param fmt: str
+    :param time_start: int
+    :param time_range: int
+    :return: list
+    """
+    results = sfc_gui.result_file.ResultFile(result_fname)
+    store = results.GetStore(source)
+    renderer = ChartRenderer()
+    out = []
+    for name in series_names:
+        fname = os.path.join(out_dir, get_file_name(name, fmt))
+        info = {'name': name, 'file': fname, 'ok': False, 'message': ''}
+        try:
+            renderer.Render(fname, store, name, results, time_start, time_range)
+            info['ok'] = True
+        except Exception as e:
+            info['message'] = '{0}: {1}'.format(type(e).__name__, str(e))
+        out.append(info)
+    return out
+
+
+def solve_model_file(fpath, result_fname):
+    """
+    Build and solve a model file, and save the results.
+
+    :param fpath: str
+    :param result_fname: str
+    :return:
+    """
+    # Imported here: rendering a result file does not need sfc_models (which also imports Tk).
+    from sfc_models.utils import Logger
+    Logger.cleanup()
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    python_mod = sfc_gui.module_loader.loader(name, fpath)
+    model = python_mod.build_model()
+    model.main()
+    sfc_gui.result_file.save_results(result_fname, model, model_name=name)
+
+
+def render_all(result_fname, out_dir, fmt='png', source='Time Series', pattern=None,
+               time_start=None, time_range=None, max_workers=None):
+    """
+    Render the series of a result file in parallel. Returns a list of result dicts (see
+    render_chunk()), sorted by series name.
+
+    :param result_fname: str
+    :param out_dir: str
+    :param fmt: str
+    :param source: str
+    :param pattern: str
+    :param time_start: int
+    :param time_range: int
+    :param max_workers: int
+    :return: list
+    """
+    if fmt not in formats:
+        raise ValueError('Unsupported format: ' + fmt)
+    results = sfc_gui.result_file.ResultFile(result_fname)
+    if source not in results.SourceOptions:
+        raise ValueError('Unknown time series source: ' + source)
+    names = select_series(results.GetStore(source), pattern)
+    if not os.path.isdir(out_dir):
+        os.makedirs(out_dir)
+    out = []
+    if len(names) == 0:
+        return out
+    if max_workers is None:
+        max_workers = os.cpu_count() or 1
+    # A few chunks per worker, so that the load stays balanced, while each worker still reuses
+    # its Figure for many charts.
+    num_chunks = min(len(names), 4 * max_workers)
+    chunks = [names[i::num_chunks] for i in range(0, num_chunks)]
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = {}
+        for chunk in chunks:
+            fut = pool.submit(render_chunk, result_fname, source, chunk, out_dir, fmt,
+                              time_start, time_range)
+            futures[fut] = chunk
+        for fut in as_completed(futures):
+            try:
+                out += fut.result()
+            except Exception as e:
+                # The worker process itself died.
+                for name in futures[fut]:
+                    out.append({'name': name, 'file': '', 'ok': False,
+                                'message': '{0}: {1}'.format(type(e).__name__, str(e))})
+    out.sort(key=lambda x: x['name'])
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sfc_gui.render',
+                                     description='Render the series of a solved model to image files.')
+    parser.add_argument('input', help='Result file (.sfcr) or model file (.py, must define build_model())')
+    parser.add_argument('--outdir', default='charts', help='Output directory (default: charts)')
+    parser.add_argument('--format', default='png', choices=formats, help='Image format (default: png)')
+    parser.add_argument('--source', default='Time Series',
+                        choices=[x[0] for x in sfc_gui.result_file.sources],
+                        help='Time series source (default: Time Series)')
+    parser.add_argument('--filter', default=None, help='Only series whose name matches this regular expression')
+    parser.add_argument('--start', type=int, default=None, help='Start of the time window')
+    parser.add_argument('--range', type=int, default=None, help='Length of the time window (default: all)')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
+    args = parser.parse_args(argv)
+    start = time.time()
+    result_fname = args.input
+    tmp_name = None
+    if args.input.endswith('.py'):
+        handle, tmp_name = tempfile.mkstemp(suffix='.sfcr')
+        os.close(handle)
+        try:
+            solve_model_file(os.path.abspath(args.input), tmp_name)
+        except Exception:
+            traceback.print_exc(limit=4)
+            os.remove(tmp_name)
+            return 1
+        result_fname = tmp_name
+    try:
+        results = render_all(result_fname, args.outdir, fmt=args.format, source=args.source,
+                             pattern=args.filter, time_start=args.start, time_range=args.range,
+                             max_workers=args.workers)
+    finally:
+        if tmp_name is not None:
+            os.remove(tmp_name)
+    num_failed = 0
+    for res in results:
+        if not res['ok']:
+            num_failed += 1
+            print('{0:<40} FAILED  {1}'.format(res['name'], res['message']))
+    print('{0} chart(s) in {1}, {2} failed ({3:.1f}s)'.format(len(results), args.outdir, num_failed,
+                                                            time.time() - start))
+    if num_failed > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
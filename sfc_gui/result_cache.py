@@ -0,0 +1,157 @@
+# coding=utf-8
+"""
+result_cache.py
+
+Persistent on-disk cache of solved model results, so that reloading an unchanged model does not
+require solving it again.
+
+The cache key is a hash of:
+- the source text of the model file,
+- the sfc_models version.
+The key does not need the model: the solver settings (MaxTime, TraceStep,
+SolveInitialSteadyState) are either set by build_model() in the source, or are the defaults of the
+sfc_models version. So the cache can be checked before the model is built. This only holds if the
+settings are not changed after build_model(); the settings are saved in each entry, and callers
+that do change them pass them to Get(), so that an entry solved with other settings is a miss. Only the model file itself is hashed; changes to other
+modules that it imports (or to files that build_model() reads) are not detected.
+
+Entries are result files (see result_file.py), named <key>.sfcr. The cache is bounded in size;
+when it grows past MaxBytes, the least recently used entries (oldest modification time; a cache
+hit touches the file) are deleted.
+
+The cache directory is $SFCMODELSGUICACHE if set, otherwise ~/.sfc_gui/cache.
+"""
+
+import hashlib
+import os
+
+import sfc_models
+import sfc_gui.result_file
+
+
+def get_sfc_models_version():
+    try:
+        from importlib.metadata import version
+        return version('sfc_models')
+    except Exception:
+        return getattr(sfc_models, '__version__', 'unknown')
+
+
+class ResultCache(object):
+    def __init__(self, directory=None, max_bytes=256 * 1024 * 1024):
+        if directory is None:
+            directory = os.getenv('SFCMODELSGUICACHE')
+        if directory is None:
+            directory = os.path.join(os.path.expanduser('~'), '.sfc_gui', 'cache')
+        self.Directory = directory
+        self.MaxBytes = max_bytes
+
+    @staticmethod
+    def MakeKey(source_text):
+        """
+        Key for the model built by a model file's source text. The key does not describe solver
+        settings that are changed outside the source (after build_model()); callers that change
+        them must pass the settings to Get().
+
+        :param source_text: str
+        :return: str
+        """
+        h = hashlib.sha256()
+        h.update(source_text.encode('utf-8'))
+        h.update(get_sfc_models_version().encode('utf-8'))
+        return h.hexdigest()
+
+    def GetPath(self, key):
+        return os.path.join(self.Directory, key + '.sfcr')
+
+    def Get(self, key, settings=None):
+        """
+        Returns a ResultFile, or None if the key is not in the cache, or if settings is given and
+        the entry was solved with other settings.
+
+        :param key: str
+        :param settings: dict (see result_file.get_solver_settings())
+        :return: ResultFile
+        """
+        fname = self.GetPath(key)
+        if not os.path.isfile(fname):
+            return None
+        try:
+            out = sfc_gui.result_file.ResultFile(fname)
+        except Exception:
+            # Damaged entry; drop it.
+            self._Remove(fname)
+            return None
+        if settings is not None and out.Settings != settings:
+            return None
+        # Mark as recently used
+        os.utime(fname, None)
+        return out
+
+    def Put(self, key, model, model_name=''):
+        """
+        Save a solved model under key, and then trim the cache.
+
+        :param key: str
+        :param model: Model
+        :param model_name: str
+        :return: str
+        """
+        if not os.path.isdir(self.Directory):
+            os.makedirs(self.Directory)
+        fname = self.GetPath(key)
+        # Write to a temporary name, so a crash does not leave a partial entry.
+        tmp_name = '{0}.{1}.tmp'.format(fname, os.getpid())
+        sfc_gui.result_file.save_results(tmp_name, model, model_name=model_name)
+        if os.path.exists(fname):
+            self._Remove(fname)
+        os.rename(tmp_name, fname)
+        self.Evict()
+        return fname
+
+    def GetEntries(self):
+        """
+        List of (modification time, size, file name) for all entries, oldest first.
+        :return: list
+        """
+        out = []
+        if not os.path.isdir(self.Directory):
+            return out
+        for f in os.listdir(self.Directory):
+            if not f.endswith('.sfcr'):
+                continue
+            fname = os.path.join(self.Directory, f)
+            try:
+                st = os.stat(fname)
+            except OSError:
+                continue
+            out.append((st.st_mtime, st.st_size, fname))
+        out.sort()
+        return out
+
+    def Evict(self):
+        """
+        Delete least recently used entries until the cache fits in MaxBytes.
+        :return: int
+        """
+        entries = self.GetEntries()
+        total = sum(x[1] for x in entries)
+        num_removed = 0
+        for mtime, size, fname in entries:
+            if total <= self.MaxBytes:
+                break
+            self._Remove(fname)
+            total -= size
+            num_removed += 1
+        return num_removed
+
+    def Clear(self):
+        for mtime, size, fname in self.GetEntries():
+            self._Remove(fname)
+
+    @staticmethod
+    def _Remove(fname):
+        try:
+            os.remove(fname)
+        except OSError:
+            pass
@@ -0,0 +1,171 @@
+# coding=utf-8
+"""
+result_file.py
+
+Binary file format for solved model output, so that results can be browsed without re-solving.
+
+Layout:
+    8 bytes   magic string b'SFCGUIR1'
+    8 bytes   header length (little-endian unsigned 64-bit int)
+    header    JSON (UTF-8), padded with spaces so that the data starts on a 64 byte boundary
+    data      one float64 (little-endian) block per source
+
+The header lists, for every time series source ('Time Series', 'Initial Steady State',
+'Convergence Trace'), the series names, the number of time points, the time axis variable and
+the offset of its block (relative to the start of the data). Each block is a (time x series)
+array stored column by column, as in SeriesStore, so a numpy.memmap of the block only pages in the
+columns that are actually read. The final equations (right hand side and description) are also
+saved, so the chart plotter can show them, and so are the country codes (to group the series by
+country; see series_hierarchy.py) and the solver settings (see get_solver_settings()).
+"""
+
+import json
+import struct
+
+import numpy
+
+from sfc_gui.series_store import SeriesStore
+
+magic = b'SFCGUIR1'
+file_version = 1
+# (Source name, as in Parameters.SourceOptions; EquationSolver attribute)
+sources = (('Time Series', 'TimeSeries'),
+           ('Initial Steady State', 'TimeSeriesInitialSteadyState'),
+           ('Convergence Trace', 'TimeSeriesStepTrace'))
+_alignment = 64
+
+
+class SavedEquation(object):
+    """
+    Stand-in for sfc_models Equation objects, with just what the GUI uses.
+    """
+    def __init__(self, lhs, rhs, desc):
+        self.LeftHandSide = lhs
+        self.RHS = rhs
+        self.Description = desc
+
+    def GetRightHandSide(self):
+        return self.RHS
+
+
+class SavedEquationBlock(dict):
+    """
+    Stand-in for an sfc_models EquationBlock (dict of SavedEquation, in saved order).
+    """
+    def __init__(self):
+        dict.__init__(self)
+        self.Order = []
+
+    def AddEquation(self, eqn):
+        if eqn.LeftHandSide not in self:
+            self.Order.append(eqn.LeftHandSide)
+        self[eqn.LeftHandSide] = eqn
+
+    def GetEquationList(self):
+        return list(self.Order)
+
+
+def get_solver_settings(model):
+    """
+    The settings that change the solution of a model built from a given source: MaxTime, TraceStep
+    and SolveInitialSteadyState.
+
+    :param model: Model
+    :return: dict
+    """
+    solver = model.EquationSolver
+    return {'MaxTime': model.MaxTime, 'TraceStep': getattr(solver, 'TraceStep', None),
+            'SolveInitialSteadyState': getattr(solver, 'ParameterSolveInitialSteadyState', None)}
+
+
+def save_results(fname, model, model_name=''):
+    """
+    Save the time series and final equations of a (solved) Model.
+
+    :param fname: str
+    :param model: Model
+    :param model_name: str
+    :return:
+    """
+    header = {'version': file_version, 'model_name': model_name, 'sources': [],
+              'equations': [], 'countries': [x.Code for x in model.CountryList],
+              'settings': get_solver_settings(model)}
+    blocks = []
+    offset = 0
+    for source_name, attr in sources:
+        holder = getattr(model.EquationSolver, attr)
+        time_axis = holder.TimeSeriesName
+        store = SeriesStore.FromHolder(holder, time_axis)
+        if time_axis not in store:
+            # Same fallback as Parameters.SetTimeSeriesHolder()
+            axis_holder = dict(holder)
+            axis_holder[time_axis] = [0.0, 1.0]
+            store = SeriesStore.FromHolder(axis_holder, time_axis)
+        data = numpy.asfortranarray(store.Data, dtype='<f8')
+        header['sources'].append({'name': source_name, 'time_axis': time_axis,
+                                  'names': store.Names, 'num_time': data.shape[0],
+                                  'offset': offset})
+        blocks.append(data)
+        offset += data.size * 8
+    for varname in model.FinalEquationBlock.GetEquationList():
+        eqn = model.FinalEquationBlock[varname]
+        header['equations'].append([varname, eqn.GetRightHandSide(), eqn.Description])
+    header_bytes = json.dumps(header).encode('utf-8')
+    prefix_len = len(magic) + 8
+    padding = (-(prefix_len + len(header_bytes))) % _alignment
+    header_bytes += b' ' * padding
+    with open(fname, 'wb') as f:
+        f.write(magic)
+        f.write(struct.pack('<Q', len(header_bytes)))
+        f.write(header_bytes)
+        for data in blocks:
+            f.write(data.tobytes(order='F'))
+
+
+class ResultFile(object):
+    """
+    Read access to a saved result file. Only the header is read on open; the series data are
+    memory-mapped by GetStore().
+    """
+    def __init__(self, fname):
+        self.FileName = fname
+        with open(fname, 'rb') as f:
+            if f.read(len(magic)) != magic:
+                raise ValueError('Not an sfc_gui result file: ' + fname)
+            header_len = struct.unpack('<Q', f.read(8))[0]
+            header = json.loads(f.read(header_len).decode('utf-8'))
+        self.DataStart = len(magic) + 8 + header_len
+        self.ModelName = header['model_name']
+        # Country codes (None in files written before they were saved).
+        self.Countries = header.get('countries')
+        # Solver settings (get_solver_settings(); None in older files).
+        self.Settings = header.get('settings')
+        self.Sources = {}
+        self.SourceOptions = []
+        for info in header['sources']:
+            self.Sources[info['name']] = info
+            self.SourceOptions.append(info['name'])
+        self.FinalEquationBlock = SavedEquationBlock()
+        for varname, rhs, desc in header['equations']:
+            self.FinalEquationBlock.AddEquation(SavedEquation(varname, rhs, desc))
+        self.Stores = {}
+
+    def GetStore(self, source_name):
+        """
+        Get a SeriesStore for a source, backed by a read-only memory map of the file.
+        :param source_name: str
+        :return: SeriesStore
+        """
+        if source_name in self.Stores:
+            return self.Stores[source_name]
+        info = self.Sources[source_name]
+        shape = (info['num_time'], len(info['names']))
+        if shape[0] * shape[1] == 0:
+            # Cannot memory-map an empty block
+            data = numpy.empty(shape, dtype='<f8', order='F')
+        else:
+            data = numpy.memmap(self.FileName, dtype='<f8', mode='r',
+                                offset=self.DataStart + info['offset'], shape=shape, order='F')
+        store = SeriesStore(info['names'], data, info['time_axis'])
+        self.Stores[source_name] = store
+        return store
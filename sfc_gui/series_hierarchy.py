@@ -0,0 +1,154 @@
+# coding=utf-8
+"""
+series_hierarchy.py
+
+Country -> sector -> variable index of series names, parsed from the sfc_models naming scheme:
+a sector variable is named '<sector full code>__<variable>', and the sector full code is
+'<country>_<sector>' in a model with several countries ('CA_HH__AlphaIncome'), or just the
+sector code otherwise ('GOV__DEM_GOOD'). Sector codes may themselves contain '_' ('GOV_TRE'), so
+the country prefix is only split off if it is one of the model's country codes (and the model
+has more than one country; sfc_models only adds the prefix then). Series that do not follow the
+scheme (the time axis, model-level variables) go in a separate 'Other' group.
+
+The index is built once per time series source (Parameters.SetStore()). GetTreeBlocks() gives
+the rows for a TreeSync (so that the chart plotter's series tree is populated lazily), and
+GetSeries() gives every series under a tree node, for the bulk actions (plot a whole sector).
+"""
+
+# Tree codes of the group nodes; series rows use the series name (which has no '*').
+country_prefix = 'COUNTRY*'
+sector_prefix = 'SECTOR*'
+other_code = 'OTHER*'
+
+
+def parse_series_name(name, countries=None):
+    """
+    (country, sector, variable) of a series name; country is '' in a single country model, or if
+    the sector code does not start with a known country code. Returns None if the name does not
+    follow the naming scheme.
+
+    If countries (the model's country codes) is None, the country is guessed from the shape of
+    the name: whatever comes before the first '_' of the sector code.
+
+    :param name: str
+    :param countries: list
+    :return: tuple
+    """
+    sector_code, sep, variable = name.partition('__')
+    if sep == '' or sector_code == '' or variable == '':
+        return None
+    if countries is None:
+        country, sep, sector = sector_code.partition('_')
+        if sep == '' or sector == '':
+            return '', sector_code, variable
+        return country, sector, variable
+    if len(countries) < 2:
+        return '', sector_code, variable
+    # Longest match, in case a country code contains '_'.
+    country = ''
+    for code in countries:
+        if len(code) > len(country) and sector_code.startswith(code + '_') and \
+                len(sector_code) > len(code) + 1:
+            country = code
+    if country == '':
+        return '', sector_code, variable
+    return country, sector_code[len(country) + 1:], variable
+
+
+class SeriesHierarchy(object):
+    def __init__(self, names, countries=None):
+        """
+
+        :param names: list (in display order; the order is kept within each sector)
+        :param countries: list (the model's country codes; see parse_series_name())
+        """
+        self.CountryCodes = countries
+        # country -> list of sector full codes; sector full code -> list of series names
+        self.Countries = {}
+        self.Sectors = {}
+        self.Other = []
+        # sector full code -> (country, sector)
+        self.SectorInfo = {}
+        for name in names:
+            parsed = parse_series_name(name, countries)
+            if parsed is None:
+                self.Other.append(name)
+                continue
+            country, sector, variable = parsed
+            full_code = name[0:-(len(variable) + 2)]
+            if full_code not in self.Sectors:
+                self.Sectors[full_code] = []
+                self.SectorInfo[full_code] = (country, sector)
+                self.Countries.setdefault(country, []).append(full_code)
+            self.Sectors[full_code].append(name)
+        for codes in self.Countries.values():
+            codes.sort()
+
+    def GetCountries(self):
+        return sorted(self.Countries)
+
+    def IsSingleCountry(self):
+        """
+        True if the series have no country prefix (the sectors go at the top of the tree).
+        :return: bool
+        """
+        return list(self.Countries.keys()) in ([], [''])
+
+    def GetTreeBlocks(self):
+        """
+        Rows for TreeSync.SyncBlock(): a list of (parent code, rows), parents before children.
+        Group nodes show the number of series under them.
+
+        :return: list
+        """
+        out = []
+        root_rows = []
+        if self.IsSingleCountry():
+            root_rows += self._GetSectorRows('')
+        else:
+            for country in self.GetCountries():
+                text = country
+                if country == '':
+                    text = '(No country)'
+                root_rows.append((country_prefix + country,
+                                  '{0} ({1})'.format(text, self.GetNumSeries(country_prefix + country)),
+                                  ()))
+        if len(self.Other) > 0:
+            root_rows.append((other_code, 'Other ({0})'.format(len(self.Other)), ()))
+        out.append(('', root_rows))
+        for country in self.GetCountries():
+            if not self.IsSingleCountry():
+                out.append((country_prefix + country, self._GetSectorRows(country)))
+            for full_code in self.Countries[country]:
+                out.append((sector_prefix + full_code,
+                            [(name, name[len(full_code) + 2:], ()) for name in self.Sectors[full_code]]))
+        out.append((other_code, [(name, name, ()) for name in self.Other]))
+        return out
+
+    def _GetSectorRows(self, country):
+        return [(sector_prefix + code,
+                 '{0} ({1})'.format(self.SectorInfo[code][1], len(self.Sectors[code])), ())
+                for code in self.Countries.get(country, [])]
+
+    def GetSeries(self, code):
+        """
+        All the series under a tree node (a country, a sector, 'Other', or a single series).
+        :param code: str
+        :return: list
+        """
+        if code.startswith(country_prefix):
+            out = []
+            for full_code in self.Countries.get(code[len(country_prefix):], []):
+                out += self.Sectors[full_code]
+            return out
+        if code.startswith(sector_prefix):
+            return list(self.Sectors.get(code[len(sector_prefix):], []))
+        if code == other_code:
+            return list(self.Other)
+        return [code]
+
+    def GetNumSeries(self, code):
+        return len(self.GetSeries(code))
+
+    def IsGroup(self, code):
+        return code.startswith(country_prefix) or code.startswith(sector_prefix) or code == other_code
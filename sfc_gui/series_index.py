@@ -0,0 +1,100 @@
+# coding=utf-8
+"""
+series_index.py
+
+Index of series names for the type-ahead filter of the chart plotter's series list.
+
+Matching is case insensitive. A query matches the names that contain it; a query that starts
+with '^' only matches the names that start with the rest of it.
+
+    - Prefix queries use a sorted list of the lower case names, and bisect.
+    - Substring queries of three characters or more use a trigram index (trigram -> positions
+      of the names that contain it): the candidates are the names that have every trigram of the
+      query, and only those are checked. Shorter queries match too many names for an index to
+      help, so they scan the names.
+
+The results keep the order of the names that the index was built with (the order of the list
+box), so the list never has to be sorted again. The index is built once, when the time series
+source is set (Parameters.SetStore()), so that no keystroke has to wait for it.
+"""
+
+import bisect
+
+
+def get_trigrams(text):
+    """
+    Set of the three-character substrings of text.
+    :param text: str
+    :return: set
+    """
+    return set(text[i:i + 3] for i in range(0, len(text) - 2))
+
+
+class SeriesIndex(object):
+    def __init__(self, names):
+        """
+
+        :param names: list (in display order)
+        """
+        self.Names = list(names)
+        self.Lower = [x.lower() for x in self.Names]
+        # Sorted (lower case name, position) pairs, for prefix queries.
+        self.Sorted = sorted((x, pos) for pos, x in enumerate(self.Lower))
+        # trigram -> positions of the names that contain it (in increasing order)
+        self.Trigrams = {}
+        for pos, name in enumerate(self.Lower):
+            for trigram in get_trigrams(name):
+                if trigram in self.Trigrams:
+                    self.Trigrams[trigram].append(pos)
+                else:
+                    self.Trigrams[trigram] = [pos]
+
+    def __len__(self):
+        return len(self.Names)
+
+    def Find(self, query):
+        """
+        Names that match query, in the original order. An empty query matches everything.
+        :param query: str
+        :return: list
+        """
+        query = query.strip().lower()
+        if query.startswith('^'):
+            positions = self.FindPrefix(query[1:])
+        else:
+            positions = self.FindSubstring(query)
+        return [self.Names[x] for x in positions]
+
+    def FindPrefix(self, prefix):
+        """
+        Sorted positions of the names that start with prefix (lower case).
+        :param prefix: str
+        :return: list
+        """
+        out = []
+        pos = bisect.bisect_left(self.Sorted, (prefix, -1))
+        while pos < len(self.Sorted) and self.Sorted[pos][0].startswith(prefix):
+            out.append(self.Sorted[pos][1])
+            pos += 1
+        out.sort()
+        return out
+
+    def FindSubstring(self, text):
+        """
+        Sorted positions of the names that contain text (lower case).
+        :param text: str
+        :return: list
+        """
+        if len(text) < 3:
+            return [pos for pos, x in enumerate(self.Lower) if text in x]
+        postings = []
+        for trigram in get_trigrams(text):
+            positions = self.Trigrams.get(trigram)
+            if positions is None:
+                return []
+            postings.append(positions)
+        postings.sort(key=len)
+        candidates = set(postings[0])
+        for positions in postings[1:]:
+            candidates.intersection_update(positions)
+        return sorted(x for x in candidates if text in self.Lower[x])
@@ -0,0 +1,154 @@
+# coding=utf-8
+"""
+series_store.py
+
+Columnar NumPy store for a time series holder (such as EquationSolver.TimeSeries).
+
+The holder (a dict of lists) is packed once into a single 2-D float64 array, with one column per
+series and a name -> column index. The array is Fortran-ordered, so every column is contiguous;
+looking up a series, windowing it by TimeStart/TimeRange and finding axis limits are all
+done on views, without copying the data.
+
+Series that are shorter than the longest series are padded with NaN; non-numeric series are
+all NaN.
+"""
+
+import warnings
+
+import numpy
+
+
+class SeriesStore(object):
+    def __init__(self, names, data, time_axis):
+        """
+        Usually created with SeriesStore.FromHolder().
+
+        :param names: list
+        :param data: numpy.ndarray
+        :param time_axis: str
+        """
+        self.Names = list(names)
+        self.Index = dict((name, pos) for pos, name in enumerate(self.Names))
+        self.Data = data
+        self.TimeAxisVariable = time_axis
+
+    @staticmethod
+    def FromHolder(holder, time_axis=None):
+        """
+        Pack a holder (dict of lists) into a SeriesStore. Uses the holder's own series ordering
+        (GetSeriesList()) if it has one.
+
+        :param holder: dict
+        :param time_axis: str
+        :return: SeriesStore
+        """
+        if time_axis is None:
+            time_axis = getattr(holder, 'TimeSeriesName', 'k')
+        if hasattr(holder, 'GetSeriesList'):
+            names = holder.GetSeriesList()
+        else:
+            names = list(holder.keys())
+            names.sort()
+        num_time = 0
+        for name in names:
+            num_time = max(num_time, len(holder[name]))
+        data = numpy.empty((num_time, len(names)), dtype=numpy.float64, order='F')
+        data.fill(numpy.nan)
+        for pos in range(0, len(names)):
+            values = holder[names[pos]]
+            try:
+                data[0:len(values), pos] = values
+            except (TypeError, ValueError):
+                pass
+        return SeriesStore(names, data, time_axis)
+
+    def __contains__(self, series_name):
+        return series_name in self.Index
+
+    def __getitem__(self, series_name):
+        """
+        Returns the column for the series (a view).
+        :param series_name: str
+        :return: numpy.ndarray
+        """
+        return self.Data[:, self.Index[series_name]]
+
+    def __len__(self):
+        return len(self.Names)
+
+    def keys(self):
+        return list(self.Names)
+
+    def GetSeriesList(self):
+        return list(self.Names)
+
+    def GetNumTime(self):
+        """
+        Number of time points (rows).
+        :return: int
+        """
+        return self.Data.shape[0]
+
+    def GetTimeAxisMinimum(self):
+        """
+        First value of the time axis, as an int (0 if the time axis is missing or empty).
+        :return: int
+        """
+        if self.TimeAxisVariable not in self.Index or self.Data.shape[0] == 0:
+            return 0
+        first = self[self.TimeAxisVariable][0]
+        if numpy.isnan(first):
+            return 0
+        return int(first)
+
+    def GetWindowBounds(self, time_start=None, time_range=None):
+        """
+        Row range [lo, hi) for a window that starts at time_start (in units of the time axis;
+        assumes that the time axis steps by 1), of length time_range (None = to the end).
+
+        Same conventions as the Settings window: a start outside of the data is ignored.
+
+        :param time_start: int
+        :param time_range: int
+        :return: tuple
+        """
+        num_time = self.Data.shape[0]
+        lo = 0
+        if time_start is not None:
+            minimum = self.GetTimeAxisMinimum()
+            if minimum < time_start < minimum + num_time:
+                lo = time_start - minimum
+        hi = num_time
+        if time_range is not None and hi - lo > time_range:
+            hi = lo + time_range
+        return lo, hi
+
+    def GetWindow(self, series_name, time_start=None, time_range=None):
+        """
+        Returns (x, y) views of the time axis and the series, cut to the window.
+
+        :param series_name: str
+        :param time_start: int
+        :param time_range: int
+        :return: tuple
+        """
+        lo, hi = self.GetWindowBounds(time_start, time_range)
+        return self[self.TimeAxisVariable][lo:hi], self[series_name][lo:hi]
+
+    @staticmethod
+    def GetLimits(values):
+        """
+        (min, max) of an array, ignoring NaN. Returns (0., 1.) if there are no valid values.
+        :param values: numpy.ndarray
+        :return: tuple
+        """
+        if len(values) == 0:
+            return 0., 1.
+        with warnings.catch_warnings():
+            # All-NaN input triggers a RuntimeWarning; handled below.
+            warnings.simplefilter('ignore', RuntimeWarning)
+            lo = numpy.nanmin(values)
+            hi = numpy.nanmax(values)
+        if numpy.isnan(lo):
+            return 0., 1.
+        return float(lo), float(hi)
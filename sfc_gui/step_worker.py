@@ -0,0 +1,102 @@
+# coding=utf-8
+"""
+step_worker.py
+
+Runs Model build/solve steps (Model._RunStep()) in a background thread, so that the Tk main loop
+stays responsive.
+
+Tk is not thread-safe, so the worker never touches widgets. It posts progress messages to a
+queue, and the GUI polls the queue with after(). Cancellation is checked between steps (a single
+_RunStep() call cannot be interrupted).
+
+Messages are tuples:
+    ('step', step_name, num_done) -- about to run step_name; num_done steps completed so far.
+    ('done', num_done, cancelled) -- worker finished (all steps run, or cancelled).
+    ('error', exception, trace_text) -- a step raised; the worker has stopped.
+    ('timing', record) -- a step finished (or failed); see instrumentation.StepTimings.
+                          Only posted if the worker was given a StepTimings object.
+"""
+
+import sys
+import threading
+import traceback
+
+if sys.version_info[0] < 3:
+    import Queue as queue
+else:
+    import queue
+
+
+class StepWorker(threading.Thread):
+    def __init__(self, model, step_name=None, run_all=True, timings=None):
+        """
+        If run_all is False, runs a single step (step_name, or the first available step if None).
+        Otherwise, runs steps until the model has none left (or is cancelled).
+
+        If timings (instrumentation.StepTimings) is given, every step is measured.
+
+        :param model: Model
+        :param step_name: str
+        :param run_all: bool
+        :param timings: StepTimings
+        """
+        threading.Thread.__init__(self)
+        self.daemon = True
+        self.Model = model
+        self.StepName = step_name
+        self.RunAll = run_all
+        self.Queue = queue.Queue()
+        self.CancelEvent = threading.Event()
+        self.NumDone = 0
+        self.Timings = timings
+
+    def Cancel(self):
+        """
+        Request a stop; takes effect once the current step finishes.
+        :return:
+        """
+        self.CancelEvent.set()
+
+    def IsCancelled(self):
+        return self.CancelEvent.is_set()
+
+    def GetMessages(self):
+        """
+        Non-blocking; returns all messages posted since the last call.
+        :return: list
+        """
+        out = []
+        while True:
+            try:
+                out.append(self.Queue.get_nowait())
+            except queue.Empty:
+                return out
+
+    def RunStep(self, step_name):
+        if self.Timings is None:
+            self.Model._RunStep(step_name)
+            return
+        try:
+            self.Timings.Measure(step_name, self.Model._RunStep, step_name)
+        finally:
+            self.Queue.put(('timing', self.Timings.Records[-1]))
+
+    def run(self):
+        step_name = self.StepName
+        try:
+            while not self.CancelEvent.is_set():
+                steps = self.Model._GetSteps()
+                if len(steps) == 0:
+                    break
+                if step_name is None:
+                    step_name = steps[0][0]
+                self.Queue.put(('step', step_name, self.NumDone))
+                self.RunStep(step_name)
+                self.NumDone += 1
+                step_name = None
+                if not self.RunAll:
+                    break
+        except Exception as e:
+            self.Queue.put(('error', e, traceback.format_exc(limit=4)))
+            return
+        self.Queue.put(('done', self.NumDone, self.CancelEvent.is_set()))
@@ -0,0 +1,362 @@
+# coding=utf-8
+"""
+sweep.py
+
+Parameter sweep (scenario) engine for model files that follow the build_model() convention.
+
+A sweep takes a grid of overrides, {name: [value1, value2, ...]}, and runs one model variant for
+every combination, in a pool of worker processes. Two kinds of override are supported:
+
+- Names that contain a double underscore follow the sfc_models variable naming, and set an
+  exogenous variable: 'GOV_TRE__DEM_N_GOOD' calls model.AddExogenous('GOV_TRE', 'DEM_N_GOOD',
+  value) after build_model(). The sector must be given by its full code ('<country>_<sector>'
+  in a model with several countries), and the value is usually a string like '[20.,]*105': a
+  list with at least MaxTime + 1 entries. A number ('20.') sets a constant; sfc_models does not
+  accept that form, so it is expanded into a list of MaxTime + 1 entries (expand_constant()).
+- Other names are passed as keyword arguments to build_model(); for example, a model file
+  with build_model(alpha_income=.6) can be swept over alpha_income.
+
+Exogenous overrides are checked against a model built in the main process (check_overrides())
+before the sweep starts, so that a misspelt sector code or a short list is reported once, and
+not as a failure of every scenario.
+
+The solved time series of every variant are gathered into a SweepResults object, which packs
+each scenario into a columnar SeriesStore.
+
+Usage:
+    python -m sfc_gui.sweep sfcmod_REG2.py --set GOV_TRE__DEM_N_GOOD '[20.,]*105' '[25.,]*105'
+"""
+from __future__ import print_function
+
+import argparse
+import ast
+import itertools
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+from sfc_models.utils import Logger
+import sfc_gui.module_loader
+from sfc_gui.series_store import SeriesStore
+
+
+def expand_grid(grid):
+    """
+    Expand {name: [values]} into a list of override dicts, one per combination.
+    Names are iterated in sorted order, so the scenario order is deterministic.
+
+    :param grid: dict
+    :return: list
+    """
+    names = list(grid.keys())
+    names.sort()
+    out = []
+    for combo in itertools.product(*[grid[n] for n in names]):
+        out.append(dict(zip(names, combo)))
+    return out
+
+
+def scenario_label(overrides, max_len=40):
+    """
+    Short label for a scenario (used in legends).
+    :param overrides: dict
+    :param max_len: int
+    :return: str
+    """
+    names = list(overrides.keys())
+    names.sort()
+    parts = []
+    for n in names:
+        val = str(overrides[n])
+        if len(val) > max_len:
+            val = val[0:max_len - 3] + '...'
+        parts.append('{0}={1}'.format(n, val))
+    return ', '.join(parts)
+
+
+def evaluate_exogenous(value):
+    """
+    Value of an exogenous override: lists and numbers are returned as is, strings are evaluated
+    (as sfc_models does). Raises an exception if a string cannot be evaluated.
+
+    :param value: str
+    :return: object
+    """
+    if type(value) in (list, tuple, int, float):
+        return value
+    return eval(value, {})
+
+
+def expand_constant(model, value):
+    """
+    If an exogenous override is a number (or a string that evaluates to one), return the
+    equivalent list string, '[20.0,]*101' with MaxTime + 1 entries; otherwise, return value.
+
+    :param model: Model
+    :param value: str
+    :return: str
+    """
+    try:
+        val = evaluate_exogenous(value)
+    except Exception:
+        # Let sfc_models report it.
+        return value
+    if type(val) in (int, float):
+        return '[{0!r},]*{1}'.format(float(val), model.MaxTime + 1)
+    return value
+
+
+def build_with_overrides(python_mod, overrides):
+    """
+    Call build_model() with the keyword overrides, then apply exogenous overrides (numbers are
+    expanded into constant lists by expand_constant()).
+    :param python_mod: module
+    :param overrides: dict
+    :return: Model
+    """
+    kwargs = {}
+    exogenous = []
+    for name, value in overrides.items():
+        if '__' in name:
+            sector_code, varname = name.split('__', 1)
+            exogenous.append((sector_code, varname, value))
+        else:
+            kwargs[name] = value
+    model = python_mod.build_model(**kwargs)
+    for sector_code, varname, value in exogenous:
+        model.AddExogenous(sector_code, varname, expand_constant(model, value))
+    return model
+
+
+def run_scenario(fpath, overrides):
+    """
+    Build and solve one variant; runs inside a worker process.
+
+    Returns a tuple (time_axis_name, {series_name: list}).
+
+    :param fpath: str
+    :param overrides: dict
+    :return: tuple
+    """
+    Logger.cleanup()
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    python_mod = sfc_gui.module_loader.loader(name, fpath)
+    model = build_with_overrides(python_mod, overrides)
+    model.main()
+    holder = model.EquationSolver.TimeSeries
+    out = {}
+    for series_name in holder:
+        out[series_name] = list(holder[series_name])
+    return holder.TimeSeriesName, out
+
+
+class SweepResults(object):
+    """
+    Output of a sweep: one SeriesStore per scenario (Stores[pos]; None if that scenario failed).
+    """
+    def __init__(self, scenarios):
+        self.Scenarios = scenarios
+        self.Labels = [scenario_label(x) for x in scenarios]
+        self.Stores = [None, ] * len(scenarios)
+        self.Errors = {}
+        self.TimeAxisVariable = 'k'
+
+    def AddScenario(self, pos, time_axis, series):
+        self.TimeAxisVariable = time_axis
+        self.Stores[pos] = SeriesStore.FromHolder(series, time_axis)
+
+    def GetSeriesList(self):
+        """
+        Series names (sorted, time axis first).
+        :return: list
+        """
+        names = set()
+        for store in self.Stores:
+            if store is not None:
+                names.update(store.Names)
+        out = list(names)
+        out.sort()
+        if self.TimeAxisVariable in out:
+            out.remove(self.TimeAxisVariable)
+            out.insert(0, self.TimeAxisVariable)
+        return out
+
+    def GetSeries(self, series_name):
+        """
+        Returns a list of (label, x, y) for the scenarios that have the series; x and y are
+        views of the scenario's SeriesStore.
+        :param series_name: str
+        :return: list
+        """
+        out = []
+        for pos in range(0, len(self.Stores)):
+            store = self.Stores[pos]
+            if store is None or series_name not in store or self.TimeAxisVariable not in store:
+                continue
+            x, y = store.GetWindow(series_name)
+            out.append((self.Labels[pos], x, y))
+        return out
+
+
+def get_sector_full_codes(model):
+    """
+    Full codes of the sectors of a model that has not been run yet (the same codes as
+    Model._GenerateFullSectorCodes() will set).
+
+    :param model: Model
+    :return: list
+    """
+    add_country_code = len(model.CountryList) > 1
+    out = []
+    for sector in model.GetSectors():
+        if add_country_code:
+            out.append(sector.Parent.Code + '_' + sector.Code)
+        else:
+            out.append(sector.Code)
+    return out
+
+
+def check_exogenous(model, name, value):
+    """
+    Check an exogenous override against a model: the sector must exist, and the value must be a
+    number (a constant; see expand_constant()) or a list that covers the time axis (MaxTime + 1 entries). Returns an error message,
+    or None if the override is valid.
+
+    :param model: Model
+    :param name: str ('<sector full code>__<variable>')
+    :param value: str
+    :return: str
+    """
+    sector_code, varname = name.split('__', 1)
+    full_codes = get_sector_full_codes(model)
+    if sector_code not in full_codes:
+        return 'no sector with full code {0} (sectors: {1})'.format(
+            sector_code, ', '.join(sorted(full_codes)))
+    try:
+        val = evaluate_exogenous(value)
+    except Exception as e:
+        return 'cannot evaluate {0!r}: {1}'.format(value, e)
+    if type(val) in (int, float):
+        return None
+    try:
+        num_values = len(list(val))
+    except TypeError:
+        return '{0!r} is not a list'.format(value)
+    if num_values < model.MaxTime + 1:
+        return '{0!r} has {1} value(s); needs at least MaxTime + 1 = {2}'.format(
+            value, num_values, model.MaxTime + 1)
+    return None
+
+
+def check_overrides(fpath, grid):
+    """
+    Check the exogenous overrides of a grid against the model built by the model file (with
+    the build_model() arguments of the first scenario).
+
+    Returns a list of (name, message), at most one per override name.
+
+    :param fpath: str
+    :param grid: dict
+    :return: list
+    """
+    exogenous = sorted(x for x in grid if '__' in x)
+    if len(exogenous) == 0:
+        return []
+    name = os.path.splitext(os.path.basename(fpath))[0]
+    kwargs = dict((k, v) for k, v in expand_grid(grid)[0].items() if '__' not in k)
+    try:
+        python_mod = sfc_gui.module_loader.loader(name, os.path.abspath(fpath))
+        model = python_mod.build_model(**kwargs)
+    except Exception as e:
+        return [(fpath, 'cannot build the model: {0}: {1}'.format(type(e).__name__, str(e)))]
+    out = []
+    for override in exogenous:
+        for value in grid[override]:
+            msg = check_exogenous(model, override, value)
+            if msg is not None:
+                out.append((override, msg))
+                break
+    return out
+
+
+def run_sweep(fpath, grid, max_workers=None):
+    """
+    Run every combination in grid against the model file fpath.
+
+    :param fpath: str
+    :param grid: dict
+    :param max_workers: int
+    :return: SweepResults
+    """
+    fpath = os.path.abspath(fpath)
+    scenarios = expand_grid(grid)
+    results = SweepResults(scenarios)
+    with ProcessPoolExecutor(max_workers=max_workers) as pool:
+        futures = [pool.submit(run_scenario, fpath, x) for x in scenarios]
+        for pos in range(0, len(futures)):
+            try:
+                time_axis, series = futures[pos].result()
+            except Exception as e:
+                results.Errors[results.Labels[pos]] = '{0}: {1}'.format(type(e).__name__, str(e))
+                continue
+            results.AddScenario(pos, time_axis, series)
+    return results
+
+
+def parse_value(name, txt):
+    """
+    Exogenous overrides are passed through as strings (sfc_models evaluates them); build_model()
+    arguments are converted with ast.literal_eval() where possible.
+
+    :param name: str
+    :param txt: str
+    :return:
+    """
+    if '__' in name:
+        return txt
+    try:
+        return ast.literal_eval(txt)
+    except (ValueError, SyntaxError):
+        return txt
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog='python -m sfc_gui.sweep',
+                                     description='Run a parameter sweep over a model file.')
+    parser.add_argument('model_file', help='Model file (must define build_model())')
+    parser.add_argument('--set', nargs='+', action='append', default=[], metavar=('NAME', 'VALUE'),
+                        help='Override and its values; repeat for more dimensions')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Number of worker processes (default: number of CPUs)')
+    parser.add_argument('--plot', action='store_true', help='Overlay the variants in a chart window')
+    args = parser.parse_args(argv)
+    grid = {}
+    for entry in args.set:
+        if len(entry) < 2:
+            parser.error('--set needs a name and at least one value')
+        grid[entry[0]] = [parse_value(entry[0], x) for x in entry[1:]]
+    errors = check_overrides(args.model_file, grid)
+    for name, msg in errors:
+        print('error: --set {0}: {1}'.format(name, msg), file=sys.stderr)
+    if len(errors) > 0:
+        return 2
+    results = run_sweep(args.model_file, grid, max_workers=args.workers)
+    print('{0} scenario(s), {1} failed'.format(len(results.Scenarios), len(results.Errors)))
+    for label, msg in results.Errors.items():
+        print('FAILED [{0}]: {1}'.format(label, msg))
+    if args.plot:
+        from sfc_gui.chart_plotter import SweepPlotterWindow
+        import sfc_gui.utils
+        tk, ttk = sfc_gui.utils._import_tk()
+        root = tk.Tk()
+        root.withdraw()
+        window = SweepPlotterWindow(root, results)
+        root.wait_window(window)
+        root.destroy()
+    if len(results.Errors) > 0:
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
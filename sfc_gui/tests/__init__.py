@@ -0,0 +1,8 @@
+# coding=utf-8
+"""
+Unit tests for the headless parts of sfc_gui (no display needed).
+
+Run with:
+    python -m unittest discover sfc_gui/tests
+or with pytest.
+"""
@@ -0,0 +1,126 @@
+# coding=utf-8
+"""
+fake_widgets.py
+
+In-memory stand-ins for the parts of ttk.Treeview and tk.Listbox that TreeSync and ListModel use,
+so that they can be tested without a display.
+"""
+
+
+class FakeTreeview(object):
+    def __init__(self):
+        # item -> dict with 'parent', 'text', 'values', 'open'; the root is ''
+        self.Items = {'': {'parent': None, 'text': '', 'values': (), 'open': True}}
+        self.Children = {'': []}
+        # Number of calls that changed the tree
+        self.NumCalls = 0
+
+    def insert(self, parent, index, iid, text='', values=(), open=False):
+        if iid in self.Items:
+            raise ValueError('Item {0} already exists'.format(iid))
+        if parent not in self.Items:
+            raise ValueError('Item {0} not found'.format(parent))
+        self.Items[iid] = {'parent': parent, 'text': text, 'values': tuple(values), 'open': open}
+        self.Children[iid] = []
+        if index == 'end':
+            self.Children[parent].append(iid)
+        else:
+            self.Children[parent].insert(index, iid)
+        self.NumCalls += 1
+        return iid
+
+    def delete(self, *items):
+        for iid in items:
+            if iid not in self.Items:
+                raise ValueError('Item {0} not found'.format(iid))
+            self.Children[self.Items[iid]['parent']].remove(iid)
+            self._DeleteTree(iid)
+        self.NumCalls += 1
+
+    def _DeleteTree(self, iid):
+        for child in self.Children.pop(iid):
+            self._DeleteTree(child)
+        del self.Items[iid]
+
+    def move(self, iid, parent, index):
+        self.Children[self.Items[iid]['parent']].remove(iid)
+        self.Items[iid]['parent'] = parent
+        self.Children[parent].insert(index, iid)
+        self.NumCalls += 1
+
+    def item(self, iid, **kwargs):
+        if iid not in self.Items:
+            raise ValueError('Item {0} not found'.format(iid))
+        for key, value in kwargs.items():
+            if key == 'values':
+                value = tuple(value)
+            self.Items[iid][key] = value
+        self.NumCalls += 1
+
+    def exists(self, iid):
+        return iid in self.Items
+
+    def get_children(self, iid=''):
+        return tuple(self.Children[iid])
+
+    def GetSnapshot(self, iid=''):
+        """
+        Nested list of (code, text, values, children) under iid, for comparisons.
+        """
+        return [(x, self.Items[x]['text'], self.Items[x]['values'], self.GetSnapshot(x))
+                for x in self.Children[iid]]
+
+
+class FakeListbox(object):
+    def __init__(self):
+        self.Items = []
+        self.Selected = set()
+
+    def _Index(self, index):
+        if index == 'end':
+            return len(self.Items)
+        return index
+
+    def insert(self, index, *items):
+        pos = self._Index(index)
+        self.Items[pos:pos] = list(items)
+        self.Selected = set(x + len(items) if x >= pos else x for x in self.Selected)
+
+    def delete(self, first, last=None):
+        first = self._Index(first)
+        if last is None:
+            last = first
+        elif last == 'end':
+            last = len(self.Items) - 1
+        del self.Items[first:last + 1]
+        num = last + 1 - first
+        self.Selected = set(x - num if x > last else x for x in self.Selected
+                            if not first <= x <= last)
+
+    def get(self, first, last=None):
+        if last is None:
+            return self.Items[first]
+        return tuple(self.Items[first:self._Index(last) + 1])
+
+    def size(self):
+        return len(self.Items)
+
+    def curselection(self):
+        return tuple(sorted(self.Selected))
+
+    def selection_set(self, first, last=None):
+        first = self._Index(first)
+        if last is None:
+            last = first
+        self.Selected.update(range(first, self._Index(last) + 1))
+
+    def selection_clear(self, first, last=None):
+        first = self._Index(first)
+        if last is None:
+            last = first
+        elif last == 'end':
+            last = len(self.Items) - 1
+        self.Selected = set(x for x in self.Selected if not first <= x <= last)
+
+    def see(self, index):
+        pass
@@ -0,0 +1,94 @@
+# coding=utf-8
+
+from unittest import TestCase
+
+from sfc_gui.dependency_graph import DependencyGraph, get_references, get_closure, \
+    get_strong_components
+
+
+def normalize(components):
+    return sorted(sorted(x) for x in components)
+
+
+class TestGetReferences(TestCase):
+    def test_lags(self):
+        current, lagged = get_references('HH__Y - 0.5*HH__F(k-1) + exp(GOV__G) + 1.5e3')
+        self.assertEqual(set(['HH__Y', 'exp', 'GOV__G']), current)
+        self.assertEqual(set(['HH__F']), lagged)
+
+    def test_lag_spacing(self):
+        current, lagged = get_references('X( k - 2 ) + Y')
+        self.assertEqual(set(['Y']), current)
+        self.assertEqual(set(['X']), lagged)
+
+
+class TestStrongComponents(TestCase):
+    def test_cycle(self):
+        edges = {'a': set(['b']), 'b': set(['c']), 'c': set(['a']), 'd': set(['a'])}
+        components = get_strong_components(['a', 'b', 'c', 'd'], edges)
+        self.assertEqual([['a', 'b', 'c'], ['d']], normalize(components))
+        # Dependency order: the cycle comes before d, which depends on it.
+        self.assertEqual(['d'], components[-1])
+
+    def test_two_cycles(self):
+        edges = {'a': set(['b']), 'b': set(['a', 'c']), 'c': set(['d']), 'd': set(['c']),
+                 'e': set()}
+        components = get_strong_components(sorted(edges), edges)
+        self.assertEqual([['a', 'b'], ['c', 'd'], ['e']], normalize(components))
+        self.assertLess(components.index(['c', 'd']), components.index(['a', 'b']))
+
+    def test_long_chain(self):
+        # Iterative: no recursion limit.
+        num = 20000
+        nodes = ['v{0}'.format(x) for x in range(0, num)]
+        edges = dict((nodes[x], set([nodes[x + 1]])) for x in range(0, num - 1))
+        edges[nodes[-1]] = set([nodes[0]])
+        components = get_strong_components(nodes, edges)
+        self.assertEqual(1, len(components))
+        self.assertEqual(num, len(components[0]))
+
+    def test_closure(self):
+        edges = {'a': set(['b']), 'b': set(['c']), 'c': set()}
+        self.assertEqual({'b': 1, 'c': 2}, get_closure('a', edges))
+        self.assertEqual({}, get_closure('c', edges))
+
+
+class TestDependencyGraph(TestCase):
+    def setUp(self):
+        self.Graph = DependencyGraph()
+        self.Graph.Update({'Y': 'C + G', 'C': '0.6*Y + 0.4*W(k-1)', 'W': 'W(k-1) + Y - C',
+                           'G': '20.', 'T': 'T'})
+
+    def test_edges(self):
+        self.assertEqual(set(['C', 'G']), self.Graph.Upstream['Y'])
+        self.assertEqual(set(['W']), self.Graph.LaggedUpstream['C'])
+        self.assertEqual(set(['Y', 'W']), self.Graph.GetDownstreamEdges()['C'])
+
+    def test_closures(self):
+        self.assertEqual({'C': 1, 'G': 1, 'Y': 2}, self.Graph.GetUpstream('Y'))
+        self.assertEqual({'C': 1, 'W': 1, 'Y': 2}, self.Graph.GetDownstream('Y'))
+        self.assertIn('W', self.Graph.GetUpstream('C', include_lagged=True))
+        self.assertNotIn('W', self.Graph.GetUpstream('C'))
+
+    def test_blocks(self):
+        self.assertEqual(['C', 'Y'], self.Graph.GetComponent('Y'))
+        self.assertTrue(self.Graph.IsSimultaneous(['C', 'Y']))
+        # Self reference
+        self.assertTrue(self.Graph.IsSimultaneous(['T']))
+        self.assertFalse(self.Graph.IsSimultaneous(['G']))
+        self.assertEqual([['C', 'Y'], ['T']], self.Graph.GetBlocks())
+        # G -> {C, Y} -> W
+        self.assertEqual(3, self.Graph.GetDepth())
+        stats = dict(self.Graph.GetStatistics())
+        self.assertEqual(5, stats['Variables'])
+        self.assertEqual(2, stats['Simultaneous blocks'])
+
+    def test_update(self):
+        graph = self.Graph
+        cached = graph._Names['Y']
+        graph.Update({'Y': 'C + G', 'C': '0.6*G', 'G': '20.'})
+        # Unchanged right hand sides are not parsed again.
+        self.assertIs(cached, graph._Names['Y'])
+        self.assertNotIn('W', graph)
+        self.assertEqual(set(['G']), graph.Upstream['C'])
+        self.assertEqual([], graph.GetBlocks())
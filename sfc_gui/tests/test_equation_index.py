@@ -0,0 +1,56 @@
+# coding=utf-8
+
+import re
+from unittest import TestCase
+
+from sfc_gui.equation_index import EquationIndex, get_tokens
+
+
+class TestGetTokens(TestCase):
+    def test_split(self):
+        self.assertEqual(set(['gov__v0', 'gov', 'v0', 'x']), get_tokens('GOV__V0 x'))
+
+
+class TestEquationIndex(TestCase):
+    def setUp(self):
+        self.Index = EquationIndex()
+        self.Index.SyncBlock('', [('FINAL', 'Final Equations', ()), ('CA', 'CA', ())])
+        self.Index.SyncBlock('FINAL', [
+            ('HH__C', 'HH__C', ('HH__C = 0.6*HH__Y', 'Consumption')),
+            ('HH__Y', 'HH__Y', ('HH__Y = GOV__G + HH__C', 'Income')),
+            ('GOV__G', 'GOV__G', ('GOV__G = 20.', 'Government spending'))])
+        self.Index.SyncBlock('CA', [('CA*HH', 'HH', ())])
+        self.Index.SyncBlock('CA*HH', [('CA*HH*C', 'C', ('C = 0.6*Y', 'Consumption'))])
+
+    def test_prefix_search(self):
+        self.assertEqual(set(['HH__C', 'HH__Y', 'CA*HH']), set(self.Index.Search('hh')))
+        self.assertEqual(['GOV__G', 'HH__Y'], self.Index.Search('gov'))
+        # Every word must match.
+        self.assertEqual(['CA*HH*C', 'HH__C'], self.Index.Search('consum 0.6'))
+        self.assertEqual([], self.Index.Search('nothing'))
+        self.assertEqual([], self.Index.Search(''))
+
+    def test_ranking(self):
+        # Rows whose name matches come first, then by text.
+        self.assertEqual(['HH__Y', 'CA*HH*C', 'HH__C'], self.Index.Search('y'))
+        self.assertEqual(['GOV__G', 'HH__Y'], self.Index.Search('g'))
+
+    def test_regex(self):
+        self.assertEqual(['GOV__G'], self.Index.Search(r'= \d+\. ', regex=True))
+        self.assertRaises(re.error, self.Index.Search, '(', True)
+
+    def test_update(self):
+        added, removed, changed = self.Index.SyncBlock('FINAL', [
+            ('HH__C', 'HH__C', ('HH__C = 0.7*HH__Y', 'Consumption')),
+            ('GOV__G', 'GOV__G', ('GOV__G = 20.', 'Government spending'))])
+        self.assertEqual((set(), set(['HH__Y']), set(['HH__C'])), (added, removed, changed))
+        self.assertEqual([], self.Index.Search('income'))
+        self.assertEqual(['HH__C'], self.Index.Search('0.7'))
+        self.assertEqual([], [x for x in self.Index.Search('0.6') if x == 'HH__C'])
+
+    def test_remove_block(self):
+        # Removing a row also removes its descendants.
+        self.Index.SyncBlock('', [('FINAL', 'Final Equations', ())])
+        self.assertNotIn('CA*HH*C', self.Index)
+        self.assertEqual(['HH__C'], self.Index.Search('consumption'))
+        self.assertNotIn('ca', self.Index.Postings)
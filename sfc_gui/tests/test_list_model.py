@@ -0,0 +1,65 @@
+# coding=utf-8
+
+from unittest import TestCase
+
+from sfc_gui.utils import ListModel
+from sfc_gui.tests.fake_widgets import FakeListbox
+
+
+class TestListModel(TestCase):
+    def setUp(self):
+        self.Listbox = FakeListbox()
+        self.Model = ListModel(self.Listbox)
+        self.Model.SetItems(['a', 'b', 'c'])
+
+    def test_set_items(self):
+        self.assertEqual(['a', 'b', 'c'], self.Listbox.Items)
+        self.Model.Select(['b'])
+        self.Model.SetItems(['c', 'b', 'd'])
+        self.assertEqual(['c', 'b', 'd'], self.Listbox.Items)
+        # The selection follows the item.
+        self.assertEqual(['b'], self.Model.GetSelection())
+        self.assertEqual(1, self.Model.Index('b'))
+        self.assertIsNone(self.Model.Index('a'))
+
+    def test_unchanged(self):
+        self.Model.Select(['a'])
+        self.Listbox.Items = None
+        # No Listbox calls if nothing changed.
+        self.Model.SetItems(['a', 'b', 'c'])
+        self.Listbox.Items = ['a', 'b', 'c']
+        self.assertEqual('a', self.Model.GetSelected())
+
+    def test_select(self):
+        self.assertIsNone(self.Model.GetSelected())
+        self.Model.Select(['c', 'b', 'x'])
+        self.assertEqual(['b', 'c'], self.Model.GetSelection())
+        self.assertEqual('b', self.Model.GetSelected())
+        self.Model.Select([])
+        self.assertEqual([], self.Model.GetSelection())
+
+    def test_filter(self):
+        self.Model.Select(['c'])
+        self.Model.SetFilter(lambda x: x != 'a')
+        self.assertEqual(['b', 'c'], self.Listbox.Items)
+        self.assertEqual(['a', 'b', 'c'], self.Model.Items)
+        self.assertEqual('c', self.Model.GetSelected())
+        self.assertEqual('b', self.Model[0])
+        self.assertEqual(3, len(self.Model))
+        self.Model.SetFilter(None)
+        self.assertEqual(['a', 'b', 'c'], self.Listbox.Items)
+        self.assertEqual('c', self.Model.GetSelected())
+
+    def test_insert_delete(self):
+        self.Model.SetFilter(lambda x: not x.startswith('h'))
+        self.Model.Insert(1, 'x')
+        self.Model.Insert(0, 'hidden')
+        self.assertEqual(['hidden', 'a', 'x', 'b', 'c'], self.Model.Items)
+        self.assertEqual(['a', 'x', 'b', 'c'], self.Listbox.Items)
+        self.assertEqual(1, self.Model.Index('x'))
+        self.Model.Delete(3)
+        self.assertEqual(['a', 'x', 'c'], self.Listbox.Items)
+        # Hidden items are only removed from Items.
+        self.Model.Delete(0)
+        self.assertEqual(['a', 'x', 'c'], self.Listbox.Items)
+        self.assertEqual(['a', 'x', 'c'], self.Model.Items)
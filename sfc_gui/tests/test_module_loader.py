@@ -0,0 +1,61 @@
+# coding=utf-8
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from sfc_gui.module_loader import inspect_model_file, inspect_model_source
+
+
+class TestInspectModelFile(TestCase):
+    def setUp(self):
+        self.Dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+
+    def write(self, fname, source):
+        fpath = os.path.join(self.Dir, fname)
+        with open(fpath, 'w') as f:
+            f.write(source)
+        return fpath
+
+    def test_valid(self):
+        fpath = self.write('sfcmod_a.py', 'def get_description():\n    return "Model A"\n\n'
+                                          'def build_model():\n    pass\n')
+        self.assertEqual({'is_valid': True, 'description': 'Model A'}, inspect_model_file(fpath))
+
+    def test_no_build_model(self):
+        fpath = self.write('sfcmod_b.py', 'def get_description():\n    return "Model B"\n\n'
+                                          'def build():\n    pass\n')
+        self.assertEqual({'is_valid': False, 'description': 'Model B'}, inspect_model_file(fpath))
+        # Not executed: a failing import does not matter.
+        fpath = self.write('sfcmod_c.py', 'import not_a_module\n')
+        self.assertEqual({'is_valid': False, 'description': 'Missing get_description()'},
+                         inspect_model_file(fpath))
+
+    def test_cache(self):
+        fpath = self.write('sfcmod_d.py', 'def build_model():\n    pass\n')
+        self.assertTrue(inspect_model_file(fpath)['is_valid'])
+        # A changed file (different size) is parsed again.
+        self.write('sfcmod_d.py', 'def build_models():\n    pass\n')
+        self.assertFalse(inspect_model_file(fpath)['is_valid'])
+
+    def test_errors(self):
+        self.assertEqual({'is_valid': False, 'description': 'File not found'},
+                         inspect_model_file(os.path.join(self.Dir, 'missing.py')))
+        fpath = self.write('sfcmod_e.py', 'def build_model(:\n')
+        self.assertEqual({'is_valid': False, 'description': 'Syntax error (line 1)'},
+                         inspect_model_file(fpath))
+
+    def test_bindings(self):
+        source = ('try:\n    from other import build_model\nexcept ImportError:\n    pass\n'
+                  'get_description = lambda: "x"\n')
+        info = inspect_model_source(source)
+        self.assertTrue(info['is_valid'])
+        self.assertEqual('(Description available after Load)', info['description'])
+        self.assertTrue(inspect_model_source('from other import *\n')['is_valid'])
+        # Nested definitions do not count.
+        self.assertFalse(inspect_model_source('class A:\n    def build_model(self):\n'
+                                              '        pass\n')['is_valid'])
@@ -0,0 +1,54 @@
+# coding=utf-8
+
+from unittest import TestCase
+
+import numpy
+
+from sfc_gui.plotting import decimate_minmax
+
+
+class TestDecimateMinmax(TestCase):
+    def test_short(self):
+        x = [0, 1, 2, 3]
+        y = [1., 3., 2., 0.]
+        # Unchanged (not even copied) if there are few points.
+        out_x, out_y = decimate_minmax(x, y, 2)
+        self.assertIs(x, out_x)
+        self.assertIs(y, out_y)
+        self.assertIs(y, decimate_minmax(x, y, 0)[1])
+
+    def test_minmax(self):
+        num = 1000
+        x = numpy.arange(0, num, dtype=float)
+        y = numpy.sin(x / 7.) + 0.001 * x
+        out_x, out_y = decimate_minmax(x, y, 50)
+        self.assertLessEqual(len(out_y), 2 * 50 + 2)
+        # Endpoints are kept, and the points stay in order.
+        self.assertEqual((0., num - 1.), (out_x[0], out_x[-1]))
+        self.assertTrue((numpy.diff(out_x) > 0).all())
+        self.assertEqual(list(y[out_x.astype(int)]), list(out_y))
+        # The extremes of every bucket survive.
+        for start in range(0, num, 20):
+            bucket = y[start:start + 20]
+            self.assertIn(bucket.min(), out_y)
+            self.assertIn(bucket.max(), out_y)
+
+    def test_uneven_buckets(self):
+        # The last bucket is partial.
+        y = numpy.zeros(103)
+        y[101] = 5.
+        y[50] = -5.
+        out_x, out_y = decimate_minmax(numpy.arange(0, 103), y, 10)
+        self.assertIn(5., out_y)
+        self.assertIn(-5., out_y)
+        self.assertEqual(102., out_x[-1])
+
+    def test_nan(self):
+        y = numpy.arange(0, 100, dtype=float)
+        y[0:10] = numpy.nan
+        y[50:55] = numpy.nan
+        out_x, out_y = decimate_minmax(numpy.arange(0, 100), y, 10)
+        # An all-NaN bucket keeps a NaN (the gap); other buckets drop theirs.
+        self.assertEqual([0.], [v for v in out_x if v < 10])
+        self.assertTrue(numpy.isnan(out_y[0]))
+        self.assertEqual(0, numpy.isnan(out_y[(out_x >= 50) & (out_x < 60)]).sum())
@@ -0,0 +1,66 @@
+# coding=utf-8
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from sfc_gui.result_cache import ResultCache
+from sfc_gui.result_file import get_solver_settings
+from sfc_gui.tests.test_result_file import FakeModel
+
+
+class TestResultCache(TestCase):
+    def setUp(self):
+        self.Dir = tempfile.mkdtemp()
+        self.Cache = ResultCache(os.path.join(self.Dir, 'cache'))
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+
+    def test_make_key(self):
+        key = ResultCache.MakeKey('def build_model():\n    pass\n')
+        self.assertEqual(key, ResultCache.MakeKey('def build_model():\n    pass\n'))
+        self.assertNotEqual(key, ResultCache.MakeKey('def build_model():\n    return None\n'))
+        self.assertEqual(64, len(key))
+
+    def test_get_put(self):
+        self.assertIsNone(self.Cache.Get('key'))
+        fname = self.Cache.Put('key', FakeModel(), model_name='model')
+        self.assertEqual(self.Cache.GetPath('key'), fname)
+        self.assertEqual('model', self.Cache.Get('key').ModelName)
+        # No temporary files left behind.
+        self.assertEqual(['key.sfcr'], os.listdir(self.Cache.Directory))
+        # Replacing an entry
+        self.Cache.Put('key', FakeModel(), model_name='other')
+        self.assertEqual('other', self.Cache.Get('key').ModelName)
+
+    def test_settings(self):
+        model = FakeModel()
+        self.Cache.Put('key', model)
+        settings = get_solver_settings(model)
+        self.assertIsNotNone(self.Cache.Get('key', settings))
+        settings['MaxTime'] = 100
+        self.assertIsNone(self.Cache.Get('key', settings))
+        # A miss on settings does not drop the entry.
+        self.assertIsNotNone(self.Cache.Get('key'))
+
+    def test_damaged(self):
+        os.makedirs(self.Cache.Directory)
+        with open(self.Cache.GetPath('bad'), 'wb') as f:
+            f.write(b'garbage')
+        self.assertIsNone(self.Cache.Get('bad'))
+        self.assertFalse(os.path.exists(self.Cache.GetPath('bad')))
+
+    def test_eviction(self):
+        for pos, key in enumerate(['a', 'b', 'c']):
+            fname = self.Cache.Put(key, FakeModel())
+            os.utime(fname, (1000. + pos, 1000. + pos))
+        size = os.path.getsize(self.Cache.GetPath('a'))
+        # A hit marks the entry as recently used.
+        self.Cache.Get('a')
+        self.Cache.MaxBytes = 2 * size
+        self.assertEqual(1, self.Cache.Evict())
+        self.assertEqual(['a.sfcr', 'c.sfcr'], sorted(os.listdir(self.Cache.Directory)))
+        self.Cache.Clear()
+        self.assertEqual([], self.Cache.GetEntries())
@@ -0,0 +1,89 @@
+# coding=utf-8
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from sfc_gui.result_file import ResultFile, SavedEquation, SavedEquationBlock, save_results
+
+
+class FakeHolder(dict):
+    def __init__(self, series, time_axis='k'):
+        dict.__init__(self, series)
+        self.TimeSeriesName = time_axis
+
+
+class FakeCountry(object):
+    def __init__(self, code):
+        self.Code = code
+
+
+class FakeSolver(object):
+    def __init__(self):
+        self.TimeSeries = FakeHolder({'k': [0., 1., 2.], 'N_HH__C': [1., 2., 3.],
+                                      'S_HH__C': [4., 5.]})
+        self.TimeSeriesInitialSteadyState = FakeHolder({'iteration': [0., 1.], 'X': [1., 1.]},
+                                                       'iteration')
+        # No time axis series: one is added.
+        self.TimeSeriesStepTrace = FakeHolder({})
+        self.TraceStep = None
+        self.ParameterSolveInitialSteadyState = False
+
+
+class FakeModel(object):
+    """
+    Just the parts of a solved sfc_models Model that save_results() reads.
+    """
+    def __init__(self):
+        self.CountryList = [FakeCountry('N'), FakeCountry('S')]
+        self.MaxTime = 2
+        self.EquationSolver = FakeSolver()
+        self.FinalEquationBlock = SavedEquationBlock()
+        self.FinalEquationBlock.AddEquation(SavedEquation('N_HH__C', '0.6*N_HH__Y', 'Consumption'))
+        self.FinalEquationBlock.AddEquation(SavedEquation('k', 'k(k-1) + 1', ''))
+
+
+class TestResultFile(TestCase):
+    def setUp(self):
+        self.Dir = tempfile.mkdtemp()
+        self.FileName = os.path.join(self.Dir, 'results.sfcr')
+        save_results(self.FileName, FakeModel(), 'model')
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+
+    def test_header(self):
+        results = ResultFile(self.FileName)
+        self.assertEqual('model', results.ModelName)
+        self.assertEqual(['N', 'S'], results.Countries)
+        self.assertEqual({'MaxTime': 2, 'TraceStep': None, 'SolveInitialSteadyState': False},
+                         results.Settings)
+        self.assertEqual(['Time Series', 'Initial Steady State', 'Convergence Trace'],
+                         results.SourceOptions)
+        self.assertEqual(0, results.DataStart % 64)
+        block = results.FinalEquationBlock
+        self.assertEqual(['N_HH__C', 'k'], block.GetEquationList())
+        self.assertEqual('0.6*N_HH__Y', block['N_HH__C'].GetRightHandSide())
+        self.assertEqual('Consumption', block['N_HH__C'].Description)
+
+    def test_series(self):
+        results = ResultFile(self.FileName)
+        store = results.GetStore('Time Series')
+        self.assertEqual(['N_HH__C', 'S_HH__C', 'k'], sorted(store.GetSeriesList()))
+        self.assertEqual([1., 2., 3.], list(store['N_HH__C']))
+        # Short series are padded with NaN.
+        self.assertEqual([4., 5.], list(store['S_HH__C'][0:2]))
+        self.assertNotEqual(store['S_HH__C'][2], store['S_HH__C'][2])
+        self.assertIs(store, results.GetStore('Time Series'))
+        store = results.GetStore('Initial Steady State')
+        self.assertEqual('iteration', store.TimeAxisVariable)
+        self.assertEqual([1., 1.], list(store['X']))
+        store = results.GetStore('Convergence Trace')
+        self.assertEqual([0., 1.], list(store['k']))
+
+    def test_not_result_file(self):
+        fname = os.path.join(self.Dir, 'other.txt')
+        with open(fname, 'wb') as f:
+            f.write(b'not a result file')
+        self.assertRaises(ValueError, ResultFile, fname)
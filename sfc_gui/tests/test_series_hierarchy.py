@@ -0,0 +1,64 @@
+# coding=utf-8
+
+from unittest import TestCase
+
+from sfc_gui.series_hierarchy import SeriesHierarchy, parse_series_name, country_prefix, \
+    sector_prefix, other_code
+
+
+class TestParseSeriesName(TestCase):
+    def test_no_countries(self):
+        # Guessed from the shape of the name.
+        self.assertEqual(('CA', 'HH', 'AlphaIncome'), parse_series_name('CA_HH__AlphaIncome'))
+        self.assertEqual(('', 'GOV', 'DEM_GOOD'), parse_series_name('GOV__DEM_GOOD'))
+        self.assertIsNone(parse_series_name('k'))
+        self.assertIsNone(parse_series_name('__X'))
+        self.assertIsNone(parse_series_name('GOV__'))
+
+    def test_single_country(self):
+        # No country prefix, even if the sector code contains '_'.
+        self.assertEqual(('', 'GOV_TRE', 'DEM_N_GOOD'),
+                         parse_series_name('GOV_TRE__DEM_N_GOOD', ['CA']))
+        self.assertEqual(('', 'HH', 'C'), parse_series_name('HH__C', []))
+
+    def test_known_countries(self):
+        countries = ['N', 'S', 'GOV']
+        self.assertEqual(('N', 'HH', 'C'), parse_series_name('N_HH__C', countries))
+        self.assertEqual(('GOV', 'TRE', 'X'), parse_series_name('GOV_TRE__X', countries))
+        # Not a country code: the whole prefix is the sector.
+        self.assertEqual(('', 'CB_X', 'Y'), parse_series_name('CB_X__Y', countries))
+        self.assertEqual(('', 'N', 'Y'), parse_series_name('N__Y', countries))
+
+    def test_longest_match(self):
+        countries = ['US', 'US_E']
+        self.assertEqual(('US_E', 'HH', 'C'), parse_series_name('US_E_HH__C', countries))
+        self.assertEqual(('US', 'HH', 'C'), parse_series_name('US_HH__C', countries))
+
+
+class TestSeriesHierarchy(TestCase):
+    def test_single_country(self):
+        tree = SeriesHierarchy(['k', 'HH__C', 'GOV_TRE__X', 'HH__Y'], ['CA'])
+        self.assertTrue(tree.IsSingleCountry())
+        self.assertEqual(['HH__C', 'HH__Y'], tree.GetSeries(sector_prefix + 'HH'))
+        self.assertEqual(['k'], tree.GetSeries(other_code))
+        blocks = dict(tree.GetTreeBlocks())
+        self.assertEqual([sector_prefix + 'GOV_TRE', sector_prefix + 'HH', other_code],
+                         [x[0] for x in blocks['']])
+        self.assertEqual([('GOV_TRE__X', 'X', ())], blocks[sector_prefix + 'GOV_TRE'])
+        self.assertEqual('GOV_TRE (1)', blocks[''][0][1])
+
+    def test_countries(self):
+        names = ['t', 'N_HH__C', 'S_HH__C', 'N_BUS__Y', 'GOV_TRE__X']
+        tree = SeriesHierarchy(names, ['N', 'S', 'GOV'])
+        self.assertFalse(tree.IsSingleCountry())
+        self.assertEqual(['GOV', 'N', 'S'], tree.GetCountries())
+        self.assertEqual(['N_BUS__Y', 'N_HH__C'], tree.GetSeries(country_prefix + 'N'))
+        self.assertEqual(2, tree.GetNumSeries(country_prefix + 'N'))
+        self.assertEqual(['N_HH__C'], tree.GetSeries('N_HH__C'))
+        self.assertTrue(tree.IsGroup(country_prefix + 'S'))
+        self.assertFalse(tree.IsGroup('S_HH__C'))
+        blocks = dict(tree.GetTreeBlocks())
+        self.assertEqual(['GOV (1)', 'N (2)', 'S (1)', 'Other (1)'],
+                         [x[1] for x in blocks['']])
+        self.assertEqual(['TRE (1)'], [x[1] for x in blocks[country_prefix + 'GOV']])
+        self.assertEqual([('N_HH__C', 'C', ())], blocks[sector_prefix + 'N_HH'])
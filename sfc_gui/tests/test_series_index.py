@@ -0,0 +1,44 @@
+# coding=utf-8
+
+from unittest import TestCase
+
+from sfc_gui.series_index import SeriesIndex, get_trigrams
+
+
+class TestGetTrigrams(TestCase):
+    def test_trigrams(self):
+        self.assertEqual(set(['abc', 'bcd']), get_trigrams('abcd'))
+        self.assertEqual(set(), get_trigrams('ab'))
+
+
+class TestSeriesIndex(TestCase):
+    def setUp(self):
+        self.Index = SeriesIndex(['k', 'HH__Y', 'HH__C', 'GOV__G', 'BUS__HH_Y', 'HH__AlphaIncome'])
+
+    def test_substring(self):
+        self.assertEqual(['HH__Y', 'BUS__HH_Y'], self.Index.Find('_y'))
+        self.assertEqual(['BUS__HH_Y'], self.Index.Find('h_y'))
+        self.assertEqual(['HH__AlphaIncome'], self.Index.Find('ALPHA'))
+        self.assertEqual(['HH__AlphaIncome'], self.Index.Find('  income '))
+        self.assertEqual([], self.Index.Find('xyz'))
+        # All the trigrams match, but not as one substring.
+        self.assertEqual([], self.Index.Find('hh__hh'))
+
+    def test_short(self):
+        # Shorter than a trigram: scan.
+        self.assertEqual(['k'], self.Index.Find('k'))
+        self.assertEqual(['HH__Y', 'HH__C', 'BUS__HH_Y', 'HH__AlphaIncome'], self.Index.Find('hh'))
+        self.assertEqual(['GOV__G'], self.Index.Find('go'))
+        self.assertEqual(6, len(self.Index.Find('')))
+
+    def test_prefix(self):
+        self.assertEqual(['HH__Y', 'HH__C', 'HH__AlphaIncome'], self.Index.Find('^hh'))
+        self.assertEqual([], self.Index.Find('^us'))
+        self.assertEqual(6, len(self.Index.Find('^')))
+
+    def test_matches_scan(self):
+        names = ['{0}_{1}__V{2}'.format(c, s, v) for c in ('N', 'S') for s in ('HH', 'GOV', 'BUS')
+                 for v in range(0, 20)]
+        index = SeriesIndex(names)
+        for query in ('v1', 'hh__v1', 'n_go', 's_bus__v19', 'v', '__v0'):
+            self.assertEqual([x for x in names if query in x.lower()], index.Find(query))
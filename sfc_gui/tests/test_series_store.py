@@ -0,0 +1,54 @@
+# coding=utf-8
+
+from unittest import TestCase
+
+import numpy
+
+from sfc_gui.series_store import SeriesStore
+
+
+class TestSeriesStore(TestCase):
+    def setUp(self):
+        self.Store = SeriesStore.FromHolder({'k': [1., 2., 3., 4.], 'A': [10., 20., 30., 40.],
+                                             'B': [5., 6.], 'C': ['bad', 'list']})
+
+    def test_columns(self):
+        store = self.Store
+        self.assertEqual(['A', 'B', 'C', 'k'], store.GetSeriesList())
+        self.assertEqual(4, store.GetNumTime())
+        self.assertEqual([10., 20., 30., 40.], list(store['A']))
+        # Columns are views of the data.
+        self.assertTrue(numpy.shares_memory(store['A'], store.Data))
+        # Short series are padded with NaN; unreadable ones are all NaN.
+        self.assertEqual([5., 6.], list(store['B'][0:2]))
+        self.assertTrue(numpy.isnan(store['B'][2:]).all())
+        self.assertTrue(numpy.isnan(store['C']).all())
+        self.assertIn('k', store)
+        self.assertNotIn('D', store)
+
+    def test_holder_order(self):
+        class Holder(dict):
+            TimeSeriesName = 't'
+
+            def GetSeriesList(self):
+                return ['t', 'Z', 'A']
+        store = SeriesStore.FromHolder(Holder({'t': [0., 1.], 'Z': [1., 2.], 'A': [3., 4.]}))
+        self.assertEqual(['t', 'Z', 'A'], store.GetSeriesList())
+        self.assertEqual('t', store.TimeAxisVariable)
+        self.assertEqual([3., 4.], list(store['A']))
+
+    def test_window(self):
+        store = self.Store
+        self.assertEqual(1, store.GetTimeAxisMinimum())
+        self.assertEqual((0, 4), store.GetWindowBounds())
+        self.assertEqual((1, 3), store.GetWindowBounds(2, 2))
+        # A start outside the data is ignored.
+        self.assertEqual((0, 2), store.GetWindowBounds(10, 2))
+        x, y = store.GetWindow('A', 3)
+        self.assertEqual([3., 4.], list(x))
+        self.assertEqual([30., 40.], list(y))
+
+    def test_limits(self):
+        self.assertEqual((5., 6.), SeriesStore.GetLimits(self.Store['B']))
+        self.assertEqual((0., 1.), SeriesStore.GetLimits(self.Store['C']))
+        self.assertEqual((0., 1.), SeriesStore.GetLimits(numpy.array([])))
@@ -0,0 +1,66 @@
+# coding=utf-8
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+import sfc_gui.module_loader
+from sfc_gui.sweep import build_with_overrides, check_exogenous, check_overrides, \
+    expand_constant, expand_grid
+
+# REG2 (two regions in a single country), with a short time axis.
+model_source = '''
+import sfc_models.gl_book.chapter6 as chapter6
+
+
+def build_model():
+    model = chapter6.REG2('CA').build_model()
+    model.MaxTime = 10
+    return model
+'''
+
+
+class TestSweep(TestCase):
+    def setUp(self):
+        self.Dir = tempfile.mkdtemp()
+        self.FileName = os.path.join(self.Dir, 'sweep_model.py')
+        with open(self.FileName, 'w') as f:
+            f.write(model_source)
+        self.Module = sfc_gui.module_loader.loader('sweep_model', self.FileName)
+
+    def tearDown(self):
+        shutil.rmtree(self.Dir)
+
+    def test_expand_grid(self):
+        self.assertEqual([{'a': 1, 'b': 3}, {'a': 1, 'b': 4}, {'a': 2, 'b': 3}, {'a': 2, 'b': 4}],
+                         expand_grid({'b': [3, 4], 'a': [1, 2]}))
+
+    def test_check_exogenous(self):
+        model = self.Module.build_model()
+        name = 'GOV_TRE__DEM_N_GOOD'
+        self.assertIsNone(check_exogenous(model, name, '20.0'))
+        self.assertIsNone(check_exogenous(model, name, 20.))
+        self.assertIsNone(check_exogenous(model, name, '[20.,]*11'))
+        self.assertIsNone(check_exogenous(model, name, [20.] * 11))
+        self.assertIn('MaxTime + 1 = 11', check_exogenous(model, name, '[20.,]*10'))
+        self.assertIn('cannot evaluate', check_exogenous(model, name, '[20.,'))
+        self.assertIn('not a list', check_exogenous(model, name, 'None'))
+        self.assertIn('no sector with full code', check_exogenous(model, 'GOV__DEM_N_GOOD', '20.'))
+
+    def test_check_overrides(self):
+        grid = {'GOV_TRE__DEM_N_GOOD': ['20.', '[20.,]*3'], 'GOV_TRE__X': ['[1.,]*11']}
+        self.assertEqual(['GOV_TRE__DEM_N_GOOD'], [x[0] for x in check_overrides(self.FileName, grid)])
+
+    def test_expand_constant(self):
+        model = self.Module.build_model()
+        self.assertEqual('[20.0,]*11', expand_constant(model, '20.'))
+        self.assertEqual('[25.0,]*11', expand_constant(model, 25))
+        self.assertEqual('[20.,]*11', expand_constant(model, '[20.,]*11'))
+        self.assertEqual('bad', expand_constant(model, 'bad'))
+
+    def test_scalar_override(self):
+        # A constant must solve, and not fail in the sfc_models equation parser.
+        model = build_with_overrides(self.Module, {'GOV_TRE__DEM_N_GOOD': '25.'})
+        model.main()
+        self.assertEqual([25.] * 11, list(model.EquationSolver.TimeSeries['GOV_TRE__DEM_N_GOOD']))
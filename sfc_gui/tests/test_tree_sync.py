@@ -0,0 +1,136 @@
+# coding=utf-8
+
+import random
+from unittest import TestCase
+
+from sfc_gui.tree_sync import TreeSync, diff_rows
+from sfc_gui.tests.fake_widgets import FakeTreeview
+
+
+def make_rows(codes, version=0):
+    return [(code, code.lower(), ('{0} = {1}'.format(code, version), '')) for code in codes]
+
+
+class TestDiffRows(TestCase):
+    def test_diff(self):
+        old = {'A': 1, 'B': 2, 'C': 3}
+        new = {'B': 2, 'C': 4, 'D': 5}
+        added, removed, changed = diff_rows(old, new)
+        self.assertEqual(set(['D']), added)
+        self.assertEqual(set(['A']), removed)
+        self.assertEqual(set(['C']), changed)
+
+    def test_empty(self):
+        self.assertEqual((set(), set(), set()), diff_rows({}, {}))
+
+
+class TestTreeSync(TestCase):
+    def test_root_block(self):
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        sync.SyncBlock('', make_rows(['A', 'B', 'C']))
+        self.assertEqual(('A', 'B', 'C'), tree.get_children(''))
+        self.assertEqual('b', tree.Items['B']['text'])
+
+    def test_incremental(self):
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        sync.SyncBlock('', make_rows(['A', 'B', 'C']))
+        rows = make_rows(['A', 'C', 'D'])
+        rows[0] = ('A', 'a', ('A = 1', ''))
+        before = tree.NumCalls
+        added, removed, changed = sync.SyncBlock('', rows)
+        self.assertEqual((set(['D']), set(['B']), set(['A'])), (added, removed, changed))
+        # delete B, insert D, update A
+        self.assertEqual(3, tree.NumCalls - before)
+        self.assertEqual(('A', 'C', 'D'), tree.get_children(''))
+        self.assertEqual(('A = 1', ''), tree.Items['A']['values'])
+
+    def test_no_change(self):
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        sync.SyncBlock('', make_rows(['A', 'B']))
+        before = tree.NumCalls
+        sync.SyncBlock('', make_rows(['A', 'B']))
+        self.assertEqual(before, tree.NumCalls)
+
+    def test_reorder(self):
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        sync.SyncBlock('', make_rows(['A', 'B', 'C']))
+        sync.SyncBlock('', make_rows(['C', 'A', 'B']))
+        self.assertEqual(('C', 'A', 'B'), tree.get_children(''))
+
+    def test_lazy(self):
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        sync.SyncBlock('', make_rows(['P']))
+        sync.SyncBlock('P', make_rows(['P1', 'P2']))
+        # Collapsed: only the placeholder exists.
+        self.assertEqual((TreeSync.GetPlaceholderCode('P'),), tree.get_children('P'))
+        sync.Materialize('P')
+        self.assertEqual(('P1', 'P2'), tree.get_children('P'))
+        sync.Evict('P')
+        self.assertEqual((TreeSync.GetPlaceholderCode('P'),), tree.get_children('P'))
+        # Snapshots of collapsed blocks are kept up to date.
+        sync.SyncBlock('P', make_rows(['P2', 'P3']))
+        sync.Materialize('P')
+        self.assertEqual(('P2', 'P3'), tree.get_children('P'))
+        # An emptied collapsed block loses its placeholder.
+        sync.Evict('P')
+        sync.SyncBlock('P', [])
+        self.assertEqual((), tree.get_children('P'))
+
+    def test_remove_parent(self):
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        sync.SyncBlock('', make_rows(['P', 'Q']))
+        sync.SyncBlock('P', make_rows(['P1']))
+        sync.Materialize('P')
+        sync.SyncBlock('', make_rows(['Q']))
+        self.assertFalse(tree.exists('P1'))
+        self.assertNotIn('P1', sync.Parent)
+        self.assertEqual({}, sync.GetRows('P'))
+
+    def test_reveal(self):
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        sync.SyncBlock('', make_rows(['P']))
+        sync.SyncBlock('P', make_rows(['Q']))
+        sync.SyncBlock('Q', make_rows(['R']))
+        self.assertEqual(['P', 'Q', 'R'], sync.GetPath('R'))
+        self.assertFalse(tree.exists('R'))
+        self.assertTrue(sync.Reveal('R'))
+        self.assertTrue(tree.exists('R'))
+        self.assertTrue(tree.Items['Q']['open'])
+        self.assertFalse(sync.Reveal('unknown'))
+
+    def test_random(self):
+        # The tree must always match a full rebuild from the latest snapshots.
+        rand = random.Random(1)
+        tree = FakeTreeview()
+        sync = TreeSync(tree)
+        parents = ['', 'A', 'B', 'A1']
+        blocks = {'': ['A', 'B'], 'A': ['A1']}
+        for step in range(0, 300):
+            parent = rand.choice(parents)
+            if parent == '':
+                codes = ['A', 'B'] + ['X{0}'.format(x) for x in range(0, 4) if rand.random() < .5]
+            elif parent == 'A':
+                codes = ['A1'] + ['Y{0}'.format(x) for x in range(0, 4) if rand.random() < .5]
+            else:
+                codes = [parent + 'Z{0}'.format(x) for x in range(0, 6) if rand.random() < .5]
+            rand.shuffle(codes)
+            blocks[parent] = codes
+            sync.SyncBlock(parent, make_rows(codes, rand.randint(0, 2)))
+            action = rand.random()
+            if action < .2:
+                sync.Materialize(rand.choice(parents))
+            elif action < .3:
+                sync.Evict(rand.choice(parents))
+            for code in sync.Materialized:
+                self.assertEqual(tuple(sync.Order.get(code, [])), tree.get_children(code))
+                for child in tree.get_children(code):
+                    text, values = sync.GetRows(code)[child]
+                    self.assertEqual(text, tree.Items[child]['text'])
+                    self.assertEqual(values, tree.Items[child]['values'])
@@ -0,0 +1,235 @@
+# coding=utf-8
+"""
+tree_sync.py
+
+Keeps a ttk.Treeview in step with a keyed snapshot of its rows.
+
+Each block of rows (the children of one tree node) is described as an ordered list of
+(code, text, values) tuples. The TreeSync object remembers the last snapshot it pushed for every
+block, computes a set-based diff against the new snapshot, and only touches rows that were
+added, removed, or changed. This replaces the "delete everything and reinsert" refresh, which
+was O(n^2) and stalled the GUI on large models.
+
+The tree is also populated lazily: the rows of a block only exist in the Treeview while its
+parent node is expanded. A collapsed node with children gets a single placeholder row (so that Tk
+shows the expand marker). Call Materialize() from the <<TreeviewOpen>> event and Evict() from
+<<TreeviewClose>>; snapshots of collapsed blocks are still kept up to date, so expanding a node
+always shows the latest equations.
+"""
+
+
+def diff_rows(old_rows, new_rows):
+    """
+    Compare two row snapshots (dicts that map code -> row data).
+
+    Returns a tuple (added, removed, changed) of sets of codes.
+
+    :param old_rows: dict
+    :param new_rows: dict
+    :return: tuple
+    """
+    old_keys = set(old_rows)
+    new_keys = set(new_rows)
+    added = new_keys - old_keys
+    removed = old_keys - new_keys
+    changed = set(k for k in (old_keys & new_keys) if old_rows[k] != new_rows[k])
+    return added, removed, changed
+
+
+class TreeSync(object):
+    """
+    Applies row snapshots to a ttk.Treeview incrementally.
+
+    Rows are identified by their Treeview item code (iid), which must be unique across the tree.
+    """
+    def __init__(self, treewidget):
+        self.Tree = treewidget
+        # parent code -> dict of child code -> (text, values)
+        self.Blocks = {}
+        # parent code -> list of child codes, in display order
+        self.Order = {}
+        # child code -> parent code
+        self.Parent = {}
+        # Blocks whose rows currently exist in the Treeview. The root is always there.
+        self.Materialized = set(('',))
+
+    def Reset(self):
+        """
+        Forget all snapshots (does not touch the tree).
+        :return:
+        """
+        self.Blocks = {}
+        self.Order = {}
+        self.Parent = {}
+        self.Materialized = set(('',))
+
+    def IsOnTree(self, code):
+        """
+        Does the row exist in the Treeview? (It does if its parent block is materialized.)
+        :param code: str
+        :return: bool
+        """
+        return code == '' or self.Parent.get(code) in self.Materialized
+
+    @staticmethod
+    def GetPlaceholderCode(code):
+        return code + '*PLACEHOLDER*'
+
+    def GetRows(self, parent):
+        """
+        Get the last snapshot pushed for a block, as a dict of code -> (text, values).
+        :param parent: str
+        :return: dict
+        """
+        return self.Blocks.get(parent, {})
+
+    def SyncBlock(self, parent, rows):
+        """
+        Bring the children of parent in line with rows.
+
+        Rows is a list of (code, text, values) tuples in display order.
+
+        Returns the (added, removed, changed) sets of codes.
+
+        :param parent: str
+        :param rows: list
+        :return: tuple
+        """
+        tree = self.Tree
+        old_rows = self.Blocks.get(parent, {})
+        old_order = self.Order.get(parent, [])
+        new_rows = {}
+        new_order = []
+        for code, text, values in rows:
+            new_rows[code] = (text, tuple(values))
+            new_order.append(code)
+        added, removed, changed = diff_rows(old_rows, new_rows)
+        for code in added:
+            self.Parent[code] = parent
+        if parent not in self.Materialized:
+            # Only the snapshot changes; rows are inserted when the node is expanded.
+            for code in removed:
+                self._Forget(code)
+            self.Blocks[parent] = new_rows
+            self.Order[parent] = new_order
+            self._SetPlaceholder(parent)
+            return added, removed, changed
+        for code in removed:
+            tree.delete(code)
+            self._Forget(code)
+        survivors_old = [c for c in old_order if c not in removed]
+        survivors_new = [c for c in new_order if c not in added]
+        if survivors_old != survivors_new:
+            # Relative order of surviving rows changed; rare, so just move them all.
+            for pos, code in enumerate(survivors_new):
+                tree.move(code, parent, pos)
+        if len(added) > 0:
+            for pos, code in enumerate(new_order):
+                if code in added:
+                    text, values = new_rows[code]
+                    tree.insert(parent, pos, code, text=text, values=values, open=False)
+        for code in changed:
+            text, values = new_rows[code]
+            tree.item(code, text=text, values=values)
+        self.Blocks[parent] = new_rows
+        self.Order[parent] = new_order
+        return added, removed, changed
+
+    def Materialize(self, code):
+        """
+        Insert the rows of a block into the tree (called when the node is expanded).
+        Child nodes are inserted collapsed.
+        :param code: str
+        :return:
+        """
+        if code in self.Materialized or not self.IsOnTree(code):
+            return
+        tree = self.Tree
+        placeholder = self.GetPlaceholderCode(code)
+        if tree.exists(placeholder):
+            tree.delete(placeholder)
+        rows = self.Blocks.get(code, {})
+        self.Materialized.add(code)
+        for child in self.Order.get(code, []):
+            text, values = rows[child]
+            tree.insert(code, 'end', child, text=text, values=values, open=False)
+            self._SetPlaceholder(child)
+
+    def GetPath(self, code):
+        """
+        Codes of the ancestors of a row (top first, without the root), followed by the row itself.
+        :param code: str
+        :return: list
+        """
+        out = []
+        while code in self.Parent:
+            out.append(code)
+            code = self.Parent[code]
+        out.reverse()
+        return out
+
+    def Reveal(self, code):
+        """
+        Expand (and materialize) all the ancestors of a row, so that it exists in the tree.
+        Returns False if the row is unknown.
+        :param code: str
+        :return: bool
+        """
+        if code not in self.Parent:
+            return False
+        for ancestor in self.GetPath(code)[:-1]:
+            self.Materialize(ancestor)
+            self.Tree.item(ancestor, open=True)
+        return True
+
+    def Evict(self, code):
+        """
+        Remove the rows of a block from the tree (called when the node is collapsed).
+        The snapshot is kept.
+        :param code: str
+        :return:
+        """
+        if code == '' or code not in self.Materialized:
+            return
+        children = self.Tree.get_children(code)
+        if len(children) > 0:
+            self.Tree.delete(*children)
+        self._Unmaterialize(code)
+        self._SetPlaceholder(code)
+
+    def _SetPlaceholder(self, code):
+        """
+        For a collapsed node on the tree, make sure that a placeholder row exists if (and only if)
+        the node has children.
+        :param code: str
+        :return:
+        """
+        if code in self.Materialized or not self.IsOnTree(code):
+            return
+        tree = self.Tree
+        placeholder = self.GetPlaceholderCode(code)
+        has_rows = len(self.Order.get(code, [])) > 0
+        if has_rows and not tree.exists(placeholder):
+            tree.insert(code, 'end', placeholder, text='...')
+        elif not has_rows and tree.exists(placeholder):
+            tree.delete(placeholder)
+
+    def _Unmaterialize(self, code):
+        if code not in self.Materialized:
+            return
+        self.Materialized.discard(code)
+        for child in self.Order.get(code, []):
+            self._Unmaterialize(child)
+
+    def _Forget(self, code):
+        """
+        Drop the snapshots of a deleted node and all of its descendants.
+        :param code: str
+        :return:
+        """
+        children = self.Order.pop(code, [])
+        self.Blocks.pop(code, None)
+        self.Parent.pop(code, None)
+        self.Materialized.discard(code)
+        for child in children:
+            self._Forget(child)
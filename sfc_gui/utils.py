@@ -22,24 +22,36 @@ limitations under the License.
 import copy
 import sys
 import traceback
-import matplotlib
-matplotlib.use('TKagg')
-from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2TkAgg
-from matplotlib.figure import Figure
-import matplotlib.pyplot
-
-from sfc_models.models import Model
-
-if sys.version_info[0] < 3:
-    import Tkinter as tk
-    from Tkinter import *
-    from Tkinter import messagebox
-    from Tkinter import ttk
-else:
-    import tkinter as tk
-    from tkinter import *
-    from tkinter import messagebox
-    from tkinter import ttk
+
+from sfc_gui.series_index import SeriesIndex
+from sfc_gui.series_hierarchy import SeriesHierarchy
+
+# Tk, matplotlib, numpy and sfc_models are only imported when they are first used (by the widget
+# factories and Parameters), so that importing this module is fast, and works without a display.
+# See benchmarks/bench_import.py.
+
+
+def _import_tk():
+    """
+    Returns the (tkinter, ttk) modules.
+    """
+    if sys.version_info[0] < 3:
+        import Tkinter as tk
+        from Tkinter import ttk
+    else:
+        import tkinter as tk
+        from tkinter import ttk
+    return tk, ttk
+
+
+def _import_tk_canvas():
+    """
+    Returns (FigureCanvasTkAgg, Figure).
+    """
+    from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg
+    from matplotlib.figure import Figure
+    return FigureCanvasTkAgg, Figure
+
 
 class Parameters(object):
     """
@@ -47,22 +59,44 @@ class Parameters(object):
     Not all Frames will use all data.
     """
     def __init__(self):
+        from sfc_models.models import Model
+        from sfc_gui.series_store import SeriesStore
         self.Model = Model()
         self.ModelName = ''
         self.TimeSeriesHolder = self.Model.EquationSolver.TimeSeries
+        self.SeriesStore = SeriesStore.FromHolder(self.TimeSeriesHolder)
         self.TimeAxisVariable = 'k'
         self.MinWidth = 800
         self.MinHeight = 600
         self.LogDir = ''
         self.SourceOptions = ('Time Series', 'Initial Steady State', 'Convergence Trace')
         self.LastSource = ''
+        # ListModel of the series list box, if any (updated when the series change).
         self.TimeSeriesWidget = None
+        # Type-ahead filter of the series list (see SetSeriesFilter()).
+        self.SeriesFilter = ''
+        self.SeriesIndex = None
+        # Country -> sector -> variable index of the series (for the series tree).
+        self.SeriesHierarchy = SeriesHierarchy([])
         self.TimeAxisMinimum = None
         self.TimeStart = None
         self.TimeRange = None
+        self.ResultFile = None
 
     def SetModel(self, model):
         self.Model = model
+        self.ResultFile = None
+        self.LastSource = ''
+        self.SetTimeSeriesHolder()
+
+    def SetResultFile(self, result_file):
+        """
+        Browse a saved result file (sfc_gui.result_file.ResultFile) instead of a Model.
+        :param result_file: ResultFile
+        :return:
+        """
+        self.ResultFile = result_file
+        self.ModelName = result_file.ModelName
         self.LastSource = ''
         self.SetTimeSeriesHolder()
 
@@ -72,6 +106,8 @@ class Parameters(object):
             raise ValueError('Unknown time series source: ' + opt)
         if opt == self.LastSource:
             return
+        if self.ResultFile is not None:
+            return self.SetStore(self.ResultFile.GetStore(opt), opt)
         if opt == self.SourceOptions[0]:
             holder = self.Model.EquationSolver.TimeSeries
         if opt == self.SourceOptions[1]:
@@ -82,19 +118,251 @@ class Parameters(object):
         self.TimeAxisVariable = self.TimeSeriesHolder.TimeSeriesName
         if self.TimeAxisVariable not in holder:
             holder[self.TimeAxisVariable] = [0.0, 1.0]
-        self.TimeAxisMinimum = int(self.GetTimeSeries(self.TimeAxisVariable)[0])
+        # Pack the lists into a single array once; the GUI reads through the store.
+        from sfc_gui.series_store import SeriesStore
+        self.SetStore(SeriesStore.FromHolder(holder, self.TimeAxisVariable), opt)
+        return holder
+
+    def GetCountryCodes(self):
+        """
+        Country codes of the model (or result file) being browsed; None if unknown (result files
+        saved before the codes were stored).
+        :return: list
+        """
+        if self.ResultFile is not None:
+            return self.ResultFile.Countries
+        return [x.Code for x in self.Model.CountryList]
+
+    def SetStore(self, store, source_str):
+        self.SeriesStore = store
+        self.TimeAxisVariable = store.TimeAxisVariable
+        self.TimeAxisMinimum = self.SeriesStore.GetTimeAxisMinimum()
         self.TimeRange = 40 # None
         self.TimeStart = self.TimeAxisMinimum
-        self.TimeSeriesList = holder.GetSeriesList()
+        self.TimeSeriesList = self.SeriesStore.GetSeriesList()
+        self.SeriesIndex = SeriesIndex(self.TimeSeriesList)
+        self.SeriesHierarchy = SeriesHierarchy(self.TimeSeriesList, self.GetCountryCodes())
         if self.TimeSeriesWidget is not None:
-            self.TimeSeriesWidget.set(self.TimeSeriesList)
-        self.LastSource = opt
-        return holder
+            # Set the filter for the new index first, so that the list box is only filled once.
+            self.TimeSeriesWidget.Filter = self.GetSeriesFilterFunction()
+            self.TimeSeriesWidget.SetItems(self.TimeSeriesList)
+        self.LastSource = source_str
+        return store
+
+    def SetSeriesFilter(self, query):
+        """
+        Only show the series that match query in the series list box (see SeriesIndex.Find()).
+        :param query: str
+        :return:
+        """
+        self.SeriesFilter = query
+        if self.TimeSeriesWidget is not None:
+            self.TimeSeriesWidget.SetFilter(self.GetSeriesFilterFunction())
+
+    def GetSeriesFilterFunction(self):
+        """
+        Filter function for the ListModel of the series list (None if there is no filter).
+        :return: function
+        """
+        if len(self.SeriesFilter.strip()) == 0 or self.SeriesIndex is None:
+            return None
+        return set(self.SeriesIndex.Find(self.SeriesFilter)).__contains__
 
     def GetTimeSeries(self, series_name):
-        ser = self.TimeSeriesHolder[series_name]
+        ser = self.SeriesStore[series_name]
         return ser
 
+    def GetWindow(self, series_name):
+        """
+        Get the (x, y) data for a series, cut to the TimeStart/TimeRange window. (Array views.)
+        :param series_name: str
+        :return: tuple
+        """
+        return self.SeriesStore.GetWindow(series_name, self.TimeStart, self.TimeRange)
+
+    def GetTimeWindow(self):
+        """
+        (start, range) of the time window that GetWindow() actually returns.
+        :return: tuple
+        """
+        lo, hi = self.SeriesStore.GetWindowBounds(self.TimeStart, self.TimeRange)
+        return self.SeriesStore.GetTimeAxisMinimum() + lo, hi - lo
+
+    def SetTimeWindow(self, time_start, time_range):
+        """
+        Set TimeStart/TimeRange (for example, from zooming or panning the graph), clamped to the
+        data. A time_range of None (or longer than the data) shows everything.
+
+        Returns True if the window changed.
+
+        :param time_start: int
+        :param time_range: int
+        :return: bool
+        """
+        num_time = self.SeriesStore.GetNumTime()
+        minimum = self.SeriesStore.GetTimeAxisMinimum()
+        if time_range is None or time_range >= num_time:
+            time_start = minimum
+            time_range = None
+        else:
+            time_range = max(int(time_range), 2)
+            time_start = min(max(int(time_start), minimum), minimum + num_time - time_range)
+        changed = not (time_start, time_range) == (self.TimeStart, self.TimeRange)
+        self.TimeStart = time_start
+        self.TimeRange = time_range
+        return changed
+
+    def GetSeriesInfo(self, series_name):
+        """
+        (equation string, description) for a series, from the result file if one is loaded.
+        :param series_name: str
+        :return: tuple
+        """
+        if self.ResultFile is not None:
+            return get_series_info(series_name, self.ResultFile)
+        return get_series_info(series_name, self.Model)
+
+
+
+class ListModel(object):
+    """
+    Python-side copy of the items of a Listbox, so that reading the selection does not parse the
+    Tcl list, and the Listbox is only updated where the items change.
+
+    Items are assumed to be unique (series names, model names, step names).
+
+    An optional filter (SetFilter()) hides the items for which it returns False; Items always
+    holds all the items, Visible the ones in the Listbox.
+    """
+    def __init__(self, listbox):
+        self.Listbox = listbox
+        self.Items = []
+        self.Visible = []
+        self.Filter = None
+        # Visible item -> position in the Listbox; rebuilt when needed.
+        self._Positions = None
+
+    def __len__(self):
+        return len(self.Items)
+
+    def __getitem__(self, pos):
+        return self.Visible[pos]
+
+    def Index(self, item):
+        """
+        Position of an item in the Listbox, or None if it is not shown.
+        :param item: str
+        :return: int
+        """
+        if self._Positions is None:
+            self._Positions = dict((x, pos) for pos, x in enumerate(self.Visible))
+        return self._Positions.get(item)
+
+    def GetSelection(self):
+        """
+        List of the selected items.
+        :return: list
+        """
+        return [self.Visible[x] for x in self.Listbox.curselection()]
+
+    def GetSelected(self):
+        """
+        First selected item, or None.
+        :return: str
+        """
+        indices = self.Listbox.curselection()
+        if len(indices) == 0:
+            return None
+        return self.Visible[indices[0]]
+
+    def Select(self, items, see=True):
+        """
+        Select the given items (the others are deselected).
+        :param items: list
+        :param see: bool (scroll to the first one)
+        :return:
+        """
+        self.Listbox.selection_clear(0, 'end')
+        first = None
+        for item in items:
+            pos = self.Index(item)
+            if pos is None:
+                continue
+            self.Listbox.selection_set(pos)
+            if first is None or pos < first:
+                first = pos
+        if see and first is not None:
+            self.Listbox.see(first)
+
+    def SetItems(self, items):
+        """
+        Replace all the items (one Tcl call). Selected items that are still shown stay selected.
+        Does nothing if the items did not change.
+        :param items: list
+        :return:
+        """
+        items = list(items)
+        if items == self.Items:
+            return
+        self.Items = items
+        self._Refresh()
+
+    def SetFilter(self, predicate):
+        """
+        Only show the items for which predicate(item) is True (None: show all).
+        :param predicate: function
+        :return:
+        """
+        self.Filter = predicate
+        self._Refresh()
+
+    def Insert(self, pos, item):
+        """
+        Insert an item at position pos of Items.
+        :param pos: int
+        :param item: str
+        :return:
+        """
+        self.Items.insert(pos, item)
+        if self.Filter is None:
+            visible_pos = pos
+        elif self.Filter(item):
+            visible_pos = len([x for x in self.Items[0:pos] if self.Filter(x)])
+        else:
+            return
+        self.Visible.insert(visible_pos, item)
+        self.Listbox.insert(visible_pos, item)
+        self._Positions = None
+
+    def Delete(self, pos):
+        """
+        Delete the item at position pos of Items.
+        :param pos: int
+        :return:
+        """
+        item = self.Items.pop(pos)
+        visible_pos = self.Index(item)
+        if visible_pos is None:
+            return
+        del self.Visible[visible_pos]
+        self.Listbox.delete(visible_pos)
+        self._Positions = None
+
+    def _Refresh(self):
+        selected = self.GetSelection()
+        if self.Filter is None:
+            visible = list(self.Items)
+        else:
+            visible = [x for x in self.Items if self.Filter(x)]
+        if visible == self.Visible:
+            return
+        self.Visible = visible
+        self._Positions = None
+        self.Listbox.delete(0, 'end')
+        if len(visible) > 0:
+            self.Listbox.insert('end', *visible)
+        if len(selected) > 0:
+            self.Select(selected, see=False)
 
 
 class WidgetHolder(object):
@@ -105,27 +373,33 @@ class WidgetHolder(object):
         self.MatplotlibInfo = {}
 
     def AddEntry(self, parent, name, readonly=False):
-        self.Data[name] = StringVar()
+        tk, ttk = _import_tk()
+        self.Data[name] = tk.StringVar()
         if readonly:
-            self.Widgets[name] = Entry(parent, state=['readonly',], textvariable=self.Data[name])
+            self.Widgets[name] = tk.Entry(parent, state=['readonly',], textvariable=self.Data[name])
         else:
-            self.Widgets[name] = Entry(parent, textvariable=self.Data[name])
+            self.Widgets[name] = tk.Entry(parent, textvariable=self.Data[name])
 
     def AddButton(self, parent, name, text, command, state='!disabled'):
+        tk, ttk = _import_tk()
         self.Widgets[name] = ttk.Button(parent, text=text, command=command, state=state)
 
     def AddTree(self, parent, name, columns):
+        tk, ttk = _import_tk()
         self.Widgets[name] = ttk.Treeview(parent, columns=columns)
 
     def AddListBox(self, parent, name, height=10, single_select=True, callback=None):
+        """
+        Listbox; its items are kept in a ListModel, in self.Data[name].
+        """
         if single_select:
             select_mode = 'browse'
         else:
             select_mode='extended'
+        tk, ttk = _import_tk()
         self.ListBoxType[name] = select_mode
-        self.Data[name] = StringVar()
-        self.Widgets[name] = Listbox(parent, listvariable=self.Data[name], height=height,
-                                     selectmode=select_mode)
+        self.Widgets[name] = tk.Listbox(parent, height=height, selectmode=select_mode)
+        self.Data[name] = ListModel(self.Widgets[name])
         if callback is not None:
             self.Widgets[name].bind('<<ListboxSelect>>', callback)
 
@@ -138,16 +412,10 @@ class WidgetHolder(object):
         :param name:
         :return:
         """
-        indices = self.Widgets[name].curselection()
-        mlist =  self.Data[name].get()
-        mlist = eval(mlist)
         if self.ListBoxType[name] == 'browse':
-            if len(indices) == 0:
-                return None
-            else:
-                return mlist[indices[0]]
+            return self.Data[name].GetSelected()
         else:
-            return [mlist[x[0]] for x in indices]
+            return self.Data[name].GetSelection()
 
     def SetListBox(self, name, value):
         if type(value) == str:
@@ -155,13 +423,7 @@ class WidgetHolder(object):
                 value = []
             else:
                 value = [value,]
-        used = tuple(value)
-        # used = value
-        # if len(value) == 0:
-        #     used = ''
-        # elif len(value) == 1:
-        #     used = value[0]
-        self.Data[name].set(used)
+        self.Data[name].SetItems(value)
 
     def DeleteTreeChildren(self, name, item_code):
         treewidget = self.Widgets[name]
@@ -173,26 +435,44 @@ class WidgetHolder(object):
 
 
     def AddMatplotLib(self, parent, name):
-        Fig = matplotlib.figure.Figure(figsize=(7.5, 5), dpi=90)
+        FigureCanvasTkAgg, Figure = _import_tk_canvas()
+        from sfc_gui.plotting import FastLinePlot
+        Fig = Figure(figsize=(7.5, 5), dpi=90)
         subplot = Fig.add_subplot(111)
         x = []
         y = []
         self.MatplotlibInfo[name+"line"], = subplot.plot(x, y, 'bo-')
         self.MatplotlibInfo[name+'canvas'] = FigureCanvasTkAgg(Fig, master=parent)
+        self.MatplotlibInfo[name+'plot'] = FastLinePlot(self.MatplotlibInfo[name+'canvas'], subplot,
+                                                        [self.MatplotlibInfo[name+"line"], ])
+
+    def AddMultiPlot(self, parent, name, max_panels=16):
+        """
+        Figure for several series (overlay or small multiples); see plotting.MultiLinePlot.
+        Access with GetMatplotlibInfo(name, 'canvas') and GetMatplotlibInfo(name, 'plot').
+        """
+        FigureCanvasTkAgg, Figure = _import_tk_canvas()
+        from sfc_gui.plotting import MultiLinePlot
+        Fig = Figure(figsize=(7.5, 5), dpi=90)
+        self.MatplotlibInfo[name+'canvas'] = FigureCanvasTkAgg(Fig, master=parent)
+        self.MatplotlibInfo[name+'plot'] = MultiLinePlot(self.MatplotlibInfo[name+'canvas'],
+                                                         max_panels=max_panels)
 
     def AddRadioButtons(self, parent, name, options):
-        self.Data[name] = StringVar()
+        tk, ttk = _import_tk()
+        self.Data[name] = tk.StringVar()
         widgies = []
         for opt in options:
             widgies.append(ttk.Radiobutton(parent, text=opt, variable=self.Data[name], value=opt))
         self.Widgets[name] = widgies
 
     def AddVariableLabel(self, parent, name):
-        self.Data[name] = StringVar()
+        tk, ttk = _import_tk()
+        self.Data[name] = tk.StringVar()
         self.Widgets[name] = tk.Label(parent, textvariable=self.Data[name])
 
     def GetMatplotlibInfo(self, name, objectname):
-        if not objectname in ('line', 'canvas'):
+        if not objectname in ('line', 'canvas', 'plot'):
             raise ValueError('Unknown type of object')
         return self.MatplotlibInfo[name+objectname]
 
@@ -231,6 +511,13 @@ def get_int(val, accept_None=True):
 
 
 def get_series_info(series_name, mod):
+    """
+    Get the equation string and description for a series.
+
+    :param series_name: str
+    :param mod: Model (or anything with a FinalEquationBlock, such as a ResultFile)
+    :return: tuple
+    """
     desc = ''
     eqn = ''
     try:
@@ -253,6 +540,19 @@ def get_series_info(series_name, mod):
         desc = 'Fitting error for equations at each iteration of the solver.'
     return eqn_str, desc
 
-def ErrorDialog(ex):
-    msg = "Error: {0}\n\n{1}".format(str(ex), ''.join(traceback.format_exc(limit=4)))
+
+def ErrorDialog(ex, trace=None):
+    """
+    Show an error message box.
+
+    If the exception was caught in another thread, pass its formatted traceback as trace
+    (traceback.format_exc() only works in the thread that caught the exception).
+    """
+    if trace is None:
+        trace = traceback.format_exc(limit=4)
+    if sys.version_info[0] < 3:
+        from Tkinter import messagebox
+    else:
+        from tkinter import messagebox
+    msg = "Error: {0}\n\n{1}".format(str(ex), ''.join(trace))
     messagebox.showinfo(message=msg, icon='error', title='Error')